@@ -21,21 +21,29 @@ from absl import app
 from absl import flags
 from absl import logging
 
+from ord_schema import catalog
 from ord_schema import message_helpers
-from ord_schema.proto import dataset_pb2
 
 FLAGS = flags.FLAGS
 flags.DEFINE_string("root", None, "ORD root.")
 flags.DEFINE_string("output", None, "Output SVG filename.")
+flags.DEFINE_string("catalog", None, "Optional catalog filename; see ord_schema.catalog.")
 
 
 def main(argv):
     del argv  # Only used by app.run().
     num_reactions = 0
-    for filename in glob.glob(os.path.join(FLAGS.root, "*", "*.pb*")):
-        dataset = message_helpers.load_message(filename, dataset_pb2.Dataset)
-        logging.info("%s:\t%d", filename, len(dataset.reactions))
-        num_reactions += len(dataset.reactions)
+    filenames = glob.glob(os.path.join(FLAGS.root, "*", "*.pb*"))
+    if FLAGS.catalog:
+        # NOTE: The catalog is not updated; Datasets without an entry are scanned.
+        entries, filenames = catalog.find_entries(FLAGS.catalog, filenames)
+        for filename, entry in entries.items():
+            logging.info("%s:\t%d", filename, entry.num_reactions)
+            num_reactions += entry.num_reactions
+    # NOTE: Only count the reactions; there is no need to parse them.
+    for filename, summary in message_helpers.iter_dataset_summaries(filenames):
+        logging.info("%s:\t%d", filename, summary.num_reactions)
+        num_reactions += summary.num_reactions
     args = {
         "label": "Reactions",
         "message": num_reactions,
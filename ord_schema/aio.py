@@ -0,0 +1,266 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Asyncio wrappers for loading, writing, and validating messages.
+
+Parsing, compression, and RDKit work are CPU-bound and block the event loop,
+so these functions run them in an executor. By default this is the event
+loop's default executor (see asyncio.loop.set_default_executor), but any
+concurrent.futures.Executor can be passed explicitly; a ProcessPoolExecutor
+avoids contention for the GIL at the cost of pickling messages.
+
+Example:
+    async def handler(filename):
+        dataset = await aio.load_message(filename, dataset_pb2.Dataset)
+        async for reaction in aio.iter_reactions(filename):
+            ...
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import itertools
+import threading
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, List, Optional, Tuple, Type
+
+from google import protobuf
+
+import ord_schema
+from ord_schema import message_helpers
+from ord_schema import validations
+from ord_schema.proto import reaction_pb2
+
+MessageType = message_helpers.MessageType
+
+
+async def _run(function: Callable[..., Any], *args, executor: Optional[concurrent.futures.Executor], **kwargs) -> Any:
+    """Runs a blocking function in an executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(function, *args, **kwargs))
+
+
+async def load_message(
+    filename: str,
+    message_type: Type[MessageType],
+    skip_fields: Optional[Iterable[str]] = None,
+    cache_dir: Optional[str] = None,
+    num_workers: int = 1,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> MessageType:
+    """Loads a protocol buffer message from a file; see message_helpers.load_message.
+
+    Args:
+        filename: Text filename containing a serialized protocol buffer message.
+        message_type: Message subclass.
+        skip_fields: Full names of fields to omit from the loaded message.
+        cache_dir: Optional directory for caching parsed text messages.
+        num_workers: Number of processes used to parse text-format Datasets.
+        executor: Executor for the blocking work; defaults to the event loop's
+            default executor.
+
+    Returns:
+        Message object.
+
+    Raises:
+        ValueError: if the message cannot be parsed.
+    """
+    if skip_fields is not None:
+        skip_fields = tuple(skip_fields)
+    return await _run(
+        message_helpers.load_message,
+        filename,
+        message_type,
+        skip_fields=skip_fields,
+        cache_dir=cache_dir,
+        num_workers=num_workers,
+        executor=executor,
+    )
+
+
+async def write_message(
+    message: ord_schema.Message,
+    filename: str,
+    block_size: Optional[int] = None,
+    num_threads: Optional[int] = None,
+    num_workers: int = 1,
+    executor: Optional[concurrent.futures.Executor] = None,
+):
+    """Writes a protocol buffer message to disk; see message_helpers.write_message.
+
+    The message must not be modified until the returned coroutine completes.
+
+    Args:
+        message: Protocol buffer message.
+        filename: Text output filename.
+        block_size: Approximate uncompressed size of the blocks in a blocked
+            gzip file.
+        num_threads: Number of threads used to compress blocks.
+        num_workers: Number of processes used to format text-format Datasets.
+        executor: Executor for the blocking work; defaults to the event loop's
+            default executor.
+
+    Raises:
+        ValueError: if `filename` does not have the expected suffix.
+    """
+    await _run(
+        message_helpers.write_message,
+        message,
+        filename,
+        block_size=block_size,
+        num_threads=num_threads,
+        num_workers=num_workers,
+        executor=executor,
+    )
+
+
+def _validate_message(
+    message: ord_schema.Message,
+    recurse: bool,
+    raise_on_error: bool,
+    options: Optional[validations.ValidationOptions],
+) -> Tuple[ord_schema.Message, validations.ValidationOutput]:
+    """Validates a message and returns it along with the output.
+
+    Returning the message propagates in-place changes made by validation when
+    running in another process.
+    """
+    output = validations.validate_message(message, recurse=recurse, raise_on_error=raise_on_error, options=options)
+    return message, output
+
+
+async def validate_message(
+    message: ord_schema.Message,
+    recurse: bool = True,
+    raise_on_error: bool = True,
+    options: Optional[validations.ValidationOptions] = None,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> validations.ValidationOutput:
+    """Validates a message; see validations.validate_message.
+
+    As with the synchronous version, the message may be modified in place
+    (also when `executor` runs in another process). The message must not be
+    modified until the returned coroutine completes.
+
+    Args:
+        message: A message to validate.
+        recurse: Whether to validate submessages.
+        raise_on_error: If True, raises a ValidationError when errors are
+            encountered.
+        options: ValidationOptions.
+        executor: Executor for the blocking work; defaults to the event loop's
+            default executor.
+
+    Returns:
+        ValidationOutput.
+
+    Raises:
+        ValidationError: if `raise_on_error` is True and there are errors.
+    """
+    validated, output = await _run(_validate_message, message, recurse, raise_on_error, options, executor=executor)
+    if validated is not message:
+        message.CopyFrom(validated)
+    return output
+
+
+def _parse_reactions(records: List[bytes], filename: str, start: int) -> List[reaction_pb2.Reaction]:
+    """Parses a batch of serialized Reactions."""
+    reactions = []
+    for index, record in enumerate(records, start=start):
+        try:
+            reactions.append(reaction_pb2.Reaction.FromString(record))
+        except protobuf.message.DecodeError as error:
+            raise ValueError(f"error parsing reaction {index} in {filename}: {error}") from error
+    return reactions
+
+
+def _read_batch(records: Iterator[bytes], lock: threading.Lock, batch_size: int) -> List[bytes]:
+    """Reads the next batch of serialized Reactions."""
+    with lock:
+        return list(itertools.islice(records, batch_size))
+
+
+def _close_reader(records: Iterator[bytes], lock: threading.Lock):
+    """Closes a reader once any in-progress read has finished."""
+    with lock:
+        records.close()
+
+
+async def iter_reactions(
+    filename: str,
+    batch_size: int = 100,
+    max_pending: int = 2,
+    skip_fields: Optional[Iterable[str]] = None,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> AsyncIterator[reaction_pb2.Reaction]:
+    """Iterates over the Reactions in a Dataset file.
+
+    The file is read incrementally (see
+    message_helpers.iter_serialized_reactions) and Reactions are parsed in
+    batches in the executor. At most `max_pending` batches are read and parsed
+    ahead of the consumer, so at most `max_pending * batch_size` Reactions are
+    resident, a slow consumer does not cause unbounded memory use, and many
+    iterators can share one executor. Pending batches are cancelled if
+    iteration stops early.
+
+    Example:
+        async for reaction in iter_reactions("my_dataset.pb.gz"):
+            ...
+
+    Args:
+        filename: Dataset filename (any format supported by load_message).
+        batch_size: Number of Reactions per batch.
+        max_pending: Maximum number of batches in flight; must be positive.
+        skip_fields: Full names of fields to omit from each Reaction; see
+            message_helpers.load_message.
+        executor: Executor for the blocking work; defaults to the event loop's
+            default executor.
+
+    Yields:
+        Reaction messages, in order.
+
+    Raises:
+        ValueError: if the Dataset cannot be parsed or the arguments are
+            invalid.
+    """
+    if batch_size < 1 or max_pending < 1:
+        raise ValueError("batch_size and max_pending must be positive")
+    if skip_fields is not None:
+        skip_fields = tuple(skip_fields)
+    records = message_helpers.iter_serialized_reactions(filename, skip_fields=skip_fields)
+    lock = threading.Lock()
+    loop = asyncio.get_running_loop()
+    pending = collections.deque()
+    start = 0
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                # NOTE: The reader is a generator, so it runs in a
+                # thread (not `executor`, which may be a process pool) and
+                # batches are read one at a time; only the parsing is queued.
+                batch = await _run(_read_batch, records, lock, batch_size, executor=None)
+                if len(batch) < batch_size:
+                    exhausted = True
+                if batch:
+                    function = functools.partial(_parse_reactions, batch, filename, start)
+                    pending.append(loop.run_in_executor(executor, function))
+                    start += len(batch)
+            if not pending:
+                return
+            for reaction in await pending.popleft():
+                yield reaction
+    finally:
+        for future in pending:
+            future.cancel()
+        await _run(_close_reader, records, lock, executor=None)
@@ -0,0 +1,153 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for ord_schema.aio."""
+
+import asyncio
+import concurrent.futures
+import os
+
+from absl.testing import absltest
+from absl.testing import parameterized
+
+from ord_schema import aio
+from ord_schema import message_helpers
+from ord_schema import validations
+from ord_schema.proto import dataset_pb2
+from ord_schema.proto import reaction_pb2
+
+
+class AioTest(parameterized.TestCase, absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_subdirectory = self.create_tempdir()
+        self.dataset = dataset_pb2.Dataset(name="test", dataset_id="ord_dataset-00000000000000000000000000000000")
+        for i in range(25):
+            reaction = self.dataset.reactions.add(reaction_id=f"ord-{i:032d}")
+            reaction.provenance.doi = f"10.1000/{i}"
+            reaction.observations.add().image.bytes_value = b"image"
+
+    @parameterized.parameters(".pb", ".pb.gz", ".pbtxt", ".json")
+    def test_round_trip(self, suffix):
+        filename = os.path.join(self.test_subdirectory, f"dataset{suffix}")
+
+        async def run():
+            await aio.write_message(self.dataset, filename)
+            return await aio.load_message(filename, dataset_pb2.Dataset)
+
+        self.assertEqual(asyncio.run(run()), self.dataset)
+        self.assertEqual(message_helpers.load_message(filename, dataset_pb2.Dataset), self.dataset)
+
+    def test_load_message_error(self):
+        filename = os.path.join(self.test_subdirectory, "dataset.pbtxt")
+        with open(filename, "w") as f:
+            f.write("not a dataset")
+        with self.assertRaisesRegex(ValueError, "error parsing"):
+            asyncio.run(aio.load_message(filename, dataset_pb2.Dataset))
+
+    def test_validate_message(self):
+        reaction = reaction_pb2.Reaction()
+        with self.assertRaisesRegex(validations.ValidationError, "reaction input"):
+            asyncio.run(aio.validate_message(reaction))
+        output = asyncio.run(aio.validate_message(reaction, raise_on_error=False))
+        self.assertNotEmpty(output.errors)
+
+    def test_validate_message_process_executor(self):
+        reaction = reaction_pb2.Reaction()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+            output = asyncio.run(aio.validate_message(reaction, raise_on_error=False, executor=executor))
+        self.assertNotEmpty(output.errors)
+        self.assertEqual(reaction, reaction_pb2.Reaction())
+
+    @parameterized.parameters(".pb", ".pb.gz", ".pbtxt")
+    def test_iter_reactions(self, suffix):
+        filename = os.path.join(self.test_subdirectory, f"dataset{suffix}")
+        message_helpers.write_message(self.dataset, filename, block_size=100 if suffix == ".pb.gz" else None)
+
+        async def run():
+            return [reaction async for reaction in aio.iter_reactions(filename, batch_size=7)]
+
+        self.assertEqual(asyncio.run(run()), list(self.dataset.reactions))
+
+    def test_iter_reactions_skip_fields(self):
+        filename = os.path.join(self.test_subdirectory, "dataset.pb")
+        message_helpers.write_message(self.dataset, filename)
+
+        async def run():
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+                return [
+                    reaction
+                    async for reaction in aio.iter_reactions(
+                        filename, skip_fields=["ord.ReactionObservation.image"], executor=executor
+                    )
+                ]
+
+        reactions = asyncio.run(run())
+        self.assertLen(reactions, 25)
+        self.assertEqual(reactions[3].provenance.doi, "10.1000/3")
+        self.assertFalse(reactions[3].observations[0].HasField("image"))
+
+    def test_iter_reactions_backpressure(self):
+        filename = os.path.join(self.test_subdirectory, "dataset.pb")
+        message_helpers.write_message(self.dataset, filename)
+        calls = []
+        parse_reactions = aio._parse_reactions  # pylint: disable=protected-access
+
+        def counting_parse_reactions(records, *args):
+            calls.append(len(records))
+            return parse_reactions(records, *args)
+
+        async def run():
+            iterator = aio.iter_reactions(filename, batch_size=2, max_pending=2)
+            reaction = await iterator.__anext__()
+            await iterator.aclose()
+            return reaction
+
+        with absltest.mock.patch.object(aio, "_parse_reactions", counting_parse_reactions):
+            reaction = asyncio.run(run())
+        self.assertEqual(reaction, self.dataset.reactions[0])
+        self.assertLessEqual(len(calls), 3)
+
+    @parameterized.parameters(".pb", ".pb.gz")
+    def test_iter_reactions_reads_incrementally(self, suffix):
+        filename = os.path.join(self.test_subdirectory, f"dataset{suffix}")
+        message_helpers.write_message(self.dataset, filename)
+        num_read = []
+        read_batch = aio._read_batch  # pylint: disable=protected-access
+
+        def counting_read_batch(*args):
+            batch = read_batch(*args)
+            num_read.append(len(batch))
+            return batch
+
+        async def run():
+            iterator = aio.iter_reactions(filename, batch_size=2, max_pending=2)
+            reaction = await iterator.__anext__()
+            await iterator.aclose()
+            return reaction
+
+        with absltest.mock.patch.object(aio, "_read_batch", counting_read_batch):
+            reaction = asyncio.run(run())
+        self.assertEqual(reaction, self.dataset.reactions[0])
+        self.assertLessEqual(sum(num_read), 4)
+
+    def test_iter_reactions_bad_arguments(self):
+        async def run():
+            return [reaction async for reaction in aio.iter_reactions("dataset.pb", batch_size=0)]
+
+        with self.assertRaisesRegex(ValueError, "must be positive"):
+            asyncio.run(run())
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,171 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Content-addressed storage for raw data attached to Data messages.
+
+Large payloads (spectra, chromatograms, instrument files, etc.) are stored once
+on disk, keyed by their SHA-256 digest, and Data messages reference them with a
+URL of the form "sha256:<hex digest>" instead of embedding the bytes. Identical
+files attached to many reactions are therefore stored and parsed only once.
+
+See message_helpers.build_data, message_helpers.pack_data, and
+message_helpers.unpack_data.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+from typing import BinaryIO, Optional
+
+from ord_schema.proto import reaction_pb2
+
+URL_PREFIX = "sha256:"
+_CHUNK_SIZE = 1 << 20
+
+
+def to_url(digest: str) -> str:
+    """Returns the Data.url that references a blob."""
+    return f"{URL_PREFIX}{digest}"
+
+
+def parse_url(url: str) -> Optional[str]:
+    """Returns the digest referenced by a Data.url, or None for other URLs."""
+    match = re.fullmatch(rf"{URL_PREFIX}([0-9a-f]{{64}})", url)
+    if not match:
+        return None
+    return match.group(1)
+
+
+class BlobStore:
+    """Local content-addressed blob store.
+
+    Blobs are stored as <root>/<first two digest characters>/<digest>. Writes
+    are atomic, so concurrent writers of the same blob are safe.
+    """
+
+    def __init__(self, root: str):
+        """Initializes the store.
+
+        Args:
+            root: Root directory; created if it does not exist.
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        """Returns the filename of a blob."""
+        return os.path.join(self.root, digest[:2], digest)
+
+    def __contains__(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def put_file(self, filename: str) -> str:
+        """Adds the contents of a file to the store.
+
+        The file is streamed in chunks; it is never read into memory at once.
+
+        Args:
+            filename: Text filename.
+
+        Returns:
+            Text SHA-256 digest of the file contents.
+        """
+        with open(filename, "rb") as f:
+            return self.put_stream(f)
+
+    def put_stream(self, stream: BinaryIO) -> str:
+        """Adds the contents of a binary stream to the store.
+
+        Args:
+            stream: Binary file-like object.
+
+        Returns:
+            Text SHA-256 digest of the stream contents.
+        """
+        sha256 = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=self.root, delete=False) as f:
+            try:
+                for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b""):
+                    sha256.update(chunk)
+                    f.write(chunk)
+            except BaseException:
+                os.remove(f.name)
+                raise
+        return self._commit(f.name, sha256.hexdigest())
+
+    def put_bytes(self, value: bytes) -> str:
+        """Adds a bytes value to the store.
+
+        Args:
+            value: Bytes to store.
+
+        Returns:
+            Text SHA-256 digest of `value`.
+        """
+        digest = hashlib.sha256(value).hexdigest()
+        if digest in self:
+            return digest
+        with tempfile.NamedTemporaryFile(dir=self.root, delete=False) as f:
+            f.write(value)
+        return self._commit(f.name, digest)
+
+    def _commit(self, temp_filename: str, digest: str) -> str:
+        """Moves a temporary file into place, unless the blob already exists."""
+        if digest in self:
+            os.remove(temp_filename)
+            return digest
+        os.makedirs(os.path.dirname(self.path(digest)), exist_ok=True)
+        os.replace(temp_filename, self.path(digest))
+        return digest
+
+    def open(self, digest: str) -> BinaryIO:
+        """Opens a blob for reading.
+
+        Raises:
+            KeyError: if the blob is not in the store.
+        """
+        try:
+            return open(self.path(digest), "rb")  # pylint: disable=consider-using-with
+        except FileNotFoundError as error:
+            raise KeyError(f"blob not found: {digest}") from error
+
+    def get(self, digest: str) -> bytes:
+        """Returns the contents of a blob.
+
+        Raises:
+            KeyError: if the blob is not in the store.
+        """
+        with self.open(digest) as f:
+            return f.read()
+
+    def resolve(self, data: reaction_pb2.Data) -> bytes:
+        """Returns the raw bytes for a Data message, fetching them if needed.
+
+        Args:
+            data: Data message with either bytes_value or a blob URL.
+
+        Returns:
+            Bytes value.
+
+        Raises:
+            KeyError: if the referenced blob is not in the store.
+            ValueError: if `data` does not hold or reference bytes.
+        """
+        if data.WhichOneof("kind") == "bytes_value":
+            return data.bytes_value
+        if data.WhichOneof("kind") == "url":
+            digest = parse_url(data.url)
+            if digest is not None:
+                return self.get(digest)
+        raise ValueError(f"Data does not contain bytes or a blob reference: {data}")
@@ -0,0 +1,61 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for ord_schema.blob_store."""
+
+import hashlib
+import os
+
+from absl.testing import absltest
+
+from ord_schema import blob_store
+from ord_schema.proto import reaction_pb2
+
+
+class BlobStoreTest(absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_directory = self.create_tempdir()
+        self.store = blob_store.BlobStore(os.path.join(self.test_directory, "blobs"))
+
+    def test_put_file(self):
+        value = os.urandom(3 << 20)
+        filename = os.path.join(self.test_directory, "test.data")
+        with open(filename, "wb") as f:
+            f.write(value)
+        digest = self.store.put_file(filename)
+        self.assertEqual(digest, hashlib.sha256(value).hexdigest())
+        self.assertIn(digest, self.store)
+        self.assertEqual(self.store.get(digest), value)
+        # Adding the same contents again is a no-op.
+        self.assertEqual(self.store.put_bytes(value), digest)
+        self.assertEqual(os.listdir(self.store.root), [digest[:2]])
+
+    def test_resolve(self):
+        digest = self.store.put_bytes(b"test")
+        self.assertEqual(self.store.resolve(reaction_pb2.Data(url=blob_store.to_url(digest))), b"test")
+        self.assertEqual(self.store.resolve(reaction_pb2.Data(bytes_value=b"inline")), b"inline")
+        with self.assertRaisesRegex(ValueError, "does not contain bytes"):
+            self.store.resolve(reaction_pb2.Data(url="https://example.com"))
+        with self.assertRaisesRegex(KeyError, "blob not found"):
+            self.store.resolve(reaction_pb2.Data(url=blob_store.to_url("0" * 64)))
+
+    def test_parse_url(self):
+        digest = hashlib.sha256(b"test").hexdigest()
+        self.assertEqual(blob_store.parse_url(blob_store.to_url(digest)), digest)
+        self.assertIsNone(blob_store.parse_url("sha256:1234"))
+        self.assertIsNone(blob_store.parse_url("https://example.com"))
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,278 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Blocked gzip files that can be compressed and decompressed in parallel.
+
+A blocked file is a standard multi-member gzip stream (RFC 1952), so it can be
+read by gzip.open, zcat, etc. Each member holds an independently compressed
+block and carries an extra header subfield (ID "OR") recording the compressed
+size of the member and the number of records in the block. Readers can use
+these headers to build an index of the file without inflating it, decompress
+blocks in parallel, and jump directly to the block containing a given record.
+
+Compression is deterministic: the same blocks always produce the same bytes,
+regardless of the number of threads used.
+"""
+
+import collections
+import concurrent.futures
+import dataclasses
+import os
+import struct
+from typing import BinaryIO, Iterable, List, Optional, Tuple
+import zlib
+
+_MAGIC = b"\x1f\x8b"
+_FEXTRA = 4
+_SUBFIELD_ID = b"OR"
+# ID1, ID2, CM, FLG, MTIME, XFL, OS, XLEN.
+_HEADER = struct.Struct("<2sBBIBBH")
+# SI1, SI2, SLEN, member size, number of records.
+_SUBFIELD = struct.Struct("<2sHII")
+# CRC32, ISIZE.
+_TRAILER = struct.Struct("<II")
+_OVERHEAD = _HEADER.size + _SUBFIELD.size + _TRAILER.size
+
+
+@dataclasses.dataclass(frozen=True)
+class Block:
+    """Location and contents of a single gzip member in a blocked file."""
+
+    offset: int  # Offset of the member in the compressed file.
+    size: int  # Compressed size of the member, including headers.
+    num_records: int  # Number of records in the uncompressed block.
+    first_record: int  # Index of the first record in the block.
+
+
+def compress_block(data: bytes, num_records: int = 0, compresslevel: int = 9) -> bytes:
+    """Compresses a single block into a complete gzip member.
+
+    Args:
+        data: Uncompressed block.
+        num_records: Number of records in the block; stored in the header.
+        compresslevel: zlib compression level.
+
+    Returns:
+        Serialized gzip member.
+    """
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(data) + compressor.flush()
+    if compresslevel == 9:
+        xfl = 2  # Maximum compression.
+    elif compresslevel == 1:
+        xfl = 4  # Fastest compression.
+    else:
+        xfl = 0
+    member_size = _OVERHEAD + len(deflated)
+    # NOTE: MTIME is zero so that round trips result in identical files.
+    header = _HEADER.pack(_MAGIC, zlib.DEFLATED, _FEXTRA, 0, xfl, 255, _SUBFIELD.size)
+    subfield = _SUBFIELD.pack(_SUBFIELD_ID, _SUBFIELD.size - 4, member_size, num_records)
+    trailer = _TRAILER.pack(zlib.crc32(data), len(data) & 0xFFFFFFFF)
+    return b"".join([header, subfield, deflated, trailer])
+
+
+class BlockedGzipWriter:
+    """Writes blocks to a blocked gzip file as they are produced.
+
+    Blocks are compressed in a thread pool (zlib releases the GIL while
+    compressing) and written in order. Only a bounded number of blocks are in
+    flight at any time.
+    """
+
+    def __init__(self, f: BinaryIO, num_threads: Optional[int] = None, compresslevel: int = 9):
+        """Initializes the writer.
+
+        Args:
+            f: Binary file-like object opened for writing. It is not closed by
+                the writer.
+            num_threads: Number of compression threads; defaults to the
+                concurrent.futures default.
+            compresslevel: zlib compression level.
+        """
+        if num_threads is None:
+            num_threads = min(32, (os.cpu_count() or 1) + 4)  # concurrent.futures default.
+        self._f = f
+        self._compresslevel = compresslevel
+        self._max_pending = 2 * num_threads
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=num_threads)
+        self._pending = collections.deque()
+        self.num_blocks = 0
+
+    def write_block(self, data: bytes, num_records: int = 0):
+        """Queues a block for compression.
+
+        Args:
+            data: Uncompressed block.
+            num_records: Number of records in the block; stored in the header.
+        """
+        self._pending.append(self._executor.submit(compress_block, data, num_records, self._compresslevel))
+        if len(self._pending) >= self._max_pending:
+            self._f.write(self._pending.popleft().result())
+        self.num_blocks += 1
+
+    def close(self):
+        """Writes any pending blocks and shuts down the thread pool."""
+        while self._pending:
+            self._f.write(self._pending.popleft().result())
+        self._executor.shutdown()
+
+    def __enter__(self) -> "BlockedGzipWriter":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def write_blocks(
+    f: BinaryIO,
+    blocks: Iterable[Tuple[bytes, int]],
+    num_threads: Optional[int] = None,
+    compresslevel: int = 9,
+) -> int:
+    """Compresses blocks in a thread pool and writes them in order.
+
+    Args:
+        f: Binary file-like object opened for writing.
+        blocks: Iterable of (data, num_records) tuples.
+        num_threads: Number of compression threads; defaults to the
+            concurrent.futures default.
+        compresslevel: zlib compression level.
+
+    Returns:
+        The number of blocks written.
+    """
+    with BlockedGzipWriter(f, num_threads=num_threads, compresslevel=compresslevel) as writer:
+        for data, num_records in blocks:
+            writer.write_block(data, num_records)
+    return writer.num_blocks
+
+
+def _read_header(f: BinaryIO) -> Optional[Tuple[int, int]]:
+    """Reads a member header; returns (member_size, num_records) or None at EOF.
+
+    Raises:
+        ValueError: if the member is not part of a blocked file.
+    """
+    value = f.read(_HEADER.size + _SUBFIELD.size)
+    if not value:
+        return None
+    if len(value) < _HEADER.size + _SUBFIELD.size:
+        raise ValueError("truncated gzip header")
+    magic, method, flags, _, _, _, xlen = _HEADER.unpack_from(value)
+    if magic != _MAGIC or method != zlib.DEFLATED:
+        raise ValueError("not a gzip file")
+    if not flags & _FEXTRA or xlen != _SUBFIELD.size:
+        raise ValueError("not a blocked gzip file")
+    subfield_id, _, member_size, num_records = _SUBFIELD.unpack_from(value, _HEADER.size)
+    if subfield_id != _SUBFIELD_ID or member_size < _OVERHEAD:
+        raise ValueError("not a blocked gzip file")
+    return member_size, num_records
+
+
+def is_blocked(filename: str) -> bool:
+    """Returns whether every member of a file is a blocked gzip member.
+
+    Files that start with a blocked member but continue with ordinary gzip
+    members (for example, after `cat`-ing a regular gzip file onto a blocked
+    one) are not blocked; see read_index.
+    """
+    try:
+        read_index(filename)
+    except ValueError:
+        return False
+    return True
+
+
+def read_index(filename: str) -> List[Block]:
+    """Builds the block index of a blocked file by reading only the headers.
+
+    Args:
+        filename: Blocked gzip filename.
+
+    Returns:
+        List of Block objects.
+
+    Raises:
+        ValueError: if any member of the file is not a blocked gzip member.
+    """
+    blocks = []
+    first_record = 0
+    with open(filename, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        while True:
+            offset = f.tell()
+            try:
+                header = _read_header(f)
+            except ValueError as error:
+                raise ValueError(f"{error} (member at offset {offset} of {filename})") from error
+            if header is None:
+                break
+            size, num_records = header
+            if offset + size > file_size:
+                raise ValueError(f"truncated gzip member at offset {offset} of {filename}")
+            blocks.append(Block(offset=offset, size=size, num_records=num_records, first_record=first_record))
+            first_record += num_records
+            f.seek(offset + size)
+    return blocks
+
+
+def decompress_block(member: bytes) -> bytes:
+    """Decompresses a single gzip member written by compress_block.
+
+    Raises:
+        ValueError: if the member is corrupt.
+    """
+    if len(member) < _OVERHEAD:
+        raise ValueError("truncated gzip member")
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    try:
+        data = decompressor.decompress(member[_HEADER.size + _SUBFIELD.size : -_TRAILER.size])
+    except zlib.error as error:
+        raise ValueError(f"corrupt gzip member: {error}") from error
+    crc, size = _TRAILER.unpack_from(member, len(member) - _TRAILER.size)
+    if not decompressor.eof or crc != zlib.crc32(data) or size != len(data) & 0xFFFFFFFF:
+        raise ValueError("corrupt gzip member")
+    return data
+
+
+def read_block(filename: str, block: Block) -> bytes:
+    """Reads and decompresses a single block."""
+    with open(filename, "rb") as f:
+        f.seek(block.offset)
+        return decompress_block(f.read(block.size))
+
+
+def decompress(filename: str, num_threads: Optional[int] = None) -> bytes:
+    """Decompresses an entire blocked file, inflating blocks in parallel.
+
+    Args:
+        filename: Blocked gzip filename.
+        num_threads: Number of decompression threads; defaults to the
+            concurrent.futures default.
+
+    Returns:
+        The uncompressed contents of the file.
+
+    Raises:
+        ValueError: if the file is not a blocked gzip file or is corrupt.
+    """
+    blocks = read_index(filename)
+    with open(filename, "rb") as f:
+        members = []
+        for block in blocks:
+            f.seek(block.offset)
+            members.append(f.read(block.size))
+    if len(members) == 1:
+        return decompress_block(members[0])
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
+        return b"".join(executor.map(decompress_block, members))
@@ -0,0 +1,102 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for ord_schema.blocked_gzip."""
+
+import gzip
+import os
+
+from absl.testing import absltest
+from absl.testing import parameterized
+
+from ord_schema import blocked_gzip
+
+
+class BlockedGzipTest(parameterized.TestCase, absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_directory = self.create_tempdir()
+        self.blocks = [(f"block {i}: ".encode() + os.urandom(100) * i, i) for i in range(10)]
+        self.data = b"".join(block for block, _ in self.blocks)
+
+    def _write(self, filename, num_threads=None):
+        with open(filename, "wb") as f:
+            return blocked_gzip.write_blocks(f, self.blocks, num_threads=num_threads)
+
+    @parameterized.parameters(1, 4)
+    def test_round_trip(self, num_threads):
+        filename = os.path.join(self.test_directory, "test.gz")
+        self.assertEqual(self._write(filename, num_threads=num_threads), 10)
+        self.assertTrue(blocked_gzip.is_blocked(filename))
+        self.assertEqual(blocked_gzip.decompress(filename, num_threads=num_threads), self.data)
+        # Blocked files are standard gzip files.
+        with gzip.open(filename, "rb") as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_reproducibility(self):
+        filename1 = os.path.join(self.test_directory, "test1.gz")
+        filename2 = os.path.join(self.test_directory, "test2.gz")
+        self._write(filename1, num_threads=1)
+        self._write(filename2, num_threads=8)
+        with open(filename1, "rb") as f1, open(filename2, "rb") as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+    def test_index(self):
+        filename = os.path.join(self.test_directory, "test.gz")
+        self._write(filename)
+        index = blocked_gzip.read_index(filename)
+        self.assertLen(index, 10)
+        self.assertEqual([block.num_records for block in index], list(range(10)))
+        self.assertEqual(index[4].first_record, 0 + 1 + 2 + 3)
+        self.assertEqual(index[-1].offset + index[-1].size, os.path.getsize(filename))
+        self.assertEqual(blocked_gzip.read_block(filename, index[3]), self.blocks[3][0])
+
+    def test_not_blocked(self):
+        filename = os.path.join(self.test_directory, "test.gz")
+        with gzip.open(filename, "wb") as f:
+            f.write(self.data)
+        self.assertFalse(blocked_gzip.is_blocked(filename))
+        with self.assertRaisesRegex(ValueError, "not a blocked gzip file"):
+            blocked_gzip.read_index(filename)
+
+    def test_mixed(self):
+        filename = os.path.join(self.test_directory, "test.gz")
+        self._write(filename)
+        self.assertTrue(blocked_gzip.is_blocked(filename))
+        # Appending an ordinary gzip member leaves a valid (multi-member) gzip
+        # file that is no longer blocked.
+        with gzip.open(filename, "ab") as f:
+            f.write(b"more data")
+        self.assertFalse(blocked_gzip.is_blocked(filename))
+        with self.assertRaisesRegex(ValueError, "not a blocked gzip file"):
+            blocked_gzip.read_index(filename)
+        with gzip.open(filename, "rb") as f:
+            self.assertEqual(f.read(), self.data + b"more data")
+
+    def test_truncated(self):
+        filename = os.path.join(self.test_directory, "test.gz")
+        self._write(filename)
+        os.truncate(filename, os.path.getsize(filename) - 1)
+        self.assertFalse(blocked_gzip.is_blocked(filename))
+        with self.assertRaisesRegex(ValueError, "truncated gzip member"):
+            blocked_gzip.read_index(filename)
+
+    def test_corrupt_block(self):
+        member = bytearray(blocked_gzip.compress_block(b"test data"))
+        member[-5] ^= 0xFF  # Corrupt the CRC.
+        with self.assertRaisesRegex(ValueError, "corrupt gzip member"):
+            blocked_gzip.decompress_block(bytes(member))
+
+
+if __name__ == "__main__":
+    absltest.main()
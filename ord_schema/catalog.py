@@ -0,0 +1,288 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Manifest of the Datasets in a corpus (e.g. ord-data).
+
+The catalog is a JSON Lines file with one CatalogEntry per Dataset, holding
+enough metadata (reaction counts, DOIs, etc.) to answer corpus-level questions
+without opening the Datasets themselves. Dataset paths are stored relative to
+the directory containing the catalog.
+
+The catalog is updated incrementally: files whose size and modification time
+are unchanged are not read at all, and files whose contents are unchanged (by
+checksum) are not scanned again. The JSON Lines manifest helpers
+(read_manifest, write_manifest, and update_manifest) are shared with
+reaction_index.
+
+Only the tooling that builds Datasets (see scripts/build_catalog.py) should
+update the catalog; read-only consumers use find_entries, which never modifies
+it.
+
+Example:
+    entries = catalog.update_catalog("catalog.jsonl", glob.glob("data/*/*.pb.gz"))
+    num_reactions = sum(entry.num_reactions for entry in entries)
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type, TypeVar
+
+from ord_schema import message_helpers
+
+_CHUNK_SIZE = 1 << 20
+
+
+EntryType = TypeVar("EntryType")
+
+
+@dataclasses.dataclass(frozen=True)
+class StaleFile:
+    """A Dataset file whose manifest entry is missing or out of date; see update_manifest."""
+
+    filename: str
+    path: str  # Relative to the directory containing the manifest.
+    stat: os.stat_result
+    entry: Optional[Any]  # Previous entry, if any.
+
+
+def read_manifest(filename: str, entry_type: Type[EntryType]) -> List[EntryType]:
+    """Reads a JSON Lines manifest, such as a catalog or a reaction_index.
+
+    Args:
+        filename: Manifest filename.
+        entry_type: Dataclass for the entries; each line holds its fields.
+
+    Returns:
+        List of entries.
+
+    Raises:
+        ValueError: if the manifest cannot be parsed.
+    """
+    entries = []
+    with open(filename) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                entries.append(entry_type(**json.loads(line)))
+            except (TypeError, ValueError) as error:
+                raise ValueError(f"{filename}: error parsing line {line_number}: {error}") from error
+    return entries
+
+
+def write_manifest(entries: Iterable[Any], filename: str):
+    """Writes a JSON Lines manifest atomically.
+
+    Args:
+        entries: Dataclass entries.
+        filename: Manifest filename.
+    """
+    with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(os.path.abspath(filename)), delete=False) as f:
+        try:
+            for entry in entries:
+                f.write(json.dumps(dataclasses.asdict(entry), sort_keys=True) + "\n")
+        except BaseException:
+            os.remove(f.name)
+            raise
+    os.replace(f.name, filename)
+
+
+def update_manifest(
+    filename: str,
+    entry_type: Type[EntryType],
+    dataset_filenames: Iterable[str],
+    build_entries: Callable[[List[StaleFile]], Iterable[EntryType]],
+) -> List[EntryType]:
+    """Updates a manifest to match a set of Dataset files.
+
+    Entries whose size and modification time match the file are kept; the
+    others are rebuilt with `build_entries`. Entries for files not in
+    `dataset_filenames` are removed. The manifest is only rewritten if it
+    changed.
+
+    Args:
+        filename: Manifest filename; created if it does not exist.
+        entry_type: Dataclass for the entries; it must have `path`, `size`,
+            and `mtime_ns` fields.
+        dataset_filenames: Dataset filenames.
+        build_entries: Function that returns the entries for a list of
+            StaleFile objects.
+
+    Returns:
+        List of entries, sorted by path.
+
+    Raises:
+        ValueError: if the manifest cannot be parsed.
+    """
+    root = os.path.dirname(os.path.abspath(filename))
+    existing = {}
+    if os.path.exists(filename):
+        existing = {entry.path: entry for entry in read_manifest(filename, entry_type)}
+    entries = {}
+    stale_files = []
+    for dataset_filename in dataset_filenames:
+        path = os.path.relpath(os.path.abspath(dataset_filename), root)
+        stat = os.stat(dataset_filename)
+        entry = existing.get(path)
+        if entry is not None and entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns:
+            entries[path] = entry
+        else:
+            stale_files.append(StaleFile(filename=dataset_filename, path=path, stat=stat, entry=entry))
+    if stale_files:
+        for entry in build_entries(stale_files):
+            entries[entry.path] = entry
+    result = [entries[path] for path in sorted(entries)]
+    if result != [existing[path] for path in sorted(existing)]:
+        write_manifest(result, filename)
+    return result
+
+
+@dataclasses.dataclass(frozen=True)
+class CatalogEntry:
+    """Metadata for a single Dataset file."""
+
+    dataset_id: str
+    path: str  # Relative to the directory containing the catalog.
+    size: int  # File size in bytes.
+    mtime_ns: int  # File modification time.
+    sha256: str  # Digest of the file contents.
+    num_reactions: int
+    name: str
+    dois: List[str]  # Distinct provenance.doi values, sorted.
+    min_reaction_id: str  # Empty if no Reactions have IDs.
+    max_reaction_id: str
+
+
+def read_catalog(filename: str) -> List[CatalogEntry]:
+    """Reads a catalog.
+
+    Args:
+        filename: Catalog filename.
+
+    Returns:
+        List of CatalogEntry objects.
+
+    Raises:
+        ValueError: if the catalog cannot be parsed.
+    """
+    return read_manifest(filename, CatalogEntry)
+
+
+def find_entries(filename: str, dataset_filenames: Iterable[str]) -> Tuple[Dict[str, CatalogEntry], List[str]]:
+    """Looks up Dataset files in a catalog without updating it.
+
+    Entries are matched by path and are not checked against the files; use
+    update_catalog to refresh a stale catalog.
+
+    Args:
+        filename: Catalog filename. If it does not exist, every Dataset is
+            missing.
+        dataset_filenames: Dataset filenames.
+
+    Returns:
+        entries: Dict mapping Dataset filenames to CatalogEntry objects.
+        missing: List of Dataset filenames that have no entry.
+
+    Raises:
+        ValueError: if the catalog cannot be parsed.
+    """
+    dataset_filenames = list(dataset_filenames)
+    if not os.path.exists(filename):
+        return {}, dataset_filenames
+    root = os.path.dirname(os.path.abspath(filename))
+    existing = {entry.path: entry for entry in read_catalog(filename)}
+    entries = {}
+    missing = []
+    for dataset_filename in dataset_filenames:
+        entry = existing.get(os.path.relpath(os.path.abspath(dataset_filename), root))
+        if entry is None:
+            missing.append(dataset_filename)
+        else:
+            entries[dataset_filename] = entry
+    return entries, missing
+
+
+def write_catalog(entries: Iterable[CatalogEntry], filename: str):
+    """Writes a catalog atomically.
+
+    Args:
+        entries: CatalogEntry objects.
+        filename: Catalog filename.
+    """
+    write_manifest(entries, filename)
+
+
+def _file_digest(filename: str) -> str:
+    """Returns the SHA-256 digest of a file."""
+    sha256 = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _build_entries(stale_files: List[StaleFile]) -> List[CatalogEntry]:
+    """Builds catalog entries; files whose contents are unchanged (by checksum) are not scanned."""
+    entries = []
+    to_scan = {}  # Maps filenames to (StaleFile, digest) tuples.
+    for stale_file in stale_files:
+        digest = _file_digest(stale_file.filename)
+        if stale_file.entry is not None and stale_file.entry.sha256 == digest:
+            entries.append(
+                dataclasses.replace(
+                    stale_file.entry, size=stale_file.stat.st_size, mtime_ns=stale_file.stat.st_mtime_ns
+                )
+            )
+            continue
+        to_scan[stale_file.filename] = (stale_file, digest)
+    for dataset_filename, summary in message_helpers.iter_dataset_summaries(list(to_scan), paths=["provenance.doi"]):
+        stale_file, digest = to_scan[dataset_filename]
+        reaction_ids = sorted(reaction_id for reaction_id in summary.reaction_ids if reaction_id)
+        dois = {doi for reaction_dois in summary.values["provenance.doi"] for doi in reaction_dois if doi}
+        entries.append(
+            CatalogEntry(
+                dataset_id=summary.dataset_id,
+                path=stale_file.path,
+                size=stale_file.stat.st_size,
+                mtime_ns=stale_file.stat.st_mtime_ns,
+                sha256=digest,
+                num_reactions=summary.num_reactions,
+                name=summary.name,
+                dois=sorted(dois),
+                min_reaction_id=reaction_ids[0] if reaction_ids else "",
+                max_reaction_id=reaction_ids[-1] if reaction_ids else "",
+            )
+        )
+    return entries
+
+
+def update_catalog(filename: str, dataset_filenames: Iterable[str]) -> List[CatalogEntry]:
+    """Updates a catalog to match a set of Dataset files.
+
+    Entries for files not in `dataset_filenames` are removed. The catalog is
+    only rewritten if it changed.
+
+    Args:
+        filename: Catalog filename; created if it does not exist.
+        dataset_filenames: Dataset filenames.
+
+    Returns:
+        List of CatalogEntry objects, sorted by path.
+
+    Raises:
+        ValueError: if a Dataset cannot be parsed.
+    """
+    return update_manifest(filename, CatalogEntry, dataset_filenames, _build_entries)
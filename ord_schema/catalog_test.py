@@ -0,0 +1,99 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for ord_schema.catalog."""
+
+import os
+from unittest import mock
+
+from absl.testing import absltest
+
+from ord_schema import catalog
+from ord_schema import message_helpers
+from ord_schema.proto import dataset_pb2
+
+
+class CatalogTest(absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_directory = self.create_tempdir()
+        self.catalog_filename = os.path.join(self.test_directory, "catalog.jsonl")
+        os.makedirs(os.path.join(self.test_directory, "data", "ab"))
+        self.filenames = []
+        for i in range(2):
+            dataset = dataset_pb2.Dataset(name=f"dataset {i}", dataset_id=f"ord_dataset-ab{i}")
+            dataset.reactions.add(reaction_id=f"ord-{i}2").provenance.doi = "10.1000/xyz"
+            dataset.reactions.add(reaction_id=f"ord-{i}1").provenance.doi = f"10.1000/{i}"
+            dataset.reactions.add()
+            filename = os.path.join(self.test_directory, "data", "ab", f"ord_dataset-ab{i}.pb.gz")
+            message_helpers.write_message(dataset, filename)
+            self.filenames.append(filename)
+
+    def test_update_catalog(self):
+        entries = catalog.update_catalog(self.catalog_filename, self.filenames)
+        self.assertEqual(catalog.read_catalog(self.catalog_filename), entries)
+        self.assertLen(entries, 2)
+        entry = entries[1]
+        self.assertEqual(entry.dataset_id, "ord_dataset-ab1")
+        self.assertEqual(entry.path, os.path.join("data", "ab", "ord_dataset-ab1.pb.gz"))
+        self.assertEqual(entry.size, os.path.getsize(self.filenames[1]))
+        self.assertEqual(entry.num_reactions, 3)
+        self.assertEqual(entry.name, "dataset 1")
+        self.assertEqual(entry.dois, ["10.1000/1", "10.1000/xyz"])
+        self.assertEqual(entry.min_reaction_id, "ord-11")
+        self.assertEqual(entry.max_reaction_id, "ord-12")
+
+    def test_incremental(self):
+        catalog.update_catalog(self.catalog_filename, self.filenames)
+        # Unchanged files are not read.
+        with mock.patch.object(catalog, "_file_digest", side_effect=AssertionError):
+            catalog.update_catalog(self.catalog_filename, self.filenames)
+        # Touched files are read but not scanned.
+        os.utime(self.filenames[0], ns=(0, 0))
+        with mock.patch.object(message_helpers, "scan_dataset", side_effect=AssertionError):
+            entries = catalog.update_catalog(self.catalog_filename, self.filenames)
+        self.assertEqual(entries[0].mtime_ns, 0)
+        # Modified files are scanned.
+        message_helpers.write_message(dataset_pb2.Dataset(dataset_id="ord_dataset-ab0"), self.filenames[0])
+        entries = catalog.update_catalog(self.catalog_filename, self.filenames)
+        self.assertEqual(entries[0].num_reactions, 0)
+        # Removed files are dropped.
+        entries = catalog.update_catalog(self.catalog_filename, self.filenames[1:])
+        self.assertEqual([entry.dataset_id for entry in entries], ["ord_dataset-ab1"])
+        self.assertEqual(catalog.read_catalog(self.catalog_filename), entries)
+
+    def test_find_entries(self):
+        entries, missing = catalog.find_entries(self.catalog_filename, self.filenames)
+        self.assertEqual(entries, {})
+        self.assertEqual(missing, self.filenames)
+        catalog.update_catalog(self.catalog_filename, self.filenames[:1])
+        with open(self.catalog_filename) as f:
+            expected = f.read()
+        os.utime(self.filenames[0], ns=(0, 0))  # Stale entries are not refreshed.
+        with mock.patch.object(catalog, "_file_digest", side_effect=AssertionError):
+            entries, missing = catalog.find_entries(self.catalog_filename, self.filenames)
+        self.assertEqual(list(entries), self.filenames[:1])
+        self.assertEqual(entries[self.filenames[0]].dataset_id, "ord_dataset-ab0")
+        self.assertEqual(missing, self.filenames[1:])
+        with open(self.catalog_filename) as f:
+            self.assertEqual(f.read(), expected)
+
+    def test_bad_catalog(self):
+        with open(self.catalog_filename, "w") as f:
+            f.write('{"dataset_id": "ord_dataset-ab0"}\n')
+        with self.assertRaisesRegex(ValueError, "line 1"):
+            catalog.read_catalog(self.catalog_filename)
+
+
+if __name__ == "__main__":
+    absltest.main()
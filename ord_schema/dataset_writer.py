@@ -0,0 +1,611 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Streaming writers for Datasets: incremental writes, appends, and shards.
+
+DatasetWriter writes a Dataset one Reaction at a time, with output identical to
+message_helpers.write_message, so Datasets much larger than memory can be
+built, compacted (compact_dataset), extended (append_reactions), split into
+size-bounded shards (ShardedDatasetWriter, shard_dataset), and reassembled
+(merge_shards).
+
+Example:
+    with dataset_writer.DatasetWriter("my_dataset.pb.gz", name="My dataset") as writer:
+        for reaction in reactions:
+            writer.write(reaction)
+"""
+
+import contextlib
+import glob
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+from typing import Iterable, Iterator, List, Optional
+
+from google import protobuf
+from google.protobuf import json_format
+from google.protobuf import text_format  # pytype: disable=import-error
+
+from ord_schema import blocked_gzip
+from ord_schema import message_helpers
+from ord_schema.proto import dataset_pb2
+from ord_schema.proto import reaction_pb2
+
+
+class DatasetWriter:
+    """Writes a Dataset incrementally, one Reaction at a time.
+
+    The output is identical to calling message_helpers.write_message on the complete Dataset,
+    but only one Reaction needs to be in memory at a time.
+
+    Example:
+        with DatasetWriter("my_dataset.pb.gz", name="My dataset") as writer:
+            for reaction in reactions:
+                writer.write(reaction)
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        name: str = "",
+        description: str = "",
+        dataset_id: str = "",
+        reaction_ids: Iterable[str] = (),
+        block_size: Optional[int] = None,
+        num_threads: Optional[int] = None,
+        append: bool = False,
+    ):
+        """Initializes the writer and writes the Dataset header.
+
+        Args:
+            filename: Text output filename.
+            name: Dataset name.
+            description: Dataset description.
+            dataset_id: Dataset ID; written when the writer is closed.
+            reaction_ids: Dataset reaction_ids; written when the writer is
+                closed. Also available (and mutable) as `self.reaction_ids`.
+            block_size: If provided, gzipped output is written as a blocked
+                gzip file; see message_helpers.write_message.
+            num_threads: Number of threads used to compress blocks.
+            append: If True, Reactions are appended to an existing binary
+                Dataset and no other fields are written; see append_reactions.
+
+        Raises:
+            ValueError: if `filename` does not have the expected suffix, or if
+                `append` is True and `filename` is not a binary file.
+        """
+        if filename.endswith(".gz"):
+            _, extension = os.path.splitext(".".join(filename.split(".")[:-1]))
+        else:
+            _, extension = os.path.splitext(filename)
+        self._format = message_helpers.MessageFormat(extension)
+        if append and self._format != message_helpers.MessageFormat.BINARY:
+            raise ValueError(f"only binary Datasets can be appended to: {filename}")
+        self._append = append
+        mode = "ab" if append else "wb"
+        self._filename = filename
+        # Size to truncate to if the writer is aborted; None removes the file.
+        self._original_size = os.path.getsize(filename) if append and os.path.exists(filename) else None
+        self._dataset_id = dataset_id
+        self.reaction_ids = list(reaction_ids)
+        self._block_size = None
+        self._blocked_writer = None
+        self._buffer = bytearray()
+        self._buffer_records = 0
+        self._num_json_fields = 0
+        self.num_reactions = 0
+        if filename.endswith(".gz") and block_size is not None:
+            self._block_size = block_size
+            self._f = open(filename, mode)  # pylint: disable=consider-using-with
+            self._blocked_writer = blocked_gzip.BlockedGzipWriter(self._f, num_threads=num_threads)
+        elif filename.endswith(".gz"):
+            # NOTE(kearnes): Set a constant mtime so that round-trips through gzip
+            # result in identical files.
+            self._f = gzip.GzipFile(filename, mode, mtime=1)
+        else:
+            self._f = open(filename, mode)  # pylint: disable=consider-using-with
+        if append:
+            return
+        if self._format == message_helpers.MessageFormat.JSON:
+            self._write(b"{", 0)
+        self._write_fields(dataset_pb2.Dataset(name=name, description=description))
+
+    def write(self, reaction: reaction_pb2.Reaction):
+        """Appends a Reaction to the Dataset."""
+        if self._format == message_helpers.MessageFormat.BINARY:
+            self.write_serialized(reaction.SerializeToString(deterministic=True))
+            return
+        if self._format == message_helpers.MessageFormat.PBTXT:
+            value = b"".join([b"reactions {\n", text_format.MessageToBytes(reaction, indent=2), b"}\n"])
+        else:
+            value = "    " + _indent_json(json.dumps(json_format.MessageToDict(reaction), indent=2), 4)
+            if self.num_reactions:
+                value = f",\n{value}"
+            else:
+                value = f'{self._json_separator()}  "reactions": [\n{value}'
+            value = value.encode()
+        self._write(value, 1)
+        self.num_reactions += 1
+
+    def write_serialized(self, value: bytes):
+        """Appends a serialized Reaction to the Dataset.
+
+        For binary output, `value` is written directly without being parsed.
+        Use deterministic serialization to match the output of message_helpers.write_message.
+        """
+        if self._format != message_helpers.MessageFormat.BINARY:
+            self.write(reaction_pb2.Reaction.FromString(value))
+            return
+        self._write(
+            b"".join([message_helpers.DATASET_REACTIONS_TAG, message_helpers.encode_varint(len(value)), value]), 1
+        )
+        self.num_reactions += 1
+
+    def close(self):
+        """Writes the Dataset footer and closes the file."""
+        if not self._append:
+            if self._format == message_helpers.MessageFormat.JSON and self.num_reactions:
+                self._write(b"\n  ]", 0)
+            self._write_fields(dataset_pb2.Dataset(dataset_id=self._dataset_id, reaction_ids=self.reaction_ids))
+            if self._format == message_helpers.MessageFormat.JSON:
+                self._write(b"\n}" if self._num_json_fields else b"}", 0)
+        if self._blocked_writer is not None:
+            if self._buffer or not (self._blocked_writer.num_blocks or self._append):
+                self._blocked_writer.write_block(bytes(self._buffer), self._buffer_records)
+            self._blocked_writer.close()
+        self._f.close()
+
+    def abort(self):
+        """Closes the file without writing the Dataset footer and discards the output.
+
+        New files are removed; when appending, the file is truncated to its
+        original size, so the existing Reactions are preserved.
+        """
+        if self._blocked_writer is not None:
+            self._blocked_writer.close()
+        self._f.close()
+        if self._original_size is None:
+            os.remove(self._filename)
+        else:
+            os.truncate(self._filename, self._original_size)
+
+    def __enter__(self) -> "DatasetWriter":
+        return self
+
+    def __exit__(self, exc_type, *args):
+        # NOTE: Finalizing after an error would leave a valid-looking Dataset
+        # that is missing Reactions.
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+    def _json_separator(self) -> str:
+        """Returns the separator for the next top-level JSON field."""
+        self._num_json_fields += 1
+        return ",\n" if self._num_json_fields > 1 else "\n"
+
+    def _write_fields(self, dataset: dataset_pb2.Dataset):
+        """Writes the (non-reaction) fields of a Dataset message."""
+        if self._format == message_helpers.MessageFormat.BINARY:
+            value = dataset.SerializeToString(deterministic=True)
+            for _, _, tag_start, _, value_end in message_helpers.iter_wire_fields(value):
+                self._write(value[tag_start:value_end], 0)
+        elif self._format == message_helpers.MessageFormat.PBTXT:
+            self._write(text_format.MessageToBytes(dataset), 0)
+        else:
+            for key, field_value in json_format.MessageToDict(dataset).items():
+                value = (
+                    f"{self._json_separator()}  {json.dumps(key)}: {_indent_json(json.dumps(field_value, indent=2), 2)}"
+                )
+                self._write(value.encode(), 0)
+
+    def _write(self, value: bytes, num_records: int):
+        """Writes to the output file, splitting blocks like message_helpers.write_message."""
+        if self._blocked_writer is None:
+            self._f.write(value)
+            return
+        if self._format == message_helpers.MessageFormat.BINARY:
+            # Split at record boundaries, as message_helpers.write_message does.
+            if self._buffer and len(self._buffer) + len(value) > self._block_size:
+                self._blocked_writer.write_block(bytes(self._buffer), self._buffer_records)
+                self._buffer.clear()
+                self._buffer_records = 0
+            self._buffer.extend(value)
+            self._buffer_records += num_records
+            return
+        self._buffer.extend(value)
+        while len(self._buffer) >= self._block_size:
+            self._blocked_writer.write_block(bytes(self._buffer[: self._block_size]))
+            del self._buffer[: self._block_size]
+
+
+def append_reactions(
+    filename: str,
+    reactions: Iterable[reaction_pb2.Reaction],
+    block_size: Optional[int] = None,
+    num_threads: Optional[int] = None,
+) -> int:
+    """Appends Reactions to a binary Dataset without reading it.
+
+    Concatenated messages are merged when parsed, so appending serialized
+    Dataset.reactions records (or, for gzipped files, a new gzip member) adds
+    the Reactions to the end of the existing list. The result is no longer in
+    canonical (deterministic) form; use compact_dataset to restore it.
+
+    Args:
+        filename: Dataset filename (*.pb or *.pb.gz). The file is created if it
+            does not exist.
+        reactions: Reactions to append.
+        block_size: Block size used when appending to a blocked gzip file;
+            see message_helpers.write_message. Defaults to message_helpers.BLOCK_SIZE if the existing file is
+            blocked.
+        num_threads: Number of threads used to compress blocks.
+
+    Returns:
+        The number of Reactions appended.
+
+    Raises:
+        ValueError: if `filename` is not a binary file.
+    """
+    if (
+        block_size is None
+        and filename.endswith(".gz")
+        and os.path.exists(filename)
+        and blocked_gzip.is_blocked(filename)
+    ):
+        # NOTE: Every member of a blocked file must be a block.
+        block_size = message_helpers.BLOCK_SIZE
+    with DatasetWriter(filename, block_size=block_size, num_threads=num_threads, append=True) as writer:
+        for reaction in reactions:
+            writer.write(reaction)
+    return writer.num_reactions
+
+
+def compact_dataset(
+    filename: str,
+    output_filename: Optional[str] = None,
+    block_size: Optional[int] = None,
+    num_threads: Optional[int] = None,
+):
+    """Rewrites a binary Dataset in canonical form.
+
+    The output is identical to loading the Dataset and writing it with
+    message_helpers.write_message, but Reactions are streamed from the input
+    (see message_helpers.iter_serialized_reactions) and processed one at a time.
+
+    Args:
+        filename: Dataset filename (*.pb or *.pb.gz).
+        output_filename: Output filename; defaults to `filename`, which is
+            replaced atomically.
+        block_size: If provided, gzipped output is written as a blocked gzip
+            file; see message_helpers.write_message.
+        num_threads: Number of threads used to compress blocks.
+
+    Raises:
+        ValueError: if the Dataset cannot be parsed.
+    """
+    if output_filename is None:
+        output_filename = filename
+    header = message_helpers.read_dataset_header(filename)
+    with _replace_atomically(output_filename) as temp_filename:
+        with DatasetWriter(
+            temp_filename,
+            name=header.name,
+            description=header.description,
+            dataset_id=header.dataset_id,
+            reaction_ids=header.reaction_ids,
+            block_size=block_size,
+            num_threads=num_threads,
+        ) as writer:
+            for value in message_helpers.iter_serialized_reactions(filename):
+                try:
+                    writer.write(reaction_pb2.Reaction.FromString(value))
+                except protobuf.message.DecodeError as error:
+                    raise ValueError(f"error parsing {filename}: {error}") from error
+
+
+@contextlib.contextmanager
+def _replace_atomically(filename: str) -> Iterator[str]:
+    """Yields a temporary filename that atomically replaces `filename` on success.
+
+    The temporary file is removed if the block raises.
+
+    NOTE: The temporary file is in a new directory next to `filename` and has
+    the same basename, since gzip headers include the original filename.
+    """
+    temp_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(filename)))
+    try:
+        temp_filename = os.path.join(temp_dir, os.path.basename(filename))
+        yield temp_filename
+        os.replace(temp_filename, filename)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def get_shard_filename(filename: str, index: int) -> str:
+    """Returns the filename of a Dataset shard.
+
+    For example, shard 2 of "data/my_dataset.pb.gz" is
+    "data/my_dataset-00002.pb.gz".
+    """
+    dirname, basename = os.path.split(filename)
+    stem, dot, suffix = basename.partition(".")
+    return os.path.join(dirname, f"{stem}-{index:05d}{dot}{suffix}")
+
+
+def find_shards(filename: str) -> List[str]:
+    """Finds the shards of a Dataset; see get_shard_filename.
+
+    Args:
+        filename: Unsharded Dataset filename.
+
+    Returns:
+        List of shard filenames, in order.
+
+    Raises:
+        ValueError: if there are no shards or the shard indices are not
+            contiguous.
+    """
+    dirname, basename = os.path.split(filename)
+    stem, dot, suffix = basename.partition(".")
+    pattern = re.compile(rf"{re.escape(stem)}-(\d{{5}}){re.escape(dot + suffix)}")
+    shards = {}
+    for shard_filename in glob.glob(
+        os.path.join(glob.escape(dirname), f"{glob.escape(stem)}-*{glob.escape(dot + suffix)}")
+    ):
+        match = pattern.fullmatch(os.path.basename(shard_filename))
+        if match:
+            shards[int(match.group(1))] = shard_filename
+    if not shards:
+        raise ValueError(f"no shards found for {filename}")
+    if sorted(shards) != list(range(len(shards))):
+        raise ValueError(f"missing shards for {filename}: found indices {sorted(shards)}")
+    return [shards[index] for index in range(len(shards))]
+
+
+class ShardedDatasetWriter:
+    """Writes a Dataset as a sequence of shards with bounded size.
+
+    Reactions are streamed into the current shard until adding the next one
+    would make its serialized (binary, uncompressed) size exceed
+    `max_shard_size`; a shard is only larger than the limit if it contains a
+    single Reaction that is. Sizes are computed with ByteSize, so Reactions are
+    not serialized an extra time.
+
+    Every shard has the name, description, and dataset_id of the full Dataset;
+    the shard index is recorded in the filename (see get_shard_filename), since
+    the schema has no field for it. Use merge_shards to reassemble the Dataset.
+
+    Example:
+        with ShardedDatasetWriter("my_dataset.pb.gz", max_shard_size=1 << 26) as writer:
+            for reaction in reactions:
+                writer.write(reaction)
+        print(writer.filenames)
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        max_shard_size: int,
+        name: str = "",
+        description: str = "",
+        dataset_id: str = "",
+        reaction_ids: Iterable[str] = (),
+        block_size: Optional[int] = None,
+        num_threads: Optional[int] = None,
+    ):
+        """Initializes the writer.
+
+        Args:
+            filename: Unsharded output filename; shard filenames are derived
+                from it with get_shard_filename.
+            max_shard_size: Maximum serialized size (in bytes) of each shard.
+            name: Dataset name.
+            description: Dataset description.
+            dataset_id: Dataset ID.
+            reaction_ids: Dataset reaction_ids; written to the first shard.
+            block_size: If provided, gzipped output is written as a blocked
+                gzip file; see message_helpers.write_message.
+            num_threads: Number of threads used to compress blocks.
+
+        Raises:
+            ValueError: if `max_shard_size` is not positive.
+        """
+        if max_shard_size <= 0:
+            raise ValueError("max_shard_size must be positive")
+        self._filename = filename
+        self._max_shard_size = max_shard_size
+        self._header = dataset_pb2.Dataset(name=name, description=description, dataset_id=dataset_id)
+        self._reaction_ids = list(reaction_ids)
+        self._block_size = block_size
+        self._num_threads = num_threads
+        self._writer = None
+        self._shard_size = 0
+        self.filenames = []
+        self.num_reactions = 0
+
+    def write(self, reaction: reaction_pb2.Reaction):
+        """Appends a Reaction to the Dataset."""
+        self._get_writer(reaction.ByteSize()).write(reaction)
+        self.num_reactions += 1
+
+    def write_serialized(self, value: bytes):
+        """Appends a serialized Reaction to the Dataset; see DatasetWriter.write_serialized."""
+        self._get_writer(len(value)).write_serialized(value)
+        self.num_reactions += 1
+
+    def close(self):
+        """Closes the current shard; always writes at least one shard."""
+        if self._writer is None:
+            self._open_shard()
+        self._writer.close()
+
+    def abort(self):
+        """Discards the current shard and removes the shards already written."""
+        if self._writer is not None:
+            self._writer.abort()
+        for filename in self.filenames[:-1]:
+            os.remove(filename)
+        self.filenames = []
+
+    def __enter__(self) -> "ShardedDatasetWriter":
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+    def _get_writer(self, size: int) -> DatasetWriter:
+        """Returns the writer for a Reaction of the given serialized size."""
+        record_size = len(message_helpers.DATASET_REACTIONS_TAG) + len(message_helpers.encode_varint(size)) + size
+        if self._writer is None or (
+            self._writer.num_reactions and self._shard_size + record_size > self._max_shard_size
+        ):
+            if self._writer is not None:
+                self._writer.close()
+            self._open_shard()
+        self._shard_size += record_size
+        return self._writer
+
+    def _open_shard(self):
+        """Starts a new shard."""
+        header = dataset_pb2.Dataset()
+        header.CopyFrom(self._header)
+        if not self.filenames:
+            header.reaction_ids.extend(self._reaction_ids)
+        filename = get_shard_filename(self._filename, len(self.filenames))
+        self._writer = DatasetWriter(
+            filename,
+            name=header.name,
+            description=header.description,
+            dataset_id=header.dataset_id,
+            reaction_ids=header.reaction_ids,
+            block_size=self._block_size,
+            num_threads=self._num_threads,
+        )
+        self._shard_size = header.ByteSize()
+        self.filenames.append(filename)
+
+
+def shard_dataset(
+    filename: str,
+    max_shard_size: int,
+    output_filename: Optional[str] = None,
+    block_size: Optional[int] = None,
+    num_threads: Optional[int] = None,
+) -> List[str]:
+    """Splits a binary Dataset into shards; see ShardedDatasetWriter.
+
+    Reactions are streamed from the input (see message_helpers.iter_serialized_reactions)
+    and copied without being parsed when the output is binary, so the Dataset is
+    never held in memory.
+
+    Args:
+        filename: Dataset filename (*.pb or *.pb.gz).
+        max_shard_size: Maximum serialized size (in bytes) of each shard.
+        output_filename: Unsharded output filename; defaults to `filename`.
+        block_size: If provided, gzipped output is written as a blocked gzip
+            file; see message_helpers.write_message.
+        num_threads: Number of threads used to compress blocks.
+
+    Returns:
+        List of shard filenames.
+
+    Raises:
+        ValueError: if the Dataset cannot be parsed.
+    """
+    if output_filename is None:
+        output_filename = filename
+    header = message_helpers.read_dataset_header(filename)
+    with ShardedDatasetWriter(
+        output_filename,
+        max_shard_size=max_shard_size,
+        name=header.name,
+        description=header.description,
+        dataset_id=header.dataset_id,
+        reaction_ids=header.reaction_ids,
+        block_size=block_size,
+        num_threads=num_threads,
+    ) as writer:
+        for value in message_helpers.iter_serialized_reactions(filename):
+            writer.write_serialized(value)
+    return writer.filenames
+
+
+def merge_shards(
+    filenames: Iterable[str],
+    output_filename: str,
+    block_size: Optional[int] = None,
+    num_threads: Optional[int] = None,
+) -> int:
+    """Merges binary Dataset shards into a single Dataset.
+
+    Shards are streamed one Reaction at a time (see
+    message_helpers.iter_serialized_reactions) and their Reactions are copied
+    without being parsed when the output is binary.
+
+    Args:
+        filenames: Shard filenames (*.pb or *.pb.gz), in order; see
+            find_shards.
+        output_filename: Output filename.
+        block_size: If provided, gzipped output is written as a blocked gzip
+            file; see message_helpers.write_message.
+        num_threads: Number of threads used to compress blocks.
+
+    Returns:
+        The number of Reactions in the merged Dataset.
+
+    Raises:
+        ValueError: if a shard cannot be parsed or the shards do not belong to
+            the same Dataset.
+    """
+    filenames = list(filenames)
+    if not filenames:
+        raise ValueError("no shards to merge")
+    writer = None
+    first_header = None
+    with _replace_atomically(output_filename) as temp_filename:
+        with contextlib.ExitStack() as stack:
+            for filename in filenames:
+                header = message_helpers.read_dataset_header(filename)
+                reaction_ids = list(header.reaction_ids)
+                del header.reaction_ids[:]
+                if writer is None:
+                    first_header = header
+                    writer = stack.enter_context(
+                        DatasetWriter(
+                            temp_filename,
+                            name=header.name,
+                            description=header.description,
+                            dataset_id=header.dataset_id,
+                            block_size=block_size,
+                            num_threads=num_threads,
+                        )
+                    )
+                elif header != first_header:
+                    raise ValueError(f"shard does not match the first shard: {filename}")
+                writer.reaction_ids.extend(reaction_ids)
+                for value in message_helpers.iter_serialized_reactions(filename):
+                    writer.write_serialized(value)
+    return writer.num_reactions
+
+
+def _indent_json(value: str, indent: int) -> str:
+    """Indents all lines of a JSON string after the first."""
+    return value.replace("\n", "\n" + " " * indent)
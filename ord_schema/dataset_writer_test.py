@@ -0,0 +1,273 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for ord_schema.dataset_writer."""
+
+import os
+from unittest import mock
+
+from absl.testing import absltest
+from absl.testing import parameterized
+
+from ord_schema import blocked_gzip
+from ord_schema import dataset_writer
+from ord_schema import message_helpers
+from ord_schema.proto import dataset_pb2
+from ord_schema.proto import reaction_pb2
+
+
+class DatasetWriterTest(parameterized.TestCase, absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_directory = self.create_tempdir()
+        self.reactions = []
+        for i in range(10):
+            reaction = reaction_pb2.Reaction(reaction_id=f"ord-{i}")
+            reaction.identifiers.add(type="REACTION_SMILES", value="C" * (i + 1))
+            reaction.outcomes.add().conversion.value = i
+            self.reactions.append(reaction)
+
+    def _write_both(self, suffix, reactions, block_size=None, **kwargs):
+        """Returns the outputs of write_message and DatasetWriter."""
+        filename = os.path.join(self.test_directory, f"dataset{suffix}")
+        dataset = dataset_pb2.Dataset(reactions=reactions, **kwargs)
+        message_helpers.write_message(dataset, filename, block_size=block_size)
+        with open(filename, "rb") as f:
+            expected = f.read()
+        with dataset_writer.DatasetWriter(filename, block_size=block_size, **kwargs) as writer:
+            for reaction in reactions:
+                writer.write(reaction)
+        self.assertEqual(writer.num_reactions, len(reactions))
+        with open(filename, "rb") as f:
+            return f.read(), expected
+
+    @parameterized.product(
+        suffix=[".pb", ".pb.gz", ".pbtxt", ".pbtxt.gz", ".json", ".json.gz"], num_reactions=[0, 1, 10]
+    )
+    def test_matches_write_message(self, suffix, num_reactions):
+        value, expected = self._write_both(
+            suffix,
+            self.reactions[:num_reactions],
+            name="test",
+            description="test dataset",
+            dataset_id="ord_dataset-1",
+            reaction_ids=["ord-a", "ord-b"],
+        )
+        self.assertEqual(value, expected)
+
+    @parameterized.product(suffix=[".pb.gz", ".pbtxt.gz"], block_size=[1, 64, 1 << 20])
+    def test_matches_write_message_blocked(self, suffix, block_size):
+        value, expected = self._write_both(suffix, self.reactions, block_size=block_size, name="test")
+        self.assertEqual(value, expected)
+
+    def test_write_serialized(self):
+        filename = os.path.join(self.test_directory, "dataset.pb")
+        with dataset_writer.DatasetWriter(filename, name="test") as writer:
+            for reaction in self.reactions:
+                writer.write_serialized(reaction.SerializeToString())
+        dataset = message_helpers.load_message(filename, dataset_pb2.Dataset)
+        self.assertEqual(dataset, dataset_pb2.Dataset(name="test", reactions=self.reactions))
+
+    @parameterized.parameters((".pb", None), (".pb.gz", None), (".pb.gz", 64), (".json", None))
+    def test_error_removes_output(self, suffix, block_size):
+        filename = os.path.join(self.test_directory, f"dataset{suffix}")
+        with self.assertRaisesRegex(RuntimeError, "interrupted"):
+            with dataset_writer.DatasetWriter(filename, name="test", block_size=block_size) as writer:
+                writer.write(self.reactions[0])
+                raise RuntimeError("interrupted")
+        self.assertFalse(os.path.exists(filename))
+
+    @parameterized.parameters((".pb", None), (".pb.gz", None), (".pb.gz", 64))
+    def test_error_preserves_appended_file(self, suffix, block_size):
+        filename = os.path.join(self.test_directory, f"dataset{suffix}")
+        message_helpers.write_message(
+            dataset_pb2.Dataset(reactions=self.reactions[:2]), filename, block_size=block_size
+        )
+        with open(filename, "rb") as f:
+            expected = f.read()
+        with self.assertRaisesRegex(RuntimeError, "interrupted"):
+            with dataset_writer.DatasetWriter(filename, block_size=block_size, append=True) as writer:
+                writer.write(self.reactions[2])
+                raise RuntimeError("interrupted")
+        with open(filename, "rb") as f:
+            self.assertEqual(f.read(), expected)
+
+    def test_message_helpers_exports(self):
+        self.assertIs(message_helpers.DatasetWriter, dataset_writer.DatasetWriter)
+        self.assertIs(message_helpers.append_reactions, dataset_writer.append_reactions)
+        self.assertIs(message_helpers.shard_dataset, dataset_writer.shard_dataset)
+        with self.assertRaises(AttributeError):
+            getattr(message_helpers, "NotAWriter")
+
+    def test_bad_suffix(self):
+        with self.assertRaisesRegex(ValueError, "not a valid MessageFormat"):
+            dataset_writer.DatasetWriter(os.path.join(self.test_directory, "dataset.proto"))
+
+
+class AppendReactionsTest(parameterized.TestCase, absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_directory = self.create_tempdir()
+        self.dataset = dataset_pb2.Dataset(name="test", dataset_id="ord_dataset-1", reaction_ids=["ord-a"])
+        self.dataset.reactions.add(reaction_id="ord-1")
+        self.new_reactions = [reaction_pb2.Reaction(reaction_id=f"ord-{i}") for i in range(2, 5)]
+
+    @parameterized.parameters((".pb", None), (".pb.gz", None), (".pb.gz", 10))
+    def test_append_reactions(self, suffix, block_size):
+        filename = os.path.join(self.test_directory, f"dataset{suffix}")
+        message_helpers.write_message(self.dataset, filename, block_size=block_size)
+        self.assertEqual(dataset_writer.append_reactions(filename, self.new_reactions[:1]), 1)
+        self.assertEqual(dataset_writer.append_reactions(filename, self.new_reactions[1:]), 2)
+        self.dataset.reactions.extend(self.new_reactions)
+        self.assertEqual(message_helpers.load_message(filename, dataset_pb2.Dataset), self.dataset)
+        if block_size is not None:
+            self.assertEqual(message_helpers.load_reaction(filename, 3), self.new_reactions[-1])
+
+    def test_append_to_new_file(self):
+        filename = os.path.join(self.test_directory, "dataset.pb")
+        dataset_writer.append_reactions(filename, self.new_reactions)
+        self.assertEqual(
+            message_helpers.load_message(filename, dataset_pb2.Dataset),
+            dataset_pb2.Dataset(reactions=self.new_reactions),
+        )
+
+    def test_append_text(self):
+        filename = os.path.join(self.test_directory, "dataset.pbtxt")
+        message_helpers.write_message(self.dataset, filename)
+        with self.assertRaisesRegex(ValueError, "only binary Datasets"):
+            dataset_writer.append_reactions(filename, self.new_reactions)
+
+    def test_compact_dataset(self):
+        filename = os.path.join(self.test_directory, "dataset.pb")
+        message_helpers.write_message(self.dataset, filename)
+        dataset_writer.append_reactions(filename, self.new_reactions)
+        self.dataset.reactions.extend(self.new_reactions)
+        output_filename = os.path.join(self.create_tempdir(), "dataset.pb.gz")
+        # Reactions are streamed instead of reading the whole file.
+        with mock.patch.object(message_helpers, "_read_serialized_dataset", side_effect=AssertionError):
+            dataset_writer.compact_dataset(filename, output_filename, block_size=10)
+            dataset_writer.compact_dataset(output_filename, os.path.join(self.create_tempdir(), "dataset.pb"))
+        self.assertEqual(message_helpers.load_message(output_filename, dataset_pb2.Dataset), self.dataset)
+        self.assertEqual(sum(block.num_records for block in blocked_gzip.read_index(output_filename)), 4)
+        dataset_writer.compact_dataset(filename)
+        with open(filename, "rb") as f:
+            self.assertEqual(f.read(), self.dataset.SerializeToString(deterministic=True))
+        self.assertEqual(os.listdir(self.test_directory), ["dataset.pb"])
+
+    def test_compact_dataset_error(self):
+        filename = os.path.join(self.test_directory, "dataset.pb")
+        tag = (dataset_pb2.Dataset.REACTIONS_FIELD_NUMBER << 3) | 2
+        value = self.dataset.SerializeToString() + bytes([tag, 2, 0xFF, 0xFF])  # Invalid Reaction.
+        with open(filename, "wb") as f:
+            f.write(value)
+        with self.assertRaisesRegex(ValueError, "error parsing"):
+            dataset_writer.compact_dataset(filename)
+        with open(filename, "rb") as f:
+            self.assertEqual(f.read(), value)
+        self.assertEqual(os.listdir(self.test_directory), ["dataset.pb"])
+
+
+class ShardDatasetTest(parameterized.TestCase, absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_directory = self.create_tempdir()
+        self.dataset = dataset_pb2.Dataset(
+            name="test", description="test dataset", dataset_id="ord_dataset-1", reaction_ids=["ord-a"]
+        )
+        for i in range(10):
+            reaction = self.dataset.reactions.add(reaction_id=f"ord-{i}")
+            reaction.identifiers.add(type="REACTION_SMILES", value="C" * 100)
+
+    def test_get_shard_filename(self):
+        self.assertEqual(dataset_writer.get_shard_filename("data/dataset.pb.gz", 12), "data/dataset-00012.pb.gz")
+        self.assertEqual(dataset_writer.get_shard_filename("dataset", 0), "dataset-00000")
+
+    @parameterized.parameters((".pb", None), (".pb.gz", None), (".pb.gz", 100))
+    def test_round_trip(self, suffix, block_size):
+        filename = os.path.join(self.test_directory, f"dataset{suffix}")
+        message_helpers.write_message(self.dataset, filename)
+        max_shard_size = 3 * self.dataset.reactions[0].ByteSize() + 50
+        # Reactions are streamed instead of reading whole files.
+        with mock.patch.object(message_helpers, "_read_serialized_dataset", side_effect=AssertionError):
+            shards = dataset_writer.shard_dataset(filename, max_shard_size, block_size=block_size)
+        self.assertLen(shards, 4)
+        self.assertEqual(dataset_writer.find_shards(filename), shards)
+        for index, shard in enumerate(shards):
+            self.assertEqual(shard, os.path.join(self.test_directory, f"dataset-{index:05d}{suffix}"))
+            dataset = message_helpers.load_message(shard, dataset_pb2.Dataset)
+            self.assertEqual(dataset.name, "test")
+            self.assertEqual(dataset.description, "test dataset")
+            self.assertEqual(dataset.dataset_id, "ord_dataset-1")
+            self.assertLessEqual(dataset.ByteSize(), max_shard_size)
+            self.assertEqual(list(dataset.reaction_ids), ["ord-a"] if index == 0 else [])
+        output_filename = os.path.join(self.create_tempdir(), f"dataset{suffix}")
+        with mock.patch.object(message_helpers, "_read_serialized_dataset", side_effect=AssertionError):
+            self.assertEqual(dataset_writer.merge_shards(shards, output_filename), 10)
+        with open(filename, "rb") as f, open(output_filename, "rb") as g:
+            self.assertEqual(f.read(), g.read())
+
+    def test_sharded_writer(self):
+        filename = os.path.join(self.test_directory, "dataset.pbtxt")
+        with dataset_writer.ShardedDatasetWriter(filename, max_shard_size=1, name="test") as writer:
+            for reaction in self.dataset.reactions[:3]:
+                writer.write(reaction)
+        # Each Reaction is larger than the limit, so each gets its own shard.
+        self.assertLen(writer.filenames, 3)
+        self.assertEqual(writer.num_reactions, 3)
+        dataset = message_helpers.load_message(writer.filenames[2], dataset_pb2.Dataset)
+        self.assertEqual(dataset, dataset_pb2.Dataset(name="test", reactions=[self.dataset.reactions[2]]))
+
+    def test_sharded_writer_error(self):
+        filename = os.path.join(self.test_directory, "dataset.pb")
+        with self.assertRaisesRegex(RuntimeError, "interrupted"):
+            with dataset_writer.ShardedDatasetWriter(filename, max_shard_size=1, name="test") as writer:
+                for reaction in self.dataset.reactions[:3]:
+                    writer.write(reaction)
+                raise RuntimeError("interrupted")
+        self.assertEqual(writer.filenames, [])
+        self.assertEqual(os.listdir(self.test_directory), [])
+
+    def test_sharded_writer_empty(self):
+        filename = os.path.join(self.test_directory, "dataset.pb")
+        with dataset_writer.ShardedDatasetWriter(filename, max_shard_size=100, name="test") as writer:
+            pass
+        self.assertEqual(writer.filenames, [os.path.join(self.test_directory, "dataset-00000.pb")])
+
+    def test_sharded_writer_bad_size(self):
+        with self.assertRaisesRegex(ValueError, "must be positive"):
+            dataset_writer.ShardedDatasetWriter("dataset.pb", max_shard_size=0)
+
+    def test_find_shards_missing(self):
+        filename = os.path.join(self.test_directory, "dataset.pb")
+        with self.assertRaisesRegex(ValueError, "no shards found"):
+            dataset_writer.find_shards(filename)
+        message_helpers.write_message(self.dataset, dataset_writer.get_shard_filename(filename, 1))
+        with self.assertRaisesRegex(ValueError, "missing shards"):
+            dataset_writer.find_shards(filename)
+
+    def test_merge_mismatch(self):
+        shards = []
+        for i in range(2):
+            shard = os.path.join(self.test_directory, f"dataset-{i:05d}.pb")
+            message_helpers.write_message(dataset_pb2.Dataset(name=f"test {i}"), shard)
+            shards.append(shard)
+        output_filename = os.path.join(self.test_directory, "dataset.pb")
+        with self.assertRaisesRegex(ValueError, "does not match"):
+            dataset_writer.merge_shards(shards, output_filename)
+        self.assertFalse(os.path.exists(output_filename))
+        with self.assertRaisesRegex(ValueError, "no shards"):
+            dataset_writer.merge_shards([], output_filename)
+
+
+if __name__ == "__main__":
+    absltest.main()
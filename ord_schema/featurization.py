@@ -0,0 +1,147 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit-normalized numeric features for Reactions.
+
+featurize_reactions walks each Reaction once and returns a dense array with one
+row per Reaction and one column per feature, along with a mask marking which
+values are present. Values are converted to base units (see
+units.to_base_units). The columns depend only on the schema, never on the
+data, so arrays from different batches can be stacked directly.
+
+Features (in the order of FEATURE_NAMES):
+    inputs.<ROLE>.{moles,mass,volume}: Total amount of the input components
+        with each reaction role, in mol, kg, and L.
+    conditions.temperature.setpoint: Temperature setpoint, in K.
+    conditions.pressure.setpoint: Pressure setpoint, in Pa.
+    conditions.stirring.rate.rpm: Stirring rate, in rpm.
+    outcomes.reaction_time: Reaction time of the first outcome, in s.
+    outcomes.products.yield: Yield (percentage) of the first desired product
+        with a yield in the first outcome; if no desired product has a yield,
+        the first product with a yield is used.
+
+Example:
+    features = featurization.featurize_reactions(dataset.reactions)
+    temperature = features.values[:, features.names.index("conditions.temperature.setpoint")]
+"""
+
+import dataclasses
+import itertools
+import math
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+import ord_schema
+from ord_schema import message_helpers
+from ord_schema import units
+from ord_schema.proto import reaction_pb2
+
+_ROLES = tuple(value.name for value in reaction_pb2.ReactionRole.ReactionRoleType.DESCRIPTOR.values if value.number)
+_AMOUNT_KINDS = ("moles", "mass", "volume")
+# Maps (reaction role, amount kind) to column indices.
+_AMOUNT_COLUMNS = {
+    (reaction_pb2.ReactionRole.ReactionRoleType.Value(role), kind): i * len(_AMOUNT_KINDS) + j
+    for i, role in enumerate(_ROLES)
+    for j, kind in enumerate(_AMOUNT_KINDS)
+}
+FEATURE_NAMES = tuple(f"inputs.{role}.{kind}" for role in _ROLES for kind in _AMOUNT_KINDS) + (
+    "conditions.temperature.setpoint",
+    "conditions.pressure.setpoint",
+    "conditions.stirring.rate.rpm",
+    "outcomes.reaction_time",
+    "outcomes.products.yield",
+)
+_TEMPERATURE, _PRESSURE, _STIRRING_RATE, _REACTION_TIME, _YIELD = range(len(_AMOUNT_COLUMNS), len(FEATURE_NAMES))
+
+# Number of Reactions converted to an array at a time.
+_CHUNK_SIZE = 10000
+
+
+@dataclasses.dataclass(frozen=True)
+class Features:
+    """Numeric features for a batch of Reactions."""
+
+    names: List[str]  # Column names; see FEATURE_NAMES.
+    values: np.ndarray  # Shape (num_reactions, num_features); NaN where missing.
+    mask: np.ndarray  # Same shape as `values`; True where values are present.
+
+
+def featurize_reactions(reactions: Iterable[reaction_pb2.Reaction]) -> Features:
+    """Computes unit-normalized numeric features for Reactions.
+
+    Args:
+        reactions: Iterable of Reactions.
+
+    Returns:
+        Features.
+    """
+    chunks = []
+    iterator = iter(reactions)
+    while True:
+        rows = [_featurize_reaction(reaction) for reaction in itertools.islice(iterator, _CHUNK_SIZE)]
+        if not rows:
+            break
+        chunks.append(np.array(rows, dtype=np.float64))
+    if chunks:
+        values = np.concatenate(chunks)
+    else:
+        values = np.empty((0, len(FEATURE_NAMES)), dtype=np.float64)
+    return Features(names=list(FEATURE_NAMES), values=values, mask=~np.isnan(values))
+
+
+def _featurize_reaction(reaction: reaction_pb2.Reaction) -> List[float]:
+    """Returns the features for a single Reaction; missing values are NaN."""
+    row = [np.nan] * len(FEATURE_NAMES)
+    for reaction_input in reaction.inputs.values():
+        for component in reaction_input.components:
+            kind = component.amount.WhichOneof("kind")
+            if kind not in _AMOUNT_KINDS:
+                continue
+            column = _AMOUNT_COLUMNS.get((component.reaction_role, kind))
+            value = units.to_base_units(getattr(component.amount, kind))
+            if column is None or value is None:
+                continue
+            row[column] = value if math.isnan(row[column]) else row[column] + value
+    conditions = reaction.conditions
+    row[_TEMPERATURE] = _get_value(conditions.temperature.setpoint)
+    row[_PRESSURE] = _get_value(conditions.pressure.setpoint)
+    if conditions.stirring.rate.rpm:
+        row[_STIRRING_RATE] = conditions.stirring.rate.rpm
+    if reaction.outcomes:
+        outcome = reaction.outcomes[0]
+        row[_REACTION_TIME] = _get_value(outcome.reaction_time)
+        product_yield = _get_product_yield(outcome)
+        if product_yield is not None:
+            row[_YIELD] = product_yield
+    return row
+
+
+def _get_value(message: ord_schema.UnitMessage) -> float:
+    """Returns the value of a message in base units; NaN if it is not set."""
+    value = units.to_base_units(message)
+    return np.nan if value is None else value
+
+
+def _get_product_yield(outcome: reaction_pb2.ReactionOutcome) -> Optional[float]:
+    """Returns the yield of the first desired product (or any product) with a yield."""
+    fallback = None
+    for product in outcome.products:
+        product_yield = message_helpers.get_product_yield(product)
+        if product_yield is None:
+            continue
+        if product.is_desired_product:
+            return product_yield
+        if fallback is None:
+            fallback = product_yield
+    return fallback
@@ -0,0 +1,83 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for ord_schema.featurization."""
+
+from absl.testing import absltest
+import numpy as np
+
+from ord_schema import featurization
+from ord_schema.proto import reaction_pb2
+
+
+class FeaturizeReactionsTest(absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        reaction = reaction_pb2.Reaction()
+        components = reaction.inputs["test"].components
+        reactant = components.add(reaction_role="REACTANT")
+        reactant.amount.moles.value = 2
+        reactant.amount.moles.units = reaction_pb2.Moles.MILLIMOLE
+        reactant = components.add(reaction_role="REACTANT")
+        reactant.amount.moles.value = 500
+        reactant.amount.moles.units = reaction_pb2.Moles.MICROMOLE
+        solvent = components.add(reaction_role="SOLVENT")
+        solvent.amount.volume.value = 10
+        solvent.amount.volume.units = reaction_pb2.Volume.MILLILITER
+        components.add(reaction_role="CATALYST").amount.unmeasured.type = reaction_pb2.UnmeasuredAmount.CATALYTIC
+        reaction.conditions.temperature.setpoint.value = 100
+        reaction.conditions.temperature.setpoint.units = reaction_pb2.Temperature.CELSIUS
+        reaction.conditions.pressure.setpoint.value = 1
+        reaction.conditions.pressure.setpoint.units = reaction_pb2.Pressure.ATMOSPHERE
+        reaction.conditions.stirring.rate.rpm = 300
+        outcome = reaction.outcomes.add()
+        outcome.reaction_time.value = 30
+        outcome.reaction_time.units = reaction_pb2.Time.MINUTE
+        byproduct = outcome.products.add()
+        byproduct.measurements.add(type="YIELD").percentage.value = 10
+        product = outcome.products.add(is_desired_product=True)
+        product.measurements.add(type="YIELD").percentage.value = 75
+        self.reaction = reaction
+
+    def test_featurize_reactions(self):
+        features = featurization.featurize_reactions([self.reaction, reaction_pb2.Reaction()])
+        self.assertEqual(features.names, list(featurization.FEATURE_NAMES))
+        self.assertEqual(features.values.shape, (2, len(featurization.FEATURE_NAMES)))
+        expected = {
+            "inputs.REACTANT.moles": 2.5e-3,
+            "inputs.SOLVENT.volume": 0.01,
+            "conditions.temperature.setpoint": 373.15,
+            "conditions.pressure.setpoint": 101325,
+            "conditions.stirring.rate.rpm": 300,
+            "outcomes.reaction_time": 1800,
+            "outcomes.products.yield": 75,
+        }
+        np.testing.assert_array_equal(features.mask[0], [name in expected for name in features.names])
+        for name, value in expected.items():
+            self.assertAlmostEqual(features.values[0, features.names.index(name)], value, places=6)
+        self.assertFalse(features.mask[1].any())
+        self.assertTrue(np.isnan(features.values[1]).all())
+
+    def test_featurize_reactions_empty(self):
+        features = featurization.featurize_reactions([])
+        self.assertEqual(features.values.shape, (0, len(featurization.FEATURE_NAMES)))
+        self.assertEqual(features.mask.shape, features.values.shape)
+
+    def test_fallback_yield(self):
+        self.reaction.outcomes[0].products[1].ClearField("measurements")
+        features = featurization.featurize_reactions([self.reaction])
+        self.assertEqual(features.values[0, features.names.index("outcomes.products.yield")], 10)
+
+
+if __name__ == "__main__":
+    absltest.main()
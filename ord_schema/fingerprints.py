@@ -0,0 +1,343 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Batched Morgan fingerprints for Reactions, aggregated by reaction role.
+
+build_fingerprints collects the distinct structures in a batch of Reactions,
+fingerprints each structure once (optionally in a process pool), and ORs the
+fingerprints of the compounds with each reaction role together. The result is
+a packed bit array with one row per Reaction.
+
+Fingerprints can be stored in a persistent FingerprintCache (an SQLite
+database) keyed by canonical SMILES and fingerprint parameters, so repeated
+runs over the same corpus only fingerprint new structures. Compounds whose
+first structural identifier is already a canonical SMILES in the cache are not
+parsed at all.
+
+Example:
+    matrix = fingerprints.build_fingerprints(
+        dataset.reactions, roles=["REACTANT", "CATALYST"], cache_filename="fingerprints.sqlite", num_workers=8
+    )
+    bits = matrix.unpack()  # Shape (num_reactions, 2 * 2048).
+"""
+
+import concurrent.futures
+import dataclasses
+import functools
+import itertools
+import sqlite3
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from absl import logging
+import numpy as np
+from rdkit import Chem
+from rdkit.Chem import rdFingerprintGenerator
+
+from ord_schema import message_helpers
+from ord_schema.proto import reaction_pb2
+
+DEFAULT_ROLES = ("REACTANT", "REAGENT", "SOLVENT", "CATALYST", "PRODUCT")
+
+# Identifier types that are used by message_helpers.mol_from_compound.
+_STRUCTURAL_IDENTIFIER_TYPES = frozenset(
+    [
+        reaction_pb2.CompoundIdentifier.SMILES,
+        reaction_pb2.CompoundIdentifier.INCHI,
+        reaction_pb2.CompoundIdentifier.MOLBLOCK,
+    ]
+)
+# Maximum number of parameters in a single SQLite query.
+_QUERY_SIZE = 500
+# Number of structures fingerprinted per worker task.
+_CHUNK_SIZE = 1000
+
+# Structures are identified by their (type, value) structural identifiers.
+StructureKey = Tuple[Tuple[int, str], ...]
+
+
+@dataclasses.dataclass(frozen=True)
+class FingerprintParameters:
+    """Morgan fingerprint parameters."""
+
+    radius: int = 2
+    num_bits: int = 2048
+    use_chirality: bool = False
+
+    def __post_init__(self):
+        if self.num_bits <= 0 or self.num_bits % 8:
+            raise ValueError(f"num_bits must be a positive multiple of 8: {self.num_bits}")
+
+    @property
+    def key(self) -> str:
+        """Returns a string that identifies these parameters in a FingerprintCache."""
+        return f"morgan:radius={self.radius}:num_bits={self.num_bits}:use_chirality={int(self.use_chirality)}"
+
+
+@dataclasses.dataclass(frozen=True)
+class FingerprintMatrix:
+    """Role-aggregated fingerprints for a batch of Reactions."""
+
+    roles: List[str]
+    parameters: FingerprintParameters
+    packed: np.ndarray  # uint8 with shape (num_reactions, len(roles), num_bits // 8); see np.packbits.
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """Returns the shape of the unpacked matrix."""
+        return self.packed.shape[0], len(self.roles) * self.parameters.num_bits
+
+    def unpack(self) -> np.ndarray:
+        """Returns a dense uint8 bit matrix; role blocks are concatenated in the order of `roles`."""
+        return np.unpackbits(self.packed, axis=-1).reshape(self.shape)
+
+    def to_csr_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns (data, indices, indptr) for the unpacked matrix in CSR format.
+
+        For example: scipy.sparse.csr_matrix(matrix.to_csr_arrays(), shape=matrix.shape).
+        """
+        indptr = np.zeros(self.shape[0] + 1, dtype=np.int64)
+        indices = []
+        for i, row in enumerate(self.packed.reshape(self.shape[0], self.shape[1] // 8)):
+            (columns,) = np.nonzero(np.unpackbits(row))
+            indices.append(columns)
+            indptr[i + 1] = indptr[i] + len(columns)
+        indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+        return np.ones(len(indices), dtype=np.uint8), indices, indptr
+
+
+class FingerprintCache:
+    """Persistent fingerprint cache keyed by (parameters, canonical SMILES).
+
+    Example:
+        with FingerprintCache("fingerprints.sqlite") as cache:
+            cache.put(parameters, {"CCO": fingerprint})
+    """
+
+    def __init__(self, filename: str, read_only: bool = False):
+        """Opens (or creates) a cache.
+
+        Args:
+            filename: SQLite database filename.
+            read_only: If True, the cache is opened read-only (it must exist).
+        """
+        if read_only:
+            self._connection = sqlite3.connect(f"file:{filename}?mode=ro", uri=True)
+        else:
+            self._connection = sqlite3.connect(filename)
+            with self._connection:
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS fingerprints "
+                    "(parameters TEXT NOT NULL, smiles TEXT NOT NULL, fingerprint BLOB NOT NULL, "
+                    "PRIMARY KEY (parameters, smiles)) WITHOUT ROWID"
+                )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def get(self, parameters: FingerprintParameters, smiles: Iterable[str]) -> Dict[str, bytes]:
+        """Looks up fingerprints.
+
+        Args:
+            parameters: FingerprintParameters.
+            smiles: Canonical SMILES.
+
+        Returns:
+            Dict mapping SMILES to packed fingerprints; missing SMILES are omitted.
+        """
+        results = {}
+        smiles = list(smiles)
+        for start in range(0, len(smiles), _QUERY_SIZE):
+            chunk = smiles[start : start + _QUERY_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = self._connection.execute(
+                f"SELECT smiles, fingerprint FROM fingerprints WHERE parameters = ? AND smiles IN ({placeholders})",
+                [parameters.key, *chunk],
+            )
+            results.update(cursor)
+        return results
+
+    def put(self, parameters: FingerprintParameters, fingerprints: Dict[str, bytes]):
+        """Adds fingerprints.
+
+        Args:
+            parameters: FingerprintParameters.
+            fingerprints: Dict mapping canonical SMILES to packed fingerprints.
+        """
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?)",
+                ((parameters.key, smiles, fingerprint) for smiles, fingerprint in fingerprints.items()),
+            )
+
+
+def get_structure_key(compound: reaction_pb2.Compound) -> Optional[StructureKey]:
+    """Returns the structural identifiers of a compound; None if there are none."""
+    key = tuple(
+        (identifier.type, identifier.value)
+        for identifier in compound.identifiers
+        if identifier.type in _STRUCTURAL_IDENTIFIER_TYPES
+    )
+    return key or None
+
+
+def build_fingerprints(
+    reactions: Iterable[reaction_pb2.Reaction],
+    roles: Sequence[str] = DEFAULT_ROLES,
+    parameters: FingerprintParameters = FingerprintParameters(),
+    cache_filename: Optional[str] = None,
+    num_workers: int = 1,
+) -> FingerprintMatrix:
+    """Builds role-aggregated Morgan fingerprints for Reactions.
+
+    The fingerprint for each role is the bitwise OR of the fingerprints of the
+    input components (and, for PRODUCT, the outcome products) with that role.
+    Compounds without a valid structure are skipped.
+
+    Args:
+        reactions: Iterable of Reactions.
+        roles: ReactionRoleType names.
+        parameters: FingerprintParameters.
+        cache_filename: Optional FingerprintCache filename; created if it does
+            not exist.
+        num_workers: Number of processes used to fingerprint structures.
+
+    Returns:
+        FingerprintMatrix.
+
+    Raises:
+        ValueError: if a role is not a valid ReactionRoleType.
+    """
+    role_indices = {}
+    for i, role in enumerate(roles):
+        if role not in reaction_pb2.ReactionRole.ReactionRoleType.keys():
+            raise ValueError(f"invalid reaction role: {role}")
+        role_indices[reaction_pb2.ReactionRole.ReactionRoleType.Value(role)] = i
+    structures: Dict[StructureKey, int] = {}
+    rows, columns, structure_ids = [], [], []
+    num_reactions = 0
+    for reaction in reactions:
+        for role, compound in _iter_compounds(reaction):
+            column = role_indices.get(role)
+            if column is None:
+                continue
+            key = get_structure_key(compound)
+            if key is None:
+                continue
+            rows.append(num_reactions)
+            columns.append(column)
+            structure_ids.append(structures.setdefault(key, len(structures)))
+        num_reactions += 1
+    fingerprints = _get_fingerprints(list(structures), parameters, cache_filename, num_workers)
+    packed = np.zeros((num_reactions, len(roles), parameters.num_bits // 8), dtype=np.uint8)
+    if rows:
+        np.bitwise_or.at(packed, (np.asarray(rows), np.asarray(columns)), fingerprints[np.asarray(structure_ids)])
+    return FingerprintMatrix(roles=list(roles), parameters=parameters, packed=packed)
+
+
+def _iter_compounds(reaction: reaction_pb2.Reaction) -> Iterable[Tuple[int, reaction_pb2.Compound]]:
+    """Yields (reaction role, compound) tuples for the structures in a Reaction."""
+    for reaction_input in reaction.inputs.values():
+        for component in reaction_input.components:
+            yield component.reaction_role, component
+    for outcome in reaction.outcomes:
+        for product in outcome.products:
+            yield product.reaction_role or reaction_pb2.ReactionRole.PRODUCT, product
+
+
+def _get_fingerprints(
+    keys: List[StructureKey], parameters: FingerprintParameters, cache_filename: Optional[str], num_workers: int
+) -> np.ndarray:
+    """Returns packed fingerprints for structures; invalid structures are all zeros.
+
+    Structures are first canonicalized (in the workers), so different spellings
+    of the same structure (e.g. "OCC" and "CCO") are looked up in the cache and
+    fingerprinted only once.
+    """
+    fingerprints = np.zeros((len(keys), parameters.num_bits // 8), dtype=np.uint8)
+    if not keys:
+        return fingerprints
+    cache = FingerprintCache(cache_filename) if cache_filename is not None else None
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) if num_workers != 1 else None
+    try:
+        cached = {}
+        if cache is not None:
+            # NOTE: Canonical SMILES are looked up before parsing anything.
+            cached = cache.get(
+                parameters, {key[0][1] for key in keys if key[0][0] == reaction_pb2.CompoundIdentifier.SMILES}
+            )
+        missing = []
+        for i, key in enumerate(keys):
+            if key[0][0] == reaction_pb2.CompoundIdentifier.SMILES and key[0][1] in cached:
+                fingerprints[i] = np.frombuffer(cached[key[0][1]], dtype=np.uint8)
+            else:
+                missing.append(i)
+        canonical = _map_chunks(_canonicalize_structures, [keys[i] for i in missing], executor)
+        indices: Dict[str, List[int]] = {}
+        for i, smiles in zip(missing, canonical):
+            if smiles is not None:
+                indices.setdefault(smiles, []).append(i)
+        num_invalid = canonical.count(None)
+        if num_invalid:
+            logging.warning("skipped %d invalid structures", num_invalid)
+        cached = cache.get(parameters, indices) if cache is not None else {}
+        uncached = [smiles for smiles in indices if smiles not in cached]
+        function = functools.partial(_fingerprint_smiles, parameters=parameters)
+        new_fingerprints = dict(zip(uncached, _map_chunks(function, uncached, executor)))
+        for smiles, fingerprint in itertools.chain(cached.items(), new_fingerprints.items()):
+            fingerprints[indices[smiles]] = np.frombuffer(fingerprint, dtype=np.uint8)
+        if cache is not None and new_fingerprints:
+            cache.put(parameters, new_fingerprints)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if cache is not None:
+            cache.close()
+    return fingerprints
+
+
+def _map_chunks(
+    function: Callable[[List[Any]], List[Any]], items: List[Any], executor: Optional[concurrent.futures.Executor]
+) -> List[Any]:
+    """Applies a function to chunks of items, in the executor if provided."""
+    chunks = [items[start : start + _CHUNK_SIZE] for start in range(0, len(items), _CHUNK_SIZE)]
+    if executor is None:
+        return list(itertools.chain.from_iterable(map(function, chunks)))
+    return list(itertools.chain.from_iterable(executor.map(function, chunks)))
+
+
+def _canonicalize_structures(keys: List[StructureKey]) -> List[Optional[str]]:
+    """Returns canonical SMILES for structures (None if invalid); used by workers."""
+    results = []
+    for key in keys:
+        compound = reaction_pb2.Compound()
+        for identifier_type, value in key:
+            compound.identifiers.add(type=identifier_type, value=value)
+        try:
+            results.append(Chem.MolToSmiles(message_helpers.mol_from_compound(compound)))
+        except ValueError:
+            results.append(None)
+    return results
+
+
+def _fingerprint_smiles(smiles: List[str], parameters: FingerprintParameters) -> List[bytes]:
+    """Returns packed fingerprints for canonical SMILES; used by workers."""
+    generator = rdFingerprintGenerator.GetMorganGenerator(
+        radius=parameters.radius, fpSize=parameters.num_bits, includeChirality=parameters.use_chirality
+    )
+    return [np.packbits(generator.GetFingerprintAsNumPy(Chem.MolFromSmiles(value))).tobytes() for value in smiles]
@@ -0,0 +1,132 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for ord_schema.fingerprints."""
+
+import os
+from unittest import mock
+
+from absl.testing import absltest
+import numpy as np
+from rdkit import Chem
+from rdkit.Chem import rdFingerprintGenerator
+
+from ord_schema import fingerprints
+from ord_schema.proto import reaction_pb2
+
+
+def _add_component(reaction: reaction_pb2.Reaction, input_name: str, smiles: str, role: str):
+    component = reaction.inputs[input_name].components.add(reaction_role=role)
+    component.identifiers.add(type="SMILES", value=smiles)
+
+
+def _get_fingerprint(smiles: str, num_bits: int) -> np.ndarray:
+    generator = rdFingerprintGenerator.GetMorganGenerator(radius=2, fpSize=num_bits)
+    return generator.GetFingerprintAsNumPy(Chem.MolFromSmiles(smiles))
+
+
+class BuildFingerprintsTest(absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.parameters = fingerprints.FingerprintParameters(num_bits=256)
+        reaction1 = reaction_pb2.Reaction()
+        _add_component(reaction1, "a", "OCC", "REACTANT")
+        _add_component(reaction1, "a", "c1ccccc1", "REACTANT")
+        _add_component(reaction1, "b", "[Pd]", "CATALYST")
+        reaction1.outcomes.add().products.add(reaction_role="PRODUCT").identifiers.add(
+            type="SMILES", value="CCOc1ccccc1"
+        )
+        reaction2 = reaction_pb2.Reaction()
+        _add_component(reaction2, "a", "CCO", "REACTANT")
+        _add_component(reaction2, "a", "invalid", "REACTANT")
+        _add_component(reaction2, "b", "O", "SOLVENT")
+        self.reactions = [reaction1, reaction2]
+
+    def test_build_fingerprints(self):
+        matrix = fingerprints.build_fingerprints(
+            self.reactions, roles=["REACTANT", "CATALYST", "PRODUCT"], parameters=self.parameters
+        )
+        self.assertEqual(matrix.packed.shape, (2, 3, 32))
+        self.assertEqual(matrix.shape, (2, 768))
+        bits = matrix.unpack()
+        np.testing.assert_array_equal(bits[0, :256], _get_fingerprint("CCO", 256) | _get_fingerprint("c1ccccc1", 256))
+        np.testing.assert_array_equal(bits[0, 256:512], _get_fingerprint("[Pd]", 256))
+        np.testing.assert_array_equal(bits[0, 512:], _get_fingerprint("CCOc1ccccc1", 256))
+        np.testing.assert_array_equal(bits[1, :256], _get_fingerprint("CCO", 256))
+        self.assertFalse(bits[1, 256:].any())
+
+    def test_to_csr_arrays(self):
+        matrix = fingerprints.build_fingerprints(self.reactions, parameters=self.parameters)
+        data, indices, indptr = matrix.to_csr_arrays()
+        dense = np.zeros(matrix.shape, dtype=np.uint8)
+        for i in range(matrix.shape[0]):
+            dense[i, indices[indptr[i] : indptr[i + 1]]] = data[indptr[i] : indptr[i + 1]]
+        np.testing.assert_array_equal(dense, matrix.unpack())
+
+    def test_cache(self):
+        cache_filename = os.path.join(self.create_tempdir(), "fingerprints.sqlite")
+        expected = fingerprints.build_fingerprints(self.reactions, parameters=self.parameters)
+        matrix = fingerprints.build_fingerprints(
+            self.reactions, parameters=self.parameters, cache_filename=cache_filename
+        )
+        np.testing.assert_array_equal(matrix.packed, expected.packed)
+        with fingerprints.FingerprintCache(cache_filename) as cache:
+            cached = cache.get(self.parameters, ["CCO", "OCC", "c1ccccc1", "[Pd]", "O", "CCOc1ccccc1"])
+            self.assertCountEqual(cached, ["CCO", "c1ccccc1", "[Pd]", "O", "CCOc1ccccc1"])
+            self.assertEqual(cached["CCO"], np.packbits(_get_fingerprint("CCO", 256)).tobytes())
+            self.assertEmpty(cache.get(fingerprints.FingerprintParameters(num_bits=512), ["CCO"]))
+            # Results come from the cache when it is present.
+            cache.put(self.parameters, {"O": bytes([255] * 32)})
+        matrix = fingerprints.build_fingerprints(
+            self.reactions, parameters=self.parameters, cache_filename=cache_filename, num_workers=2
+        )
+        solvent = matrix.roles.index("SOLVENT")
+        self.assertTrue(matrix.unpack()[1, solvent * 256 : (solvent + 1) * 256].all())
+
+    def test_equivalent_structures(self):
+        # "OCC" and "CCO" are different spellings of the same structure.
+        fingerprinted = []
+        fingerprint_smiles = fingerprints._fingerprint_smiles  # pylint: disable=protected-access
+
+        def recording_fingerprint_smiles(smiles, **kwargs):
+            fingerprinted.extend(smiles)
+            return fingerprint_smiles(smiles, **kwargs)
+
+        cache_filename = os.path.join(self.create_tempdir(), "fingerprints.sqlite")
+        with mock.patch.object(fingerprints, "_fingerprint_smiles", recording_fingerprint_smiles):
+            matrix = fingerprints.build_fingerprints(
+                self.reactions, roles=["REACTANT"], parameters=self.parameters, cache_filename=cache_filename
+            )
+        self.assertCountEqual(fingerprinted, ["CCO", "c1ccccc1"])
+        bits = matrix.unpack()
+        np.testing.assert_array_equal(bits[1], _get_fingerprint("CCO", 256))
+        with fingerprints.FingerprintCache(cache_filename) as cache:
+            self.assertCountEqual(cache.get(self.parameters, ["CCO", "OCC", "c1ccccc1"]), ["CCO", "c1ccccc1"])
+
+    def test_empty(self):
+        matrix = fingerprints.build_fingerprints([], parameters=self.parameters)
+        self.assertEqual(matrix.packed.shape, (0, len(fingerprints.DEFAULT_ROLES), 32))
+        data, indices, indptr = matrix.to_csr_arrays()
+        self.assertEmpty(data)
+        self.assertEmpty(indices)
+        np.testing.assert_array_equal(indptr, [0])
+
+    def test_bad_arguments(self):
+        with self.assertRaisesRegex(ValueError, "invalid reaction role"):
+            fingerprints.build_fingerprints(self.reactions, roles=["FOO"])
+        with self.assertRaisesRegex(ValueError, "multiple of 8"):
+            fingerprints.FingerprintParameters(num_bits=100)
+
+
+if __name__ == "__main__":
+    absltest.main()
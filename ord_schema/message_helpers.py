@@ -13,24 +13,41 @@
 # limitations under the License.
 """Helper functions for constructing Protocol Buffer messages."""
 
+import collections
+import concurrent.futures
+import contextlib
+import dataclasses
 import enum
 import functools
+import glob
+import importlib.util
 import gzip
+import hashlib
+import io
+import itertools
+import json
+import mmap
 import os
 import re
-from typing import Dict, Iterable, List, Optional, Tuple, Type, TypeVar, Union
+import struct
+import tempfile
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple, Type, TypeVar, Union
 import warnings
 
 from google import protobuf
 from google.protobuf import json_format
 from google.protobuf import text_format  # pytype: disable=import-error
+import numpy as np
 import pandas as pd
 from rdkit import Chem
 from rdkit.Chem import rdChemReactions
 from werkzeug import security
 
 import ord_schema
+from ord_schema import blob_store
+from ord_schema import blocked_gzip
 from ord_schema import units
+from ord_schema.proto import dataset_pb2
 from ord_schema.proto import reaction_pb2
 
 _COMPOUND_IDENTIFIER_LOADERS = {
@@ -182,12 +199,15 @@ def set_solute_moles(
     return [solute] + solvents
 
 
-def build_data(filename: str, description: str) -> reaction_pb2.Data:
+def build_data(filename: str, description: str, store: Optional[blob_store.BlobStore] = None) -> reaction_pb2.Data:
     """Reads raw data from a file and creates a Data message.
 
     Args:
         filename: Text filename.
         description: Text description of the data.
+        store: Optional BlobStore. If provided, the file is streamed into the
+            store and the Data message references it by URL instead of
+            containing the raw bytes.
 
     Returns:
         Data message.
@@ -197,12 +217,57 @@ def build_data(filename: str, description: str) -> reaction_pb2.Data:
         raise ValueError(f"cannot deduce the file format for {filename}")
     data = reaction_pb2.Data()
     data.format = extension[1:]
-    with open(filename, "rb") as f:
-        data.bytes_value = f.read()
+    if store is not None:
+        data.url = blob_store.to_url(store.put_file(filename))
+    else:
+        with open(filename, "rb") as f:
+            data.bytes_value = f.read()
     data.description = description
     return data
 
 
+def pack_data(message: ord_schema.Message, store: blob_store.BlobStore, min_size: int = 0) -> int:
+    """Moves Data.bytes_value payloads into a BlobStore (in place).
+
+    Args:
+        message: Protocol buffer; all Data submessages are updated.
+        store: BlobStore.
+        min_size: Payloads smaller than this many bytes are left inline.
+
+    Returns:
+        The number of Data messages that were updated.
+    """
+    num_packed = 0
+    for data in find_submessages(message, reaction_pb2.Data):
+        if data.WhichOneof("kind") != "bytes_value" or len(data.bytes_value) < min_size:
+            continue
+        data.url = blob_store.to_url(store.put_bytes(data.bytes_value))
+        num_packed += 1
+    return num_packed
+
+
+def unpack_data(message: ord_schema.Message, store: blob_store.BlobStore) -> int:
+    """Replaces BlobStore references with inline Data.bytes_value (in place).
+
+    Args:
+        message: Protocol buffer; all Data submessages are updated.
+        store: BlobStore.
+
+    Returns:
+        The number of Data messages that were updated.
+
+    Raises:
+        KeyError: if a referenced blob is not in the store.
+    """
+    num_unpacked = 0
+    for data in find_submessages(message, reaction_pb2.Data):
+        if data.WhichOneof("kind") != "url" or blob_store.parse_url(data.url) is None:
+            continue
+        data.bytes_value = store.resolve(data)
+        num_unpacked += 1
+    return num_unpacked
+
+
 def find_submessages(message: ord_schema.Message, submessage_type: Type[MessageType]) -> List[MessageType]:
     """Recursively finds all submessages of a specified type.
 
@@ -247,6 +312,116 @@ def find_submessages(message: ord_schema.Message, submessage_type: Type[MessageT
     return submessages
 
 
+# Repeated fields whose order has no meaning; these are sorted by
+# canonicalize_message. Fields like Reaction.outcomes or Compound.preparations
+# are ordered (e.g., in time) and are never reordered.
+UNORDERED_FIELDS = frozenset(
+    [
+        "ord.Reaction.identifiers",
+        "ord.ReactionInput.components",
+        "ord.ReactionInput.crude_components",
+        "ord.Compound.identifiers",
+        "ord.ProductCompound.identifiers",
+    ]
+)
+
+# Structural identifier types, which get_reaction_smiles and mol_from_compound
+# look up together (using the first identifier of any of these types); they are
+# sorted ahead of other identifiers. See _get_sort_keys.
+_IDENTIFIER_TYPE_GROUPS = {
+    "ord.Reaction.identifiers": frozenset(
+        [reaction_pb2.ReactionIdentifier.REACTION_SMILES, reaction_pb2.ReactionIdentifier.REACTION_CXSMILES]
+    ),
+    "ord.Compound.identifiers": frozenset(_COMPOUND_IDENTIFIER_LOADERS),
+    "ord.ProductCompound.identifiers": frozenset(_COMPOUND_IDENTIFIER_LOADERS),
+}
+
+
+def _get_sort_keys(field: ord_schema.FieldDescriptor, value: Iterable[ord_schema.Message]) -> List[Any]:
+    """Returns the canonical sort keys for the elements of a field in UNORDERED_FIELDS.
+
+    Elements are sorted by their deterministic serialization, so the result does
+    not depend on the input order. Identifiers are sorted by (type, value,
+    details), with structural identifiers first (see _IDENTIFIER_TYPE_GROUPS);
+    the serialization breaks any remaining ties.
+    """
+    keys = [submessage.SerializeToString(deterministic=True) for submessage in value]
+    if field.full_name not in _IDENTIFIER_TYPE_GROUPS:
+        return keys
+    group = _IDENTIFIER_TYPE_GROUPS[field.full_name]
+    return [
+        (identifier.type not in group, identifier.type, identifier.value, identifier.details, key)
+        for identifier, key in zip(value, keys)
+    ]
+
+
+def canonicalize_message(message: ord_schema.Message) -> bool:
+    """Reorders order-insensitive repeated fields into a canonical order (in place).
+
+    The repeated fields in UNORDERED_FIELDS are sorted (see _get_sort_keys), so
+    messages that differ only in the order of these fields become identical.
+    The meaning of the message is unchanged.
+
+    NOTE: Map fields are not reordered, since map iteration order depends on
+    the protobuf backend. Deterministic binary serialization and text format
+    already write map entries sorted by key; use write_message with
+    canonicalize=True for canonical JSON.
+
+    Args:
+        message: Protocol buffer.
+
+    Returns:
+        Whether the message was modified.
+    """
+    modified = False
+    for field, value in message.ListFields():
+        if field.type != field.TYPE_MESSAGE:
+            continue
+        if field.message_type.GetOptions().map_entry:
+            field_value = field.message_type.fields_by_name["value"]
+            if field_value.type == field_value.TYPE_MESSAGE:
+                for submessage in value.values():
+                    modified = canonicalize_message(submessage) or modified
+        elif field.label == field.LABEL_REPEATED:
+            for submessage in value:
+                modified = canonicalize_message(submessage) or modified
+            if field.full_name in UNORDERED_FIELDS:
+                keys = _get_sort_keys(field, value)
+                order = sorted(range(len(keys)), key=keys.__getitem__)
+                if order != list(range(len(keys))):
+                    items = [value[index].SerializeToString(deterministic=True) for index in order]
+                    del value[:]
+                    for item in items:
+                        value.add().MergeFromString(item)
+                    modified = True
+        else:
+            modified = canonicalize_message(value) or modified
+    return modified
+
+
+def _sort_json_maps(descriptor: protobuf.descriptor.Descriptor, value: Dict[str, Any]) -> Dict[str, Any]:
+    """Sorts map entries by key (in place) in the output of json_format.MessageToDict."""
+    for field in descriptor.fields:
+        if field.type != field.TYPE_MESSAGE or field.json_name not in value:
+            continue
+        if field.message_type.full_name.startswith("google.protobuf."):
+            continue  # Well-known types have special JSON representations.
+        field_value = value[field.json_name]
+        if field.message_type.GetOptions().map_entry:
+            value_field = field.message_type.fields_by_name["value"]
+            field_value = dict(sorted(field_value.items()))
+            if value_field.type == value_field.TYPE_MESSAGE:
+                for item in field_value.values():
+                    _sort_json_maps(value_field.message_type, item)
+            value[field.json_name] = field_value
+        elif field.label == field.LABEL_REPEATED:
+            for item in field_value:
+                _sort_json_maps(field.message_type, item)
+        else:
+            _sort_json_maps(field.message_type, field_value)
+    return value
+
+
 def smiles_from_compound(compound: reaction_pb2.Compound) -> str:
     """Fetches or generates a SMILES identifier for a compound.
 
@@ -703,20 +878,55 @@ class MessageFormat(enum.Enum):
     PBTXT = ".pbtxt"
 
 
+# Fields that hold (potentially large) Data messages. Pass these as the
+# `skip_fields` argument to load_message to avoid loading raw data payloads.
+DATA_FIELDS = (
+    "ord.Analysis.data",
+    "ord.Compound.features",
+    "ord.ProductCompound.features",
+    "ord.ReactionSetup.automation_code",
+)
+
+
+# Environment variable that sets the default parse cache directory; see
+# load_message.
+PARSE_CACHE_ENV = "ORD_SCHEMA_PARSE_CACHE"
+# Default block size for blocked gzip files (uncompressed bytes).
+BLOCK_SIZE = 1 << 20
+
+
 # pylint: disable=inconsistent-return-statements
-def load_message(filename: str, message_type: Type[MessageType]) -> MessageType:
+def load_message(
+    filename: str,
+    message_type: Type[MessageType],
+    skip_fields: Optional[Iterable[str]] = None,
+    cache_dir: Optional[str] = None,
+    num_workers: int = 1,
+) -> MessageType:
     """Loads a protocol buffer message from a file.
 
+    Blocked gzip files (see write_message) are decompressed in parallel.
+
     Args:
         filename: Text filename containing a serialized protocol buffer message.
         message_type: Message subclass.
+        skip_fields: Full names of fields to omit from the loaded message,
+            anywhere they appear; for example, DATA_FIELDS. For binary files,
+            these fields are dropped while scanning the wire format, so their
+            contents are never parsed.
+        cache_dir: Optional directory for caching parsed text (pbtxt and JSON)
+            messages in binary form. Entries are keyed by the file contents
+            and the schema, so stale entries are never used. Defaults to the
+            value of the ORD_SCHEMA_PARSE_CACHE environment variable, if set.
+        num_workers: Number of processes used to parse text-format (pbtxt)
+            Datasets; see parse_dataset_text.
 
     Returns:
         Message object.
 
     Raises:
-        ValueError: if the message cannot be parsed, or if `input_format` is not
-            supported.
+        ValueError: if the message cannot be parsed, if `input_format` is not
+            supported, or if `skip_fields` contains unknown fields.
     """
     if filename.endswith(".gz"):
         this_open = gzip.open
@@ -729,35 +939,505 @@ def load_message(filename: str, message_type: Type[MessageType]) -> MessageType:
         mode = "rb"
     else:
         mode = "rt"
-    with this_open(filename, mode) as f:
+    projection = None
+    if skip_fields:
+        projection = _get_projection(message_type.DESCRIPTOR, frozenset(skip_fields))
+    if cache_dir is None:
+        cache_dir = os.environ.get(PARSE_CACHE_ENV)
+    if cache_dir and input_format != MessageFormat.BINARY:
+        return _load_cached_message(filename, message_type, input_format, cache_dir, projection, num_workers)
+    if input_format == MessageFormat.BINARY and this_open is open:
         try:
-            if input_format == MessageFormat.JSON:
-                return json_format.Parse(f.read(), message_type())
-            if input_format == MessageFormat.PBTXT:
-                return text_format.Parse(f.read(), message_type())
-            if input_format == MessageFormat.BINARY:
-                return message_type.FromString(f.read())
-        except (
-            json_format.ParseError,
-            protobuf.message.DecodeError,
-            text_format.ParseError,
-        ) as error:
+            return _load_mapped_message(filename, message_type, projection)
+        except protobuf.message.DecodeError as error:
             raise ValueError(f"error parsing {filename}: {error}") from error
+    if this_open is gzip.open and blocked_gzip.is_blocked(filename):
+        value = blocked_gzip.decompress(filename)
+        if input_format != MessageFormat.BINARY:
+            value = value.decode()
+        return _parse_message(value, input_format, message_type, filename, projection, num_workers)
+    with this_open(filename, mode) as f:
+        return _parse_message(f.read(), input_format, message_type, filename, projection, num_workers)
+
+
+def _parse_message(
+    value: Union[str, bytes],
+    input_format: MessageFormat,
+    message_type: Type[MessageType],
+    filename: str,
+    projection: Optional["_Projection"] = None,
+    num_workers: int = 1,
+) -> MessageType:
+    """Parses a serialized message.
+
+    Args:
+        value: Serialized message; bytes for BINARY and text otherwise.
+        input_format: MessageFormat of `value`.
+        message_type: Message subclass.
+        filename: Text filename, used for error messages.
+        projection: Optional _Projection used to drop fields.
+        num_workers: Number of processes used to parse text-format Datasets.
+
+    Returns:
+        Message object.
+
+    Raises:
+        ValueError: if the message cannot be parsed.
+    """
+    try:
+        if input_format == MessageFormat.BINARY:
+            if projection is not None:
+                value = projection.apply(value)
+            return message_type.FromString(value)
+        if input_format == MessageFormat.JSON:
+            message = json_format.Parse(value, message_type())
+        elif message_type is dataset_pb2.Dataset and num_workers != 1:
+            message = parse_dataset_text(value, num_workers=num_workers)
+        else:
+            message = text_format.Parse(value, message_type())
+        if projection is not None:
+            projection.clear(message)
+        return message
+    except (
+        json_format.ParseError,
+        protobuf.message.DecodeError,
+        text_format.ParseError,
+    ) as error:
+        raise ValueError(f"error parsing {filename}: {error}") from error
 
 
 # pylint: enable=inconsistent-return-statements
 
 
-def write_message(message: ord_schema.Message, filename: str):
+@functools.lru_cache(maxsize=None)
+def _schema_digest(descriptor: protobuf.descriptor.Descriptor) -> bytes:
+    """Returns a digest of the .proto files that define a message type."""
+    sha256 = hashlib.sha256()
+    visited = set()
+    stack = [descriptor.file]
+    while stack:
+        file_descriptor = stack.pop()
+        if file_descriptor.name in visited:
+            continue
+        visited.add(file_descriptor.name)
+        sha256.update(file_descriptor.name.encode())
+        sha256.update(file_descriptor.serialized_pb)
+        stack.extend(file_descriptor.dependencies)
+    sha256.update(descriptor.full_name.encode())
+    return sha256.digest()
+
+
+def _load_cached_message(
+    filename: str,
+    message_type: Type[MessageType],
+    input_format: MessageFormat,
+    cache_dir: str,
+    projection: Optional["_Projection"] = None,
+    num_workers: int = 1,
+) -> MessageType:
+    """Loads a text-format message, using a binary cache entry if one exists.
+
+    Args:
+        filename: Text filename containing a text-format message.
+        message_type: Message subclass.
+        input_format: MessageFormat of `filename`.
+        cache_dir: Cache directory.
+        projection: Optional _Projection used to drop fields.
+        num_workers: Number of processes used to parse text-format Datasets.
+
+    Returns:
+        Message object.
+
+    Raises:
+        ValueError: if the message cannot be parsed.
+    """
+    with open(filename, "rb") as f:
+        value = f.read()
+    key = hashlib.sha256(value + _schema_digest(message_type.DESCRIPTOR)).hexdigest()
+    cache_filename = os.path.join(cache_dir, f"{key}{MessageFormat.BINARY.value}")
+    if os.path.exists(cache_filename):
+        try:
+            return _load_mapped_message(cache_filename, message_type, projection)
+        except protobuf.message.DecodeError:
+            pass  # Corrupt cache entry; parse the original file instead.
+    if filename.endswith(".gz"):
+        value = gzip.decompress(value)
+    message = _parse_message(value.decode(), input_format, message_type, filename, num_workers=num_workers)
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_filename = None
+    try:
+        with tempfile.NamedTemporaryFile(dir=cache_dir, delete=False) as f:
+            temp_filename = f.name
+            f.write(message.SerializeToString(deterministic=True))
+        os.replace(temp_filename, cache_filename)
+    except BaseException:
+        if temp_filename is not None:
+            os.remove(temp_filename)
+        raise
+    if projection is not None:
+        projection.clear(message)
+    return message
+
+
+def _load_mapped_message(
+    filename: str, message_type: Type[MessageType], projection: Optional["_Projection"] = None
+) -> MessageType:
+    """Parses an uncompressed binary message directly from a memory map.
+
+    This avoids holding a private copy of the serialized bytes alongside the
+    parsed message; the mapped pages live in the OS page cache and are shared
+    by every process that loads the same file.
+    """
+    with open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return message_type()  # Empty files cannot be mapped.
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                try:
+                    if projection is not None:
+                        return message_type.FromString(projection.apply(view))
+                    return message_type.FromString(view)
+                except protobuf.message.DecodeError as error:
+                    # The traceback holds references into the mapped buffer,
+                    # which would prevent it from being closed.
+                    message = str(error)
+    raise protobuf.message.DecodeError(message)
+
+
+_WIRETYPE_VARINT = 0
+_WIRETYPE_FIXED64 = 1
+_WIRETYPE_LENGTH_DELIMITED = 2
+_WIRETYPE_FIXED32 = 5
+
+
+def _decode_varint(buffer: Union[bytes, memoryview], pos: int) -> Tuple[int, int]:
+    """Decodes a base-128 varint.
+
+    Args:
+        buffer: Serialized data.
+        pos: Offset of the first byte of the varint.
+
+    Returns:
+        value: The decoded integer.
+        pos: Offset of the first byte after the varint.
+
+    Raises:
+        DecodeError: if the varint is truncated or too long.
+    """
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(buffer):
+            raise protobuf.message.DecodeError("truncated varint")
+        byte = buffer[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+        if shift >= 64:
+            raise protobuf.message.DecodeError("varint is too long")
+
+
+def iter_wire_fields(
+    buffer: Union[bytes, memoryview], start: int = 0, end: Optional[int] = None
+) -> Iterator[Tuple[int, int, int, int, int]]:
+    """Walks the top-level fields of a serialized message without decoding them.
+
+    Field records can be copied or split out (e.g. the Reactions of a Dataset)
+    without parsing the message; see iter_serialized_reactions.
+
+    Args:
+        buffer: Serialized message.
+        start: Offset of the first tag.
+        end: Offset of the end of the message; defaults to len(buffer).
+
+    Yields:
+        field_number: Field number from the tag.
+        wire_type: Wire type from the tag.
+        tag_start: Offset of the tag; buffer[tag_start:value_end] is the
+            complete field record.
+        value_start: Offset of the value; for length-delimited fields this
+            excludes the length prefix.
+        value_end: Offset of the first byte after the value.
+
+    Raises:
+        DecodeError: if the message is truncated or uses unsupported (group)
+            wire types.
+    """
+    if end is None:
+        end = len(buffer)
+    pos = start
+    while pos < end:
+        tag_start = pos
+        tag, pos = _decode_varint(buffer, pos)
+        field_number, wire_type = tag >> 3, tag & 0x7
+        if wire_type == _WIRETYPE_VARINT:
+            _, value_end = _decode_varint(buffer, pos)
+        elif wire_type == _WIRETYPE_FIXED64:
+            value_end = pos + 8
+        elif wire_type == _WIRETYPE_LENGTH_DELIMITED:
+            length, pos = _decode_varint(buffer, pos)
+            value_end = pos + length
+        elif wire_type == _WIRETYPE_FIXED32:
+            value_end = pos + 4
+        else:
+            raise protobuf.message.DecodeError(f"unsupported wire type: {wire_type}")
+        if value_end > end:
+            raise protobuf.message.DecodeError("truncated message")
+        yield field_number, wire_type, tag_start, pos, value_end
+        pos = value_end
+
+
+def encode_varint(value: int) -> bytes:
+    """Encodes a non-negative integer as a base-128 varint.
+
+    Together with DATASET_REACTIONS_TAG, this builds Dataset.reactions records
+    from serialized Reactions: DATASET_REACTIONS_TAG + encode_varint(len(value)) + value.
+    """
+    pieces = bytearray()
+    while value > 0x7F:
+        pieces.append((value & 0x7F) | 0x80)
+        value >>= 7
+    pieces.append(value)
+    return bytes(pieces)
+
+
+# Wire-format tag of a Dataset.reactions record; see encode_varint.
+DATASET_REACTIONS_TAG = encode_varint((dataset_pb2.Dataset.REACTIONS_FIELD_NUMBER << 3) | _WIRETYPE_LENGTH_DELIMITED)
+
+
+class _Projection:
+    """Removes a set of fields from serialized messages of a single type.
+
+    Fields are matched by full name (e.g. "ord.Analysis.data") at any depth.
+    Only submessages that can (transitively) contain a skipped field are
+    rewritten; everything else is copied through without being decoded.
+    """
+
+    def __init__(self, descriptor: protobuf.descriptor.Descriptor, skip_fields: FrozenSet[str]):
+        """Initializes the projection.
+
+        Args:
+            descriptor: Descriptor for the top-level message type.
+            skip_fields: Set of full field names to remove.
+
+        Raises:
+            ValueError: if any of `skip_fields` cannot appear in `descriptor`.
+        """
+        self._root = descriptor.full_name
+        self._skip_fields = skip_fields
+        descriptors = {}
+        stack = [descriptor]
+        while stack:
+            this_descriptor = stack.pop()
+            if this_descriptor.full_name in descriptors:
+                continue
+            descriptors[this_descriptor.full_name] = this_descriptor
+            for field in this_descriptor.fields:
+                if field.message_type is not None:
+                    stack.append(field.message_type)
+        known = {field.full_name for this_descriptor in descriptors.values() for field in this_descriptor.fields}
+        unknown = skip_fields - known
+        if unknown:
+            raise ValueError(f"unknown fields for {descriptor.full_name}: {sorted(unknown)}")
+        # Find the message types that contain skipped fields at any depth.
+        needs_filter = {
+            name: any(field.full_name in skip_fields for field in this_descriptor.fields)
+            for name, this_descriptor in descriptors.items()
+        }
+        changed = True
+        while changed:
+            changed = False
+            for name, this_descriptor in descriptors.items():
+                if needs_filter[name]:
+                    continue
+                for field in this_descriptor.fields:
+                    if field.message_type is not None and needs_filter[field.message_type.full_name]:
+                        needs_filter[name] = changed = True
+                        break
+        self._skip = {}
+        self._descend = {}
+        for name, this_descriptor in descriptors.items():
+            if not needs_filter[name]:
+                continue
+            self._skip[name] = frozenset(
+                field.number for field in this_descriptor.fields if field.full_name in skip_fields
+            )
+            self._descend[name] = {
+                field.number: field.message_type.full_name
+                for field in this_descriptor.fields
+                if field.full_name not in skip_fields
+                and field.message_type is not None
+                and needs_filter[field.message_type.full_name]
+            }
+
+    def apply(self, buffer: Union[bytes, memoryview]) -> bytes:
+        """Returns a copy of a serialized message without the skipped fields."""
+        if self._root not in self._skip:
+            return bytes(buffer)
+        with memoryview(buffer) as view:
+            return b"".join(self._filter(view, 0, len(view), self._root))
+
+    def _filter(self, view: memoryview, start: int, end: int, name: str) -> List[Union[bytes, memoryview]]:
+        """Recursively filters a serialized message of type `name`."""
+        skip = self._skip[name]
+        descend = self._descend[name]
+        pieces = []
+        for field_number, wire_type, tag_start, value_start, value_end in iter_wire_fields(view, start, end):
+            if field_number in skip:
+                continue
+            if field_number in descend and wire_type == _WIRETYPE_LENGTH_DELIMITED:
+                _, tag_end = _decode_varint(view, tag_start)
+                payload = b"".join(self._filter(view, value_start, value_end, descend[field_number]))
+                pieces.extend([view[tag_start:tag_end], encode_varint(len(payload)), payload])
+            else:
+                pieces.append(view[tag_start:value_end])
+        return pieces
+
+    def clear(self, message: ord_schema.Message):
+        """Removes the skipped fields from a parsed message (in place)."""
+        for field, value in message.ListFields():
+            if field.full_name in self._skip_fields:
+                message.ClearField(field.name)
+            elif field.type != field.TYPE_MESSAGE:
+                continue
+            elif field.message_type.GetOptions().map_entry:
+                if field.message_type.fields_by_name["value"].type == field.TYPE_MESSAGE:
+                    for submessage in value.values():
+                        self.clear(submessage)
+            elif field.label == field.LABEL_REPEATED:
+                for submessage in value:
+                    self.clear(submessage)
+            else:
+                self.clear(value)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_projection(descriptor: protobuf.descriptor.Descriptor, skip_fields: FrozenSet[str]) -> _Projection:
+    """Returns a cached _Projection."""
+    return _Projection(descriptor, skip_fields)
+
+
+class MappedDataset:
+    """Read-only, memory-mapped view of an uncompressed binary Dataset.
+
+    Only the Dataset header (everything except `reactions`) is parsed up front;
+    Reactions are parsed on access. Since the file is mapped rather than read,
+    many processes can share the same dataset through the OS page cache.
+
+    Example:
+        with MappedDataset("my_dataset.pb") as dataset:
+            print(dataset.header.name, len(dataset))
+            reaction = dataset[10]
+    """
+
+    def __init__(self, filename: str, skip_fields: Optional[Iterable[str]] = None):
+        """Initializes the view.
+
+        Args:
+            filename: Text filename of a *.pb Dataset.
+            skip_fields: Full names of fields to omit from each Reaction; see
+                load_message.
+
+        Raises:
+            ValueError: if the file is not an uncompressed binary Dataset or
+                cannot be parsed.
+        """
+        if not filename.endswith(MessageFormat.BINARY.value):
+            raise ValueError(f"MappedDataset requires an uncompressed binary file: {filename}")
+        self._filename = filename
+        self._projection = None
+        if skip_fields:
+            self._projection = _get_projection(reaction_pb2.Reaction.DESCRIPTOR, frozenset(skip_fields))
+        self._file = open(filename, "rb")  # pylint: disable=consider-using-with
+        self._mmap = None
+        self._view = memoryview(b"")
+        if os.fstat(self._file.fileno()).st_size:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+        self._offsets = []
+        header = []
+        try:
+            for field_number, wire_type, tag_start, value_start, value_end in iter_wire_fields(self._view):
+                if (
+                    field_number == dataset_pb2.Dataset.REACTIONS_FIELD_NUMBER
+                    and wire_type == _WIRETYPE_LENGTH_DELIMITED
+                ):
+                    self._offsets.append((value_start, value_end))
+                else:
+                    header.append(bytes(self._view[tag_start:value_end]))
+            self.header = dataset_pb2.Dataset.FromString(b"".join(header))
+        except protobuf.message.DecodeError as error:
+            self.close()
+            raise ValueError(f"error parsing {filename}: {error}") from error
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, index: int) -> reaction_pb2.Reaction:
+        start, end = self._offsets[index]
+        try:
+            if self._projection is not None:
+                return reaction_pb2.Reaction.FromString(self._projection.apply(self._view[start:end]))
+            return reaction_pb2.Reaction.FromString(self._view[start:end])
+        except protobuf.message.DecodeError as error:
+            message = str(error)  # Drop the traceback; see _load_mapped_message.
+        raise ValueError(f"error parsing reaction {index} in {self._filename}: {message}")
+
+    def __iter__(self) -> Iterator[reaction_pb2.Reaction]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __enter__(self) -> "MappedDataset":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Releases the memory map and the underlying file."""
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+
+def write_message(
+    message: ord_schema.Message,
+    filename: str,
+    block_size: Optional[int] = None,
+    num_threads: Optional[int] = None,
+    num_workers: int = 1,
+    canonicalize: bool = False,
+):
     """Writes a protocol buffer message to disk.
 
     Args:
         message: Protocol buffer message.
         filename: Text output filename.
+        block_size: Approximate uncompressed size (in bytes) of the blocks in
+            a blocked gzip file. If None, gzipped output is written as a
+            single gzip member. Only used when `filename` ends with '.gz'.
+            Binary output is split at top-level field boundaries, so each
+            block of a Dataset contains whole Reactions; see load_reaction.
+        num_threads: Number of threads used to compress blocks.
+        num_workers: Number of processes used to format text-format (pbtxt)
+            Datasets; see format_dataset_text.
+        canonicalize: If True, write a copy of the message with
+            order-insensitive collections in canonical order; see
+            canonicalize_message. Map entries in JSON output are also sorted
+            by key. The message itself is not modified.
 
     Raises:
         ValueError: if `filename` does not have the expected suffix.
     """
+    if canonicalize:
+        copied = type(message)()
+        copied.CopyFrom(message)
+        canonicalize_message(copied)
+        message = copied
     if filename.endswith(".gz"):
         # NOTE(kearnes): Set a constant mtime so that round-trips through gzip
         # result in identical files.
@@ -767,13 +1447,1006 @@ def write_message(message: ord_schema.Message, filename: str):
         this_open = open
         _, extension = os.path.splitext(filename)
     output_format = MessageFormat(extension)
+    if output_format == MessageFormat.JSON and canonicalize:
+        # NOTE: Match the formatting of json_format.MessageToJson.
+        value = json.dumps(_sort_json_maps(message.DESCRIPTOR, json_format.MessageToDict(message)), indent=2).encode()
+    elif output_format == MessageFormat.JSON:
+        value = json_format.MessageToJson(message).encode()
+    elif output_format == MessageFormat.PBTXT and isinstance(message, dataset_pb2.Dataset) and num_workers != 1:
+        value = format_dataset_text(message, num_workers=num_workers).encode()
+    elif output_format == MessageFormat.PBTXT:
+        value = text_format.MessageToBytes(message)
+    else:
+        value = message.SerializeToString(deterministic=True)
+    if block_size is not None and filename.endswith(".gz"):
+        if output_format == MessageFormat.BINARY:
+            blocks = _split_records(value, block_size, isinstance(message, dataset_pb2.Dataset))
+        else:
+            blocks = ((value[i : i + block_size], 0) for i in range(0, max(len(value), 1), block_size))
+        with open(filename, "wb") as f:
+            blocked_gzip.write_blocks(f, blocks, num_threads=num_threads)
+        return
     with this_open(filename, "wb") as f:
-        if output_format == MessageFormat.JSON:
-            f.write(json_format.MessageToJson(message).encode())
-        elif output_format == MessageFormat.PBTXT:
-            f.write(text_format.MessageToBytes(message))
-        elif output_format == MessageFormat.BINARY:
-            f.write(message.SerializeToString(deterministic=True))
+        f.write(value)
+
+
+def _split_records(value: bytes, block_size: int, is_dataset: bool) -> Iterator[Tuple[bytes, int]]:
+    """Splits a serialized message into blocks at top-level field boundaries.
+
+    Args:
+        value: Serialized message.
+        block_size: Approximate size of each block, in bytes. Fields larger
+            than `block_size` are placed in their own block.
+        is_dataset: Whether `value` is a serialized Dataset. If True, records
+            are counted as the number of Reactions in each block.
+
+    Yields:
+        (block, num_records) tuples.
+    """
+    with memoryview(value) as view:
+        start = 0
+        num_records = 0
+        for field_number, _, tag_start, _, value_end in iter_wire_fields(view):
+            if tag_start > start and value_end - start > block_size:
+                yield value[start:tag_start], num_records
+                start = tag_start
+                num_records = 0
+            if is_dataset and field_number == dataset_pb2.Dataset.REACTIONS_FIELD_NUMBER:
+                num_records += 1
+        yield value[start:], num_records
+
+
+def load_reaction(filename: str, index: int) -> reaction_pb2.Reaction:
+    """Loads a single Reaction from a Dataset without parsing the rest.
+
+    Only uncompressed binary files and blocked gzip binary files are
+    supported; for the latter, only the block containing the Reaction is
+    decompressed.
+
+    Args:
+        filename: Dataset filename (*.pb or a blocked *.pb.gz).
+        index: Index of the Reaction in Dataset.reactions.
+
+    Returns:
+        Reaction message.
+
+    Raises:
+        IndexError: if `index` is out of range.
+        ValueError: if the file format is not supported.
+    """
+    if filename.endswith(MessageFormat.BINARY.value):
+        with MappedDataset(filename) as dataset:
+            return dataset[index]
+    if not filename.endswith(MessageFormat.BINARY.value + ".gz") or not blocked_gzip.is_blocked(filename):
+        raise ValueError(f"random access requires a *.pb or blocked *.pb.gz file: {filename}")
+    blocks = blocked_gzip.read_index(filename)
+    num_reactions = sum(block.num_records for block in blocks)
+    if index < 0:
+        index += num_reactions
+    if not 0 <= index < num_reactions:
+        raise IndexError(f"reaction index out of range: {index}")
+    for block in blocks:
+        if block.first_record <= index < block.first_record + block.num_records:
+            break
+    value = blocked_gzip.read_block(filename, block)  # pylint: disable=undefined-loop-variable
+    position = block.first_record  # pylint: disable=undefined-loop-variable
+    try:
+        for field_number, _, _, value_start, value_end in iter_wire_fields(value):
+            if field_number != dataset_pb2.Dataset.REACTIONS_FIELD_NUMBER:
+                continue
+            if position == index:
+                return reaction_pb2.Reaction.FromString(value[value_start:value_end])
+            position += 1
+    except protobuf.message.DecodeError as error:
+        raise ValueError(f"error parsing {filename}: {error}") from error
+    raise ValueError(f"block index is inconsistent with the contents of {filename}")
+
+
+def iter_reaction_offsets(filename: str) -> Iterator[Tuple[int, int, int, int, bytes]]:
+    """Locates the serialized Reactions in a binary Dataset file.
+
+    Blocked gzip files are decompressed one block at a time, and locations are
+    relative to the block containing the Reaction; otherwise, they are relative
+    to the uncompressed file.
+
+    Args:
+        filename: Dataset filename (*.pb or *.pb.gz).
+
+    Yields:
+        block_offset: Offset of the gzip member containing the Reaction, or 0 if
+            the file is not a blocked gzip file.
+        block_size: Compressed size of that member, or 0 if the file is not a
+            blocked gzip file.
+        start: Offset of the serialized Reaction.
+        end: Offset of the end of the serialized Reaction.
+        value: Serialized Reaction.
+
+    Raises:
+        ValueError: if the file cannot be parsed.
+    """
+    if filename.endswith(MessageFormat.BINARY.value + ".gz") and blocked_gzip.is_blocked(filename):
+        chunks = ((block, blocked_gzip.read_block(filename, block)) for block in blocked_gzip.read_index(filename))
+    else:
+        chunks = [(None, _read_serialized_dataset(filename))]
+    for block, value in chunks:
+        block_offset, block_size = (0, 0) if block is None else (block.offset, block.size)
+        try:
+            for field_number, wire_type, _, value_start, value_end in iter_wire_fields(value):
+                if (
+                    field_number == dataset_pb2.Dataset.REACTIONS_FIELD_NUMBER
+                    and wire_type == _WIRETYPE_LENGTH_DELIMITED
+                ):
+                    yield block_offset, block_size, value_start, value_end, value[value_start:value_end]
+        except protobuf.message.DecodeError as error:
+            raise ValueError(f"error parsing {filename}: {error}") from error
+
+
+@dataclasses.dataclass
+class DatasetSummary:
+    """Summary of a Dataset computed by scan_dataset."""
+
+    name: str = ""
+    dataset_id: str = ""
+    num_reactions: int = 0
+    # Reaction.reaction_id for each Reaction, in order ("" if not set).
+    reaction_ids: List[str] = dataclasses.field(default_factory=list)
+    # Maps each requested path to the values found in each Reaction, in order.
+    values: Dict[str, List[List[ord_schema.ScalarType]]] = dataclasses.field(default_factory=dict)
+
+
+_SCALAR_DECODERS = {
+    protobuf.descriptor.FieldDescriptor.TYPE_DOUBLE: struct.Struct("<d"),
+    protobuf.descriptor.FieldDescriptor.TYPE_FLOAT: struct.Struct("<f"),
+    protobuf.descriptor.FieldDescriptor.TYPE_FIXED64: struct.Struct("<Q"),
+    protobuf.descriptor.FieldDescriptor.TYPE_SFIXED64: struct.Struct("<q"),
+    protobuf.descriptor.FieldDescriptor.TYPE_FIXED32: struct.Struct("<I"),
+    protobuf.descriptor.FieldDescriptor.TYPE_SFIXED32: struct.Struct("<i"),
+}
+
+
+def _decode_scalar(
+    field: protobuf.descriptor.FieldDescriptor, buffer: Union[bytes, memoryview], start: int, end: int
+) -> List[ord_schema.ScalarType]:
+    """Decodes a scalar field record; packed repeated fields give several values."""
+    if field.type == field.TYPE_STRING:
+        return [bytes(buffer[start:end]).decode()]
+    if field.type == field.TYPE_BYTES:
+        return [bytes(buffer[start:end])]
+    if field.type in _SCALAR_DECODERS:
+        decoder = _SCALAR_DECODERS[field.type]
+        return [value for value, in decoder.iter_unpack(buffer[start:end])]
+    values = []
+    pos = start
+    while pos < end:  # Packed repeated fields contain several varints.
+        value, pos = _decode_varint(buffer, pos)
+        if field.type in (field.TYPE_SINT32, field.TYPE_SINT64):
+            value = (value >> 1) ^ -(value & 1)
+        elif field.type in (field.TYPE_INT32, field.TYPE_INT64, field.TYPE_ENUM) and value >= 1 << 63:
+            value -= 1 << 64
+        elif field.type == field.TYPE_BOOL:
+            value = bool(value)
+        values.append(value)
+    return values
+
+
+@functools.lru_cache(maxsize=None)
+def _get_scan_tree(paths: Tuple[str, ...]) -> Dict[int, Any]:
+    """Builds a tree of field numbers for scalar paths relative to Reaction.
+
+    Internal nodes map field numbers to subtrees; leaves map field numbers to
+    lists of (path, FieldDescriptor) tuples.
+
+    Raises:
+        ValueError: if a path does not refer to a scalar field.
+    """
+    tree = {}
+    for path in paths:
+        descriptor = reaction_pb2.Reaction.DESCRIPTOR
+        node = tree
+        names = path.split(".")
+        for i, name in enumerate(names):
+            if descriptor is None or name not in descriptor.fields_by_name:
+                raise ValueError(f"unknown field path: {path}")
+            field = descriptor.fields_by_name[name]
+            if i == len(names) - 1:
+                if field.message_type is not None:
+                    raise ValueError(f"field path does not refer to a scalar field: {path}")
+                node.setdefault(field.number, []).append((path, field))
+            else:
+                node = node.setdefault(field.number, {})
+                descriptor = field.message_type
+    return tree
+
+
+def _scan_message(
+    buffer: Union[bytes, memoryview], start: int, end: int, tree: Dict[int, Any], values: Dict[str, List]
+):
+    """Collects the values of scalar paths from a serialized message."""
+    for field_number, wire_type, _, value_start, value_end in iter_wire_fields(buffer, start, end):
+        node = tree.get(field_number)
+        if node is None:
+            continue
+        if isinstance(node, dict):
+            if wire_type == _WIRETYPE_LENGTH_DELIMITED:
+                _scan_message(buffer, value_start, value_end, node, values)
+            continue
+        for path, field in node:
+            values[path].extend(_decode_scalar(field, buffer, value_start, value_end))
+
+
+def scan_dataset(filename: str, paths: Iterable[str] = ()) -> DatasetSummary:
+    """Summarizes a Dataset file without parsing its Reactions.
+
+    Binary files are scanned with scan_serialized_dataset. Text and JSON files
+    are parsed normally and then scanned.
+
+    Args:
+        filename: Dataset filename.
+        paths: Dotted paths to scalar fields relative to Reaction; see
+            scan_serialized_dataset.
+
+    Returns:
+        DatasetSummary.
+
+    Raises:
+        ValueError: if the file cannot be parsed or a path is invalid.
+    """
+    if filename.endswith((MessageFormat.BINARY.value, MessageFormat.BINARY.value + ".gz")):
+        value = _read_serialized_dataset(filename)
+    else:
+        value = load_message(filename, dataset_pb2.Dataset).SerializeToString()
+    try:
+        return scan_serialized_dataset(value, paths)
+    except protobuf.message.DecodeError as error:
+        raise ValueError(f"error parsing {filename}: {error}") from error
+
+
+def _read_serialized_dataset(filename: str) -> bytes:
+    """Reads the raw bytes of a binary Dataset file.
+
+    Raises:
+        ValueError: if `filename` is not a binary file.
+    """
+    if filename.endswith(MessageFormat.BINARY.value):
+        with open(filename, "rb") as f:
+            return f.read()
+    if not filename.endswith(MessageFormat.BINARY.value + ".gz"):
+        raise ValueError(f"expected a binary Dataset: {filename}")
+    if blocked_gzip.is_blocked(filename):
+        return blocked_gzip.decompress(filename)
+    with gzip.open(filename, "rb") as f:
+        return f.read()
+
+
+def scan_serialized_dataset(value: Union[bytes, memoryview], paths: Iterable[str] = ()) -> DatasetSummary:
+    """Summarizes a serialized Dataset without parsing its Reactions.
+
+    The Dataset is walked at the wire level; Reaction submessages are skipped
+    except for the fields needed for the summary.
+
+    Args:
+        value: Serialized Dataset.
+        paths: Dotted paths to scalar fields relative to Reaction; for example,
+            "provenance.doi" or "outcomes.products.measurements.type". Unset
+            fields are not reported.
+
+    Returns:
+        DatasetSummary.
+
+    Raises:
+        DecodeError: if the Dataset cannot be parsed.
+        ValueError: if a path is invalid.
+    """
+    paths = tuple(paths)
+    scan_paths = tuple(dict.fromkeys(paths + ("reaction_id",)))
+    tree = _get_scan_tree(scan_paths)
+    summary = DatasetSummary(values={path: [] for path in paths})
+    try:
+        for field_number, wire_type, _, value_start, value_end in iter_wire_fields(value):
+            if wire_type != _WIRETYPE_LENGTH_DELIMITED:
+                continue
+            if field_number == dataset_pb2.Dataset.REACTIONS_FIELD_NUMBER:
+                summary.num_reactions += 1
+                reaction_values = {path: [] for path in scan_paths}
+                _scan_message(value, value_start, value_end, tree, reaction_values)
+                reaction_ids = reaction_values["reaction_id"]
+                summary.reaction_ids.append(reaction_ids[-1] if reaction_ids else "")
+                for path in paths:
+                    summary.values[path].append(reaction_values[path])
+            elif field_number == dataset_pb2.Dataset.NAME_FIELD_NUMBER:
+                summary.name = bytes(value[value_start:value_end]).decode()
+            elif field_number == dataset_pb2.Dataset.DATASET_ID_FIELD_NUMBER:
+                summary.dataset_id = bytes(value[value_start:value_end]).decode()
+    except UnicodeDecodeError as error:
+        raise protobuf.message.DecodeError(f"invalid UTF-8 string: {error}") from error
+    return summary
+
+
+def scan_serialized_reaction(value: Union[bytes, memoryview], paths: Iterable[str]) -> Dict[str, List[Any]]:
+    """Extracts scalar field values from a serialized Reaction without parsing it.
+
+    Args:
+        value: Serialized Reaction.
+        paths: Dotted paths to scalar fields relative to Reaction; see
+            scan_serialized_dataset.
+
+    Returns:
+        Dict mapping each path to the list of its values, in wire order.
+
+    Raises:
+        DecodeError: if the Reaction cannot be parsed.
+        ValueError: if a path is invalid.
+    """
+    paths = tuple(paths)
+    values = {path: [] for path in paths}
+    try:
+        _scan_message(value, 0, len(value), _get_scan_tree(paths), values)
+    except UnicodeDecodeError as error:
+        raise protobuf.message.DecodeError(f"invalid UTF-8 string: {error}") from error
+    return values
+
+
+def _read_stream_varint(f: io.BufferedIOBase) -> Optional[int]:
+    """Reads a base-128 varint from a stream; returns None at end of stream."""
+    value = 0
+    shift = 0
+    while True:
+        byte = f.read(1)
+        if not byte:
+            if shift:
+                raise protobuf.message.DecodeError("truncated varint")
+            return None
+        value |= (byte[0] & 0x7F) << shift
+        if not byte[0] & 0x80:
+            return value
+        shift += 7
+        if shift >= 64:
+            raise protobuf.message.DecodeError("varint is too long")
+
+
+def _read_stream_exactly(f: io.BufferedIOBase, size: int) -> bytes:
+    """Reads exactly `size` bytes from a stream."""
+    value = f.read(size)
+    if len(value) != size:
+        raise protobuf.message.DecodeError("truncated message")
+    return value
+
+
+def _skip_stream_bytes(f: io.BufferedIOBase, size: int):
+    """Skips exactly `size` bytes of a stream, reading at most io.DEFAULT_BUFFER_SIZE at a time."""
+    while size > 0:
+        skipped = len(f.read(min(size, io.DEFAULT_BUFFER_SIZE)))
+        if not skipped:
+            raise protobuf.message.DecodeError("truncated message")
+        size -= skipped
+
+
+def _iter_stream_fields(f: io.BufferedIOBase, select: Callable[[int], bool]) -> Iterator[Tuple[int, int, bytes]]:
+    """Reads the top-level fields of a serialized message stream.
+
+    This is the streaming counterpart of iter_wire_fields: only one field
+    record is held in memory at a time, and the values of length-delimited
+    fields that are not selected are skipped without being kept.
+
+    Args:
+        f: Binary stream positioned at the start of a serialized message.
+        select: Function that returns True for the field numbers to return.
+
+    Yields:
+        field_number: Field number from the tag.
+        wire_type: Wire type from the tag.
+        value: Serialized value; for length-delimited fields this excludes
+            the length prefix.
+
+    Raises:
+        DecodeError: if the message is truncated or uses unsupported (group)
+            wire types.
+    """
+    while True:
+        tag = _read_stream_varint(f)
+        if tag is None:
+            return
+        field_number, wire_type = tag >> 3, tag & 0x7
+        if wire_type == _WIRETYPE_VARINT:
+            value = _read_stream_varint(f)
+            if value is None:
+                raise protobuf.message.DecodeError("truncated varint")
+            value = encode_varint(value)
+        elif wire_type == _WIRETYPE_FIXED64:
+            value = _read_stream_exactly(f, 8)
+        elif wire_type == _WIRETYPE_LENGTH_DELIMITED:
+            length = _read_stream_varint(f)
+            if length is None:
+                raise protobuf.message.DecodeError("truncated varint")
+            if not select(field_number):
+                _skip_stream_bytes(f, length)
+                continue
+            value = _read_stream_exactly(f, length)
+        elif wire_type == _WIRETYPE_FIXED32:
+            value = _read_stream_exactly(f, 4)
+        else:
+            raise protobuf.message.DecodeError(f"unsupported wire type: {wire_type}")
+        if select(field_number):
+            yield field_number, wire_type, value
+
+
+def _is_reactions_field(field_number: int) -> bool:
+    """Returns True for the field number of Dataset.reactions."""
+    return field_number == dataset_pb2.Dataset.REACTIONS_FIELD_NUMBER
+
+
+@contextlib.contextmanager
+def _map_file(filename: str) -> Iterator[memoryview]:
+    """Memory-maps a file for reading; empty files (which cannot be mapped) give an empty view."""
+    with open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield memoryview(b"")
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+            yield view
+
+
+def _iter_mapped_reactions(filename: str, projection: Optional[_Projection]) -> Iterator[bytes]:
+    """Copies the serialized Reactions out of a memory-mapped *.pb Dataset."""
+    with _map_file(filename) as view:
+        for field_number, wire_type, _, value_start, value_end in iter_wire_fields(view):
+            if not _is_reactions_field(field_number) or wire_type != _WIRETYPE_LENGTH_DELIMITED:
+                continue
+            # NOTE: Release each slice before yielding so the map
+            # can be closed if iteration stops early.
+            with view[value_start:value_end] as value:
+                record = projection.apply(value) if projection is not None else bytes(value)
+            yield record
+
+
+def iter_serialized_reactions(filename: str, skip_fields: Optional[Iterable[str]] = None) -> Iterator[bytes]:
+    """Iterates over the serialized Reactions of a Dataset file.
+
+    Binary Datasets are read incrementally and split at the wire level, so the
+    Reactions are not parsed and only one Reaction (or, for blocked gzip files,
+    one block) is held in memory at a time: *.pb files are memory-mapped and
+    other *.pb.gz files are decompressed as a stream. Other formats are parsed
+    and re-serialized.
+
+    Args:
+        filename: Dataset filename (any format supported by load_message).
+        skip_fields: Full names of fields to omit from each Reaction; see
+            load_message.
+
+    Yields:
+        Serialized Reactions, in order.
+
+    Raises:
+        ValueError: if the Dataset cannot be parsed.
+    """
+    if not filename.endswith((MessageFormat.BINARY.value, MessageFormat.BINARY.value + ".gz")):
+        dataset = load_message(filename, dataset_pb2.Dataset, skip_fields=skip_fields)
+        for reaction in dataset.reactions:
+            yield reaction.SerializeToString(deterministic=True)
+        return
+    projection = None
+    if skip_fields:
+        projection = _get_projection(reaction_pb2.Reaction.DESCRIPTOR, frozenset(skip_fields))
+    try:
+        if filename.endswith(MessageFormat.BINARY.value):
+            yield from _iter_mapped_reactions(filename, projection)
+            return
+        if blocked_gzip.is_blocked(filename):
+            for _, _, _, _, value in iter_reaction_offsets(filename):
+                yield projection.apply(memoryview(value)) if projection is not None else value
+            return
+        with gzip.open(filename, "rb") as f:
+            for _, wire_type, value in _iter_stream_fields(f, _is_reactions_field):
+                if wire_type != _WIRETYPE_LENGTH_DELIMITED:
+                    continue
+                yield projection.apply(memoryview(value)) if projection is not None else value
+    except (protobuf.message.DecodeError, EOFError, OSError) as error:
+        raise ValueError(f"error parsing {filename}: {error}") from error
+
+
+def read_serialized_reactions(filename: str, skip_fields: Optional[Iterable[str]] = None) -> List[bytes]:
+    """Reads the serialized Reactions of a Dataset file.
+
+    Args:
+        filename: Dataset filename (any format supported by load_message).
+        skip_fields: Full names of fields to omit from each Reaction; see
+            load_message.
+
+    Returns:
+        List of serialized Reactions, in order; see iter_serialized_reactions.
+
+    Raises:
+        ValueError: if the Dataset cannot be parsed.
+    """
+    return list(iter_serialized_reactions(filename, skip_fields=skip_fields))
+
+
+def read_dataset_header(filename: str) -> dataset_pb2.Dataset:
+    """Reads the fields of a binary Dataset other than its Reactions.
+
+    The Reactions are skipped at the wire level without being parsed or held in
+    memory: *.pb files are memory-mapped and *.pb.gz files are decompressed as a
+    stream. Use iter_serialized_reactions to read the Reactions.
+
+    Args:
+        filename: Dataset filename (*.pb or *.pb.gz).
+
+    Returns:
+        Dataset containing every field except `reactions`.
+
+    Raises:
+        ValueError: if `filename` is not a binary file or the Dataset cannot be
+            parsed.
+    """
+    if not filename.endswith((MessageFormat.BINARY.value, MessageFormat.BINARY.value + ".gz")):
+        raise ValueError(f"expected a binary Dataset: {filename}")
+    pieces = []
+    try:
+        if filename.endswith(MessageFormat.BINARY.value):
+            with _map_file(filename) as view:
+                for field_number, _, tag_start, _, value_end in iter_wire_fields(view):
+                    if not _is_reactions_field(field_number):
+                        with view[tag_start:value_end] as value:
+                            pieces.append(bytes(value))
+        else:
+            with gzip.open(filename, "rb") as f:
+                for field_number, wire_type, value in _iter_stream_fields(
+                    f, lambda field_number: not _is_reactions_field(field_number)
+                ):
+                    pieces.append(encode_varint((field_number << 3) | wire_type))
+                    if wire_type == _WIRETYPE_LENGTH_DELIMITED:
+                        pieces.append(encode_varint(len(value)))
+                    pieces.append(value)
+        return dataset_pb2.Dataset.FromString(b"".join(pieces))
+    except (protobuf.message.DecodeError, EOFError, OSError) as error:
+        raise ValueError(f"error parsing {filename}: {error}") from error
+
+
+def iter_messages(
+    filenames: Union[str, Iterable[str]],
+    message_type: Type[MessageType],
+    prefetch: int = 2,
+    max_prefetch_bytes: int = 1 << 30,
+    skip_fields: Optional[Iterable[str]] = None,
+) -> Iterator[Tuple[str, MessageType]]:
+    """Loads messages from a set of files, prefetching upcoming files.
+
+    Files are read, decompressed, and parsed in a thread pool while the caller
+    processes the current message.
+
+    Example:
+        for filename, dataset in iter_messages("data/*/*.pb.gz", dataset_pb2.Dataset):
+            ...
+
+    Args:
+        filenames: Glob pattern (expanded recursively and sorted) or iterable
+            of filenames.
+        message_type: Message subclass.
+        prefetch: Maximum number of files in flight (submitted to the thread
+            pool but not yet returned to the caller), including the next one
+            to be returned. If 0, files are loaded serially in the calling
+            thread.
+        max_prefetch_bytes: Approximate limit on the total size of the files
+            in flight, measured as on-disk (compressed) bytes; at least one
+            file is always in flight. Compressed files expand when they are
+            loaded, so the memory used can be several times larger.
+        skip_fields: Full names of fields to omit; see load_message.
+
+    Yields:
+        filename: Text filename.
+        message: Message loaded from `filename`.
+
+    Raises:
+        ValueError: if a message cannot be parsed.
+    """
+    if skip_fields is not None:
+        skip_fields = tuple(skip_fields)
+    function = functools.partial(_load_message_with_filename, message_type=message_type, skip_fields=skip_fields)
+    yield from _prefetch(function, filenames, prefetch=prefetch, max_prefetch_bytes=max_prefetch_bytes)
+
+
+def iter_dataset_summaries(
+    filenames: Union[str, Iterable[str]],
+    paths: Iterable[str] = (),
+    prefetch: int = 2,
+    max_prefetch_bytes: int = 1 << 30,
+) -> Iterator[Tuple[str, DatasetSummary]]:
+    """Scans a set of Dataset files, prefetching upcoming files.
+
+    Args:
+        filenames: Glob pattern (expanded recursively and sorted) or iterable
+            of filenames.
+        paths: Dotted paths to scalar fields relative to Reaction; see
+            scan_serialized_dataset.
+        prefetch: Maximum number of files in flight; see iter_messages.
+        max_prefetch_bytes: Approximate limit on the total on-disk
+            (compressed) size of the files in flight; see iter_messages.
+
+    Yields:
+        filename: Text filename.
+        summary: DatasetSummary for `filename`.
+
+    Raises:
+        ValueError: if a Dataset cannot be parsed or a path is invalid.
+    """
+    function = functools.partial(_scan_dataset_with_filename, paths=tuple(paths))
+    yield from _prefetch(function, filenames, prefetch=prefetch, max_prefetch_bytes=max_prefetch_bytes)
+
+
+def _load_message_with_filename(
+    filename: str, message_type: Type[MessageType], skip_fields: Optional[Iterable[str]]
+) -> Tuple[str, MessageType]:
+    return filename, load_message(filename, message_type, skip_fields=skip_fields)
+
+
+def _scan_dataset_with_filename(filename: str, paths: Tuple[str, ...]) -> Tuple[str, DatasetSummary]:
+    return filename, scan_dataset(filename, paths)
+
+
+def _prefetch(
+    function: Callable[[str], Any],
+    filenames: Union[str, Iterable[str]],
+    prefetch: int,
+    max_prefetch_bytes: int,
+) -> Iterator[Any]:
+    """Applies a function to files in a thread pool, preserving order.
+
+    Args:
+        function: Function that takes a filename.
+        filenames: Glob pattern or iterable of filenames.
+        prefetch: Maximum number of files in flight, including the next one
+            to be returned; this is also the number of threads. If 0, files
+            are processed serially.
+        max_prefetch_bytes: Approximate limit on the total on-disk
+            (compressed) size of the files in flight.
+
+    Yields:
+        Results of `function`, in the order of `filenames`.
+    """
+    if isinstance(filenames, str):
+        filenames = sorted(glob.glob(filenames, recursive=True))
+    if prefetch < 1:
+        yield from map(function, filenames)
+        return
+    filenames = iter(filenames)
+    pending = collections.deque()  # (size, future) tuples.
+    pending_bytes = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=prefetch) as executor:
+        try:
+            next_filename = next(filenames, None)
+            while True:
+                while next_filename is not None and len(pending) < prefetch:
+                    size = os.path.getsize(next_filename)
+                    if pending and pending_bytes + size > max_prefetch_bytes:
+                        break
+                    pending.append((size, executor.submit(function, next_filename)))
+                    pending_bytes += size
+                    next_filename = next(filenames, None)
+                if not pending:
+                    return
+                size, future = pending.popleft()
+                pending_bytes -= size
+                yield future.result()
+        finally:
+            # Don't wait for files that will never be consumed.
+            for _, future in pending:
+                future.cancel()
+
+
+# Tokens that matter when splitting a text-format Dataset: strings, comments,
+# and message delimiters.
+_TEXT_TOKEN_PATTERN = re.compile(r"""\"(?:[^"\\\n]|\\.)*\"|'(?:[^'\\\n]|\\.)*'|#[^\n]*|[{}<>]""")
+_TEXT_REACTIONS_PATTERN = re.compile(r"\breactions\s*:?\s*\Z")
+
+
+def _split_dataset_text(value: str) -> Optional[Tuple[str, List[str]]]:
+    """Splits a text-format Dataset at top-level `reactions { ... }` blocks.
+
+    Args:
+        value: Text-format Dataset.
+
+    Returns:
+        header: The Dataset text without the reactions.
+        reactions: The contents of each reactions block, in order.
+        None is returned if the delimiters are unbalanced.
+    """
+    header = []
+    reactions = []
+    depth = 0
+    start = 0  # Start of the next header segment.
+    field_start = None  # Start of the current reactions block, if any.
+    reaction_start = None
+    for match in _TEXT_TOKEN_PATTERN.finditer(value):
+        token = match.group()
+        if token in ("{", "<"):
+            if depth == 0:
+                name_match = _TEXT_REACTIONS_PATTERN.search(value, start, match.start())
+                if name_match:
+                    field_start = name_match.start()
+                    reaction_start = match.end()
+            depth += 1
+        elif token in ("}", ">"):
+            depth -= 1
+            if depth < 0:
+                return None
+            if depth == 0 and field_start is not None:
+                header.append(value[start:field_start])
+                reactions.append(value[reaction_start : match.start()])
+                start = match.end()
+                field_start = None
+    if depth:
+        return None
+    header.append(value[start:])
+    return "".join(header), reactions
+
+
+def _parse_reactions_text(chunk: List[str]) -> List[bytes]:
+    """Parses text-format Reactions; returns serialized messages."""
+    return [text_format.Parse(value, reaction_pb2.Reaction()).SerializeToString() for value in chunk]
+
+
+def _format_reactions_text(chunk: List[bytes]) -> str:
+    """Formats serialized Reactions as top-level Dataset.reactions fields."""
+    pieces = []
+    for value in chunk:
+        reaction = reaction_pb2.Reaction.FromString(value)
+        pieces.extend(["reactions {\n", text_format.MessageToString(reaction, indent=2), "}\n"])
+    return "".join(pieces)
+
+
+def _get_chunk_size(num_items: int, num_workers: int) -> int:
+    """Returns a chunk size that gives each worker a few chunks."""
+    return max(1, -(-num_items // (4 * num_workers)))
+
+
+def parse_dataset_text(value: str, num_workers: int = 1) -> dataset_pb2.Dataset:
+    """Parses a text-format Dataset, parsing Reactions in parallel.
+
+    The text is split at top-level `reactions { ... }` blocks and the blocks
+    are parsed in a process pool. The result is identical to
+    text_format.Parse; if any block fails to parse, the full text is parsed
+    serially so that errors refer to the original line numbers. The full text
+    is also parsed serially if any reactions cannot be split out (e.g.
+    `reactions: [...]`), so the Reactions stay in order.
+
+    Args:
+        value: Text-format Dataset.
+        num_workers: Number of processes.
+
+    Returns:
+        Dataset message.
+
+    Raises:
+        ParseError: if the Dataset cannot be parsed.
+    """
+    split = _split_dataset_text(value) if num_workers != 1 else None
+    if split is None:
+        return text_format.Parse(value, dataset_pb2.Dataset())
+    header, reactions = split
+    try:
+        dataset = text_format.Parse(header, dataset_pb2.Dataset())
+        if dataset.reactions:
+            # NOTE: Some reactions could not be split out (e.g. list syntax or
+            # comments before the block); parse serially to keep their order.
+            return text_format.Parse(value, dataset_pb2.Dataset())
+        chunks = _chunked(reactions, _get_chunk_size(len(reactions), num_workers))
+        serialized = list(itertools.chain.from_iterable(_parallel_map(_parse_reactions_text, chunks, num_workers)))
+    except text_format.ParseError:
+        return text_format.Parse(value, dataset_pb2.Dataset())
+    pieces = [dataset.SerializeToString()]
+    for reaction in serialized:
+        pieces.extend([DATASET_REACTIONS_TAG, encode_varint(len(reaction)), reaction])
+    return dataset_pb2.Dataset.FromString(b"".join(pieces))
+
+
+def format_dataset_text(dataset: dataset_pb2.Dataset, num_workers: int = 1) -> str:
+    """Formats a Dataset as text, formatting Reactions in parallel.
+
+    The output is identical to text_format.MessageToString.
+
+    Args:
+        dataset: Dataset message.
+        num_workers: Number of processes.
+
+    Returns:
+        Text-format Dataset.
+    """
+    if num_workers == 1:
+        return text_format.MessageToString(dataset)
+    header = dataset_pb2.Dataset(name=dataset.name, description=dataset.description)
+    footer = dataset_pb2.Dataset(reaction_ids=dataset.reaction_ids, dataset_id=dataset.dataset_id)
+    serialized = [reaction.SerializeToString() for reaction in dataset.reactions]
+    chunks = _chunked(serialized, _get_chunk_size(len(serialized), num_workers))
+    pieces = [text_format.MessageToString(header)]
+    pieces.extend(_parallel_map(_format_reactions_text, chunks, num_workers))
+    pieces.append(text_format.MessageToString(footer))
+    return "".join(pieces)
+
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Splits an iterable into lists of (at most) `size` items."""
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _parallel_map(
+    function: Callable[[Any], Any],
+    items: Iterable[Any],
+    num_workers: int,
+    executor_class: Type[concurrent.futures.Executor] = concurrent.futures.ProcessPoolExecutor,
+) -> Iterator[Any]:
+    """Lazily maps a function over an iterable, preserving order.
+
+    Unlike Executor.map, only a bounded number of items are in flight at any
+    time, so memory use does not grow with the length of `items`.
+
+    Args:
+        function: Function to apply; must be picklable for process pools.
+        items: Iterable of arguments.
+        num_workers: Number of workers. If 1, items are processed serially in
+            the calling thread.
+        executor_class: Executor type.
+
+    Yields:
+        Results of `function`, in the order of `items`.
+    """
+    if num_workers == 1:
+        yield from map(function, items)
+        return
+    with executor_class(max_workers=num_workers) as executor:
+        pending = collections.deque()
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= 2 * num_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _open_jsonl(filename: str, mode: str) -> io.TextIOBase:
+    """Opens a (possibly gzipped) JSON Lines file in text mode."""
+    if not filename.endswith((".jsonl", ".jsonl.gz")):
+        raise ValueError(f"expected a *.jsonl or *.jsonl.gz filename: {filename}")
+    if filename.endswith(".gz"):
+        if mode == "w":
+            # Set a constant mtime so that round-trips result in identical files.
+            return io.TextIOWrapper(gzip.GzipFile(filename, "wb", mtime=1), encoding="utf-8")
+        return gzip.open(filename, "rt", encoding="utf-8")
+    return open(filename, mode, encoding="utf-8")  # pylint: disable=consider-using-with
+
+
+def _message_to_json_line(message: ord_schema.Message) -> str:
+    """Converts a message to a single line of JSON."""
+    return json.dumps(json_format.MessageToDict(message), separators=(",", ":"))
+
+
+def _serialized_to_json_lines(message_type: Type[MessageType], chunk: List[bytes]) -> str:
+    """Converts a chunk of serialized messages to JSON Lines; used by workers."""
+    return "".join(f"{_message_to_json_line(message_type.FromString(value))}\n" for value in chunk)
+
+
+def _json_lines_to_serialized(message_type: Type[MessageType], chunk: List[Tuple[int, str]]) -> List[bytes]:
+    """Converts a chunk of JSON Lines to serialized messages; used by workers.
+
+    Args:
+        message_type: Message subclass.
+        chunk: List of (line number, line) tuples.
+
+    Returns:
+        List of serialized messages.
+
+    Raises:
+        ValueError: if any line cannot be parsed.
+    """
+    values = []
+    for line_number, line in chunk:
+        try:
+            message = json_format.ParseDict(json.loads(line), message_type())
+        except (json.JSONDecodeError, json_format.ParseError) as error:
+            raise ValueError(f"error parsing line {line_number}: {error}") from error
+        values.append(message.SerializeToString())
+    return values
+
+
+def write_jsonl(
+    messages: Iterable[ord_schema.Message], filename: str, num_workers: int = 1, chunk_size: int = 1000
+) -> int:
+    """Writes messages to a JSON Lines file, one message per line.
+
+    Messages are written as they are consumed from `messages`, so memory use
+    does not depend on the number of messages.
+
+    Args:
+        messages: Iterable of messages (usually Reactions).
+        filename: Output filename; *.jsonl or *.jsonl.gz.
+        num_workers: Number of processes used to convert messages to JSON.
+        chunk_size: Number of messages sent to each worker at once.
+
+    Returns:
+        The number of messages written.
+
+    Raises:
+        ValueError: if `filename` does not have the expected suffix.
+    """
+    num_messages = 0
+    with _open_jsonl(filename, "w") as f:
+        if num_workers == 1:
+            for message in messages:
+                f.write(f"{_message_to_json_line(message)}\n")
+                num_messages += 1
+            return num_messages
+        iterator = iter(messages)
+        first = next(iterator, None)
+        if first is None:
+            return 0
+        function = functools.partial(_serialized_to_json_lines, type(first))
+        chunks = _chunked(
+            (message.SerializeToString() for message in itertools.chain([first], iterator)),
+            chunk_size,
+        )
+        for lines in _parallel_map(function, chunks, num_workers=num_workers):
+            f.write(lines)
+            num_messages += lines.count("\n")  # JSON strings never contain raw newlines.
+    return num_messages
+
+
+def iter_jsonl(
+    filename: str,
+    message_type: Type[MessageType] = reaction_pb2.Reaction,
+    num_workers: int = 1,
+    chunk_size: int = 1000,
+) -> Iterator[MessageType]:
+    """Reads messages from a JSON Lines file, one message per line.
+
+    Args:
+        filename: Input filename; *.jsonl or *.jsonl.gz.
+        message_type: Message subclass.
+        num_workers: Number of processes used to parse JSON.
+        chunk_size: Number of lines sent to each worker at once.
+
+    Yields:
+        Messages, in file order.
+
+    Raises:
+        ValueError: if `filename` does not have the expected suffix or if any
+            line cannot be parsed.
+    """
+    with _open_jsonl(filename, "r") as f:
+        if num_workers == 1:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    message = json_format.ParseDict(json.loads(line), message_type())
+                except (json.JSONDecodeError, json_format.ParseError) as error:
+                    raise ValueError(f"{filename}: error parsing line {line_number}: {error}") from error
+                yield message
+            return
+        function = functools.partial(_json_lines_to_serialized, message_type)
+        try:
+            for values in _parallel_map(function, _iter_line_chunks(f, chunk_size), num_workers=num_workers):
+                for value in values:
+                    yield message_type.FromString(value)
+        except ValueError as error:
+            raise ValueError(f"{filename}: {error}") from error
+
+
+def _iter_line_chunks(f: io.TextIOBase, chunk_size: int) -> Iterator[List[Tuple[int, str]]]:
+    """Groups the non-empty lines of a file into chunks.
+
+    Args:
+        f: Text file-like object.
+        chunk_size: Number of lines per chunk.
+
+    Yields:
+        Lists of (1-based line number, line) tuples.
+    """
+    lines = ((line_number, line) for line_number, line in enumerate(f, start=1) if line.strip())
+    yield from _chunked(lines, chunk_size)
 
 
 def id_filename(filename: str) -> str:
@@ -815,31 +2488,428 @@ def create_message(message_name: str) -> ord_schema.Message:
         raise ValueError(f"Cannot resolve message name {message_name}") from error
 
 
-def messages_to_dataframe(messages: Iterable[ord_schema.Message], drop_constant_columns: bool = False) -> pd.DataFrame:
+def messages_to_dataframe(
+    messages: Iterable[ord_schema.Message],
+    drop_constant_columns: bool = False,
+    num_workers: int = 1,
+    typed: bool = False,
+) -> pd.DataFrame:
     """Converts a list of protos to a pandas DataFrame.
 
+    Column names are the same as the keys returned by message_to_row; values
+    are accumulated column by column and the DataFrame is built once.
+
+    If num_workers > 1, the messages are serialized and converted in chunks in
+    a process pool; the partial DataFrames are concatenated in order, so the
+    result is the same as for serial conversion.
+
+    If typed is True, columns get compact dtypes based on the field
+    descriptors (see _get_column_dtype): enums are Categorical with the enum
+    value names as categories, numeric fields use nullable dtypes of the
+    declared width, and booleans use the nullable boolean dtype. Missing values
+    are pd.NA (or NaN for floating point columns).
+
     Args:
         messages: List of protos.
         drop_constant_columns: Whether to drop columns that have the same value
             for all rows.
+        num_workers: Number of processes.
+        typed: Whether to use typed columns.
 
     Returns:
         DataFrame.
     """
-    rows = []
-    for message in messages:
-        rows.append(message_to_row(message))
-    df = pd.DataFrame(rows)
+    if num_workers == 1:
+        builder = _ColumnBuilder()
+        for message in messages:
+            builder.add(message)
+        df = builder.build(typed=typed)
+    else:
+        serialized = [(type(message), message.SerializeToString()) for message in messages]
+        chunk_size = _get_chunk_size(len(serialized), num_workers)
+        chunks = (
+            (start, serialized[start : start + chunk_size], typed) for start in range(0, len(serialized), chunk_size)
+        )
+        frames = list(_parallel_map(_serialized_to_dataframe, chunks, num_workers))
+        # NOTE: Columns are aligned in order of first appearance, as in _ColumnBuilder.
+        df = pd.concat(frames, sort=False) if frames else pd.DataFrame()
+        if typed:
+            # Restore dtypes that were lost to alignment (e.g. Categorical columns missing from some chunks).
+            dtypes = {}
+            for frame in frames:
+                for column, dtype in frame.dtypes.items():
+                    dtypes.setdefault(column, dtype)
+            df = df.astype(dtypes)
     if drop_constant_columns:
-        drop = []
-        for column in df.columns:
-            if len(df[column].unique()) == 1:
-                drop.append(column)
-        for column in drop:
-            del df[column]
+        num_unique = df.nunique(dropna=False)
+        df = df.loc[:, (num_unique != 1).to_numpy()]
     return df
 
 
+def _serialized_to_dataframe(chunk: Tuple[int, List[Tuple[Type[MessageType], bytes]], bool]) -> pd.DataFrame:
+    """Converts a chunk of (message type, serialized message) pairs; used by workers."""
+    start, values, typed = chunk
+    builder = _ColumnBuilder()
+    for message_type, value in values:
+        builder.add(message_type.FromString(value))
+    return builder.build(start=start, typed=typed)
+
+
+_FLOAT_CPPTYPES = frozenset([ord_schema.FieldDescriptor.CPPTYPE_DOUBLE, ord_schema.FieldDescriptor.CPPTYPE_FLOAT])
+_INT_CPPTYPES = frozenset([ord_schema.FieldDescriptor.CPPTYPE_INT32, ord_schema.FieldDescriptor.CPPTYPE_INT64])
+# Maps scalar field types to pandas dtypes for typed columns; see _get_column_dtype.
+_COLUMN_DTYPES = {
+    ord_schema.FieldDescriptor.CPPTYPE_DOUBLE: "float64",
+    ord_schema.FieldDescriptor.CPPTYPE_FLOAT: "float32",
+    ord_schema.FieldDescriptor.CPPTYPE_INT32: "Int32",
+    ord_schema.FieldDescriptor.CPPTYPE_INT64: "Int64",
+    ord_schema.FieldDescriptor.CPPTYPE_UINT32: "UInt32",
+    ord_schema.FieldDescriptor.CPPTYPE_UINT64: "UInt64",
+    ord_schema.FieldDescriptor.CPPTYPE_BOOL: "boolean",
+    ord_schema.FieldDescriptor.CPPTYPE_STRING: "string",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _get_column_dtype(field: ord_schema.FieldDescriptor) -> Union[str, pd.api.types.CategoricalDtype]:
+    """Returns the pandas dtype for a typed column.
+
+    Enums are Categorical with the enum value names as categories (in order of
+    definition), bytes are objects, and everything else uses the (nullable)
+    dtype matching the declared field type.
+    """
+    if field.type == field.TYPE_ENUM:
+        return pd.CategoricalDtype([value.name for value in field.enum_type.values])
+    if field.type == field.TYPE_BYTES:
+        return "object"
+    return _COLUMN_DTYPES[field.cpp_type]
+
+
+class _ColumnBuilder:
+    """Accumulates scalar values from messages in per-column buffers.
+
+    Each column records the rows it has values for, so rows never need to be
+    materialized as dicts. Column names are cached by (prefix, field, index).
+    """
+
+    def __init__(self):
+        self.num_rows = 0
+        # Maps column names to (field, rows, values) tuples.
+        self._columns: Dict[str, Tuple[ord_schema.FieldDescriptor, List[int], List[ord_schema.ScalarType]]] = {}
+        self._names: Dict[Tuple[str, str, Union[int, str, None], bool], str] = {}
+
+    def add(self, message: ord_schema.Message):
+        """Adds a row."""
+        self._add_message(message, "")
+        self.num_rows += 1
+
+    def build(self, start: int = 0, typed: bool = False) -> pd.DataFrame:
+        """Builds a DataFrame; missing values are NaN.
+
+        Args:
+            start: Index of the first row.
+            typed: Whether to use typed columns; see messages_to_dataframe.
+
+        Returns:
+            DataFrame.
+        """
+        if not self.num_rows:
+            return pd.DataFrame()
+        data = {}
+        for name, (field, rows, values) in self._columns.items():
+            if typed:
+                column = self._build_typed_column(field, rows, values)
+            elif field.cpp_type in _FLOAT_CPPTYPES or (field.cpp_type in _INT_CPPTYPES and len(rows) < self.num_rows):
+                column = np.full(self.num_rows, np.nan)
+                column[rows] = values
+            elif len(rows) == self.num_rows:
+                column = values
+            else:
+                column = [np.nan] * self.num_rows
+                for row, value in zip(rows, values):
+                    column[row] = value
+            data[name] = column
+        return pd.DataFrame(data, index=pd.RangeIndex(start, start + self.num_rows))
+
+    def _build_typed_column(
+        self, field: ord_schema.FieldDescriptor, rows: List[int], values: List[ord_schema.ScalarType]
+    ) -> Union[np.ndarray, pd.api.extensions.ExtensionArray]:
+        """Builds a typed column; see _get_column_dtype."""
+        dtype = _get_column_dtype(field)
+        if field.cpp_type in _FLOAT_CPPTYPES:
+            column = np.full(self.num_rows, np.nan, dtype=dtype)
+            column[rows] = values
+            return column
+        if dtype in ("boolean", "Int32", "Int64", "UInt32", "UInt64"):
+            data = np.zeros(self.num_rows, dtype=pd.api.types.pandas_dtype(dtype).numpy_dtype)
+            data[rows] = values
+            mask = np.ones(self.num_rows, dtype=bool)
+            mask[rows] = False
+            if field.cpp_type == field.CPPTYPE_BOOL:
+                return pd.arrays.BooleanArray(data, mask)
+            return pd.arrays.IntegerArray(data, mask)
+        if isinstance(dtype, pd.CategoricalDtype):
+            codes = np.full(self.num_rows, -1, dtype=np.int32)
+            lookup = {name: code for code, name in enumerate(dtype.categories)}
+            codes[rows] = [lookup[value] for value in values]
+            return pd.Categorical.from_codes(codes, dtype=dtype)
+        if len(rows) < self.num_rows:
+            column = [None] * self.num_rows
+            for row, value in zip(rows, values):
+                column[row] = value
+            values = column
+        return pd.array(values, dtype=dtype)
+
+    @property
+    def fields(self) -> Dict[str, ord_schema.FieldDescriptor]:
+        """Maps column names to field descriptors, in column order."""
+        return {name: field for name, (field, _, _) in self._columns.items()}
+
+    def _get_name(self, prefix: str, field_name: str, index: Union[int, str, None], is_map: bool) -> str:
+        """Returns the column name for a field; see message_to_row."""
+        key = (prefix, field_name, index, is_map)
+        name = self._names.get(key)
+        if name is None:
+            if is_map:
+                name = f'{field_name}["{index}"]'
+            elif index is not None:
+                name = f"{field_name}[{index}]"
+            else:
+                name = field_name
+            if prefix:
+                name = f"{prefix}.{name}"
+            self._names[key] = name
+        return name
+
+    def _add_message(self, message: ord_schema.Message, prefix: str):
+        """Adds the fields of a message to the current row."""
+        for field, value in message.ListFields():
+            if field.label == field.LABEL_REPEATED:
+                if field.type == field.TYPE_MESSAGE and field.message_type.GetOptions().map_entry:
+                    value_field = field.message_type.fields_by_name["value"]
+                    for key, subvalue in value.items():
+                        self._add_value(value_field, subvalue, self._get_name(prefix, field.name, key, True))
+                else:
+                    for i, subvalue in enumerate(value):
+                        self._add_value(field, subvalue, self._get_name(prefix, field.name, i, False))
+            else:
+                self._add_value(field, value, self._get_name(prefix, field.name, None, False))
+
+    def _add_value(
+        self, field: ord_schema.FieldDescriptor, value: Union[ord_schema.Message, ord_schema.ScalarType], name: str
+    ):
+        """Adds a single value to the current row."""
+        if field.type == field.TYPE_MESSAGE:
+            self._add_message(value, name)
+            return
+        if field.type == field.TYPE_ENUM:
+            value = field.enum_type.values_by_number[value].name
+        column = self._columns.get(name)
+        if column is None:
+            column = (field, [], [])
+            self._columns[name] = column
+        elif column[1][-1] == self.num_rows:
+            raise KeyError(f"key already exists: {name}")
+        column[1].append(self.num_rows)
+        column[2].append(value)
+
+
+def iter_dataframes(
+    messages: Iterable[ord_schema.Message], chunk_size: int = 10000, typed: bool = False
+) -> Iterator[pd.DataFrame]:
+    """Converts protos to pandas DataFrames, `chunk_size` rows at a time.
+
+    Each chunk is built as in messages_to_dataframe, so only one chunk needs to
+    be in memory at a time. Chunks only have columns for the fields that are set
+    in their rows; row indices continue across chunks.
+
+    Args:
+        messages: Iterable of protos.
+        chunk_size: Number of rows per DataFrame.
+        typed: Whether to use typed columns; see messages_to_dataframe.
+
+    Yields:
+        DataFrames.
+    """
+    start = 0
+    for chunk in _chunked(messages, chunk_size):
+        builder = _ColumnBuilder()
+        for message in chunk:
+            builder.add(message)
+        yield builder.build(start=start, typed=typed)
+        start += builder.num_rows
+
+
+class DataFrameFormat(enum.Enum):
+    """File formats for DataFrameWriter."""
+
+    CSV = ".csv.gz"
+    PARQUET = ".parquet"  # Requires pyarrow.
+
+
+def _check_dataframe_format(file_format: DataFrameFormat):
+    """Raises ValueError if the dependencies of a DataFrameFormat are missing."""
+    if file_format == DataFrameFormat.PARQUET and importlib.util.find_spec("pyarrow") is None:
+        raise ValueError("PARQUET output requires pyarrow")
+
+
+_DATAFRAME_SCHEMA_FILENAME = "schema.json"
+
+
+class DataFrameWriter:
+    """Writes protos to a directory of DataFrame files, one chunk at a time.
+
+    Rows are flattened as in messages_to_dataframe and every `chunk_size` rows
+    are written to a new part file (part-00000.csv.gz, part-00001.csv.gz, ...).
+    When the writer is closed, schema.json records the union of the columns in
+    all parts (in order of first appearance) along with their dtypes; use
+    read_dataframes to read the parts back with a consistent schema. If the
+    with-block raises, the schema is not written, so the incomplete output is
+    not mistaken for a complete one.
+
+    NOTE: Bytes values cannot be round-tripped through CSV.
+
+    Example:
+        with DataFrameWriter("reactions", chunk_size=100000) as writer:
+            for reaction in reactions:
+                writer.write(reaction)
+        df = pd.concat(read_dataframes("reactions", columns=["identifiers[0].value"]))
+    """
+
+    def __init__(self, dirname: str, chunk_size: int = 10000, file_format: DataFrameFormat = DataFrameFormat.CSV):
+        """Initializes the writer.
+
+        Args:
+            dirname: Output directory; created if it does not exist.
+            chunk_size: Number of rows per part file.
+            file_format: DataFrameFormat.
+
+        Raises:
+            ValueError: if `dirname` already contains a schema or the
+                dependencies of `file_format` are not installed.
+        """
+        file_format = DataFrameFormat(file_format)
+        _check_dataframe_format(file_format)
+        if os.path.exists(os.path.join(dirname, _DATAFRAME_SCHEMA_FILENAME)):
+            raise ValueError(f"output directory already contains a schema: {dirname}")
+        os.makedirs(dirname, exist_ok=True)
+        self._dirname = dirname
+        self._chunk_size = chunk_size
+        self._format = file_format
+        self._builder = _ColumnBuilder()
+        self._dtypes: Dict[str, str] = {}
+        self.filenames: List[str] = []
+        self._parts: List[Dict[str, Any]] = []
+        self.num_rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+    def write(self, message: ord_schema.Message):
+        """Adds a row, writing a part file if the current chunk is full."""
+        self._builder.add(message)
+        if self._builder.num_rows >= self._chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the current chunk (if any) to a new part file."""
+        if not self._builder.num_rows:
+            return
+        for name, field in self._builder.fields.items():
+            if name not in self._dtypes:
+                dtype = _get_column_dtype(field)
+                # NOTE: Enum values are stored (and read back) as strings.
+                self._dtypes[name] = "string" if isinstance(dtype, pd.CategoricalDtype) else dtype
+        df = self._builder.build(start=self.num_rows, typed=True)
+        filename = os.path.join(self._dirname, f"part-{len(self.filenames):05d}{self._format.value}")
+        if self._format == DataFrameFormat.CSV:
+            # Set a constant mtime so that identical chunks result in identical files.
+            df.to_csv(filename, index=False, compression={"method": "gzip", "mtime": 1})
+        else:
+            df.to_parquet(filename, index=False)
+        self.filenames.append(filename)
+        self._parts.append(
+            {"filename": os.path.basename(filename), "num_rows": self._builder.num_rows, "columns": list(df.columns)}
+        )
+        self.num_rows += self._builder.num_rows
+        self._builder = _ColumnBuilder()
+
+    def close(self):
+        """Writes any remaining rows and the schema."""
+        self.flush()
+        schema = {
+            "format": self._format.name,
+            "num_rows": self.num_rows,
+            "parts": self._parts,
+            "columns": self._dtypes,
+        }
+        with open(os.path.join(self._dirname, _DATAFRAME_SCHEMA_FILENAME), "w") as f:
+            json.dump(schema, f, indent=2)
+
+
+def read_dataframes(dirname: str, columns: Optional[Iterable[str]] = None) -> Iterator[pd.DataFrame]:
+    """Reads the part files written by DataFrameWriter, one at a time.
+
+    Every DataFrame has the same columns (the union across all parts, or
+    `columns` if provided) with the dtypes recorded in the schema; columns that
+    are not present in a part are filled with missing values.
+
+    Args:
+        dirname: Directory written by DataFrameWriter.
+        columns: Optional subset of columns to read.
+
+    Yields:
+        DataFrames.
+
+    Raises:
+        ValueError: if the schema cannot be read or `columns` contains unknown
+            columns.
+    """
+    filename = os.path.join(dirname, _DATAFRAME_SCHEMA_FILENAME)
+    try:
+        with open(filename) as f:
+            schema = json.load(f)
+        file_format = DataFrameFormat[schema["format"]]
+        dtypes = schema["columns"]
+        parts = schema["parts"]
+    except (OSError, KeyError, ValueError) as error:
+        raise ValueError(f"error parsing {filename}: {error}") from error
+    if columns is not None:
+        columns = list(columns)
+        unknown = set(columns).difference(dtypes)
+        if unknown:
+            raise ValueError(f"unknown columns: {sorted(unknown)}")
+        dtypes = {column: dtypes[column] for column in columns}
+    start = 0
+    for part in parts:
+        part_filename = os.path.join(dirname, part["filename"])
+        index = pd.RangeIndex(start, start + part["num_rows"])
+        start += part["num_rows"]
+        try:
+            if file_format == DataFrameFormat.CSV:
+                df = pd.read_csv(
+                    part_filename,
+                    usecols=lambda column: column in dtypes,
+                    dtype=dtypes,
+                    keep_default_na=False,
+                    na_values=[""],
+                )
+            else:
+                part_columns = set(part["columns"])
+                df = pd.read_parquet(part_filename, columns=[column for column in dtypes if column in part_columns])
+        except pd.errors.EmptyDataError:
+            df = pd.DataFrame()  # None of the rows in this part have values.
+        if not len(df.columns):
+            df = pd.DataFrame(index=index)
+        df = df.reindex(columns=list(dtypes)).astype(dtypes)
+        df.index = index
+        yield df
+
+
 def message_to_row(message: ord_schema.Message, trace: Optional[Tuple[str]] = None) -> Dict[str, ord_schema.ScalarType]:
     """Converts a proto into a flat dictionary mapping fields to values.
 
@@ -933,3 +3003,28 @@ def parse_doi(doi: str) -> str:
     if not match:
         raise ValueError(f"could not parse DOI: {doi}")
     return match.group(1)
+
+
+# Streaming writers that moved to ord_schema.dataset_writer; they are loaded
+# lazily since dataset_writer imports this module.
+_DATASET_WRITER_NAMES = frozenset(
+    [
+        "DatasetWriter",
+        "ShardedDatasetWriter",
+        "append_reactions",
+        "compact_dataset",
+        "find_shards",
+        "get_shard_filename",
+        "merge_shards",
+        "shard_dataset",
+    ]
+)
+
+
+def __getattr__(name: str) -> Any:
+    """Re-exports the streaming writers from ord_schema.dataset_writer."""
+    if name in _DATASET_WRITER_NAMES:
+        from ord_schema import dataset_writer  # pylint: disable=import-outside-toplevel
+
+        return getattr(dataset_writer, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
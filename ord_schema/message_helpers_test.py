@@ -13,19 +13,31 @@
 # limitations under the License.
 """Tests for ord_schema.message_helpers."""
 
+import gzip
+import importlib.util
+import json
 import os
+import re
+import subprocess
+import sys
 import tempfile
+import textwrap
 import time
+from unittest import mock
 
 from absl import flags
 from absl.testing import absltest
 from absl.testing import parameterized
 from google.protobuf import json_format
 from google.protobuf import text_format
+import numpy as np
 import pandas as pd
 from rdkit import Chem
 
+from ord_schema import blob_store
+from ord_schema import blocked_gzip
 from ord_schema import message_helpers
+from ord_schema.proto import dataset_pb2
 from ord_schema.proto import reaction_pb2
 from ord_schema.proto import test_pb2
 
@@ -239,6 +251,29 @@ class BuildDataTest(absltest.TestCase):
         with self.assertRaisesRegex(ValueError, "cannot deduce the file format"):
             message_helpers.build_data("testdata", "no description")
 
+    def test_build_data_with_store(self):
+        store = blob_store.BlobStore(os.path.join(self.test_subdirectory, "blobs"))
+        message = message_helpers.build_data(self.filename, description="binary data", store=store)
+        self.assertFalse(message.bytes_value)
+        self.assertStartsWith(message.url, "sha256:")
+        self.assertEqual(message.format, "data")
+        self.assertEqual(store.resolve(message), self.data)
+
+    def test_pack_and_unpack(self):
+        store = blob_store.BlobStore(os.path.join(self.test_subdirectory, "blobs"))
+        reaction = reaction_pb2.Reaction()
+        analysis = reaction.outcomes.add().analyses["test"]
+        analysis.data["large"].bytes_value = self.data * 100
+        analysis.data["small"].bytes_value = self.data
+        analysis.data["text"].string_value = "test"
+        expected = reaction_pb2.Reaction()
+        expected.CopyFrom(reaction)
+        self.assertEqual(message_helpers.pack_data(reaction, store, min_size=100), 1)
+        self.assertStartsWith(analysis.data["large"].url, "sha256:")
+        self.assertEqual(analysis.data["small"].bytes_value, self.data)
+        self.assertEqual(message_helpers.unpack_data(reaction, store), 1)
+        self.assertEqual(reaction, expected)
+
 
 class BuildCompoundTest(parameterized.TestCase, absltest.TestCase):
     def test_smiles_and_name(self):
@@ -438,6 +473,38 @@ class LoadAndWriteMessageTest(parameterized.TestCase, absltest.TestCase):
             with open(filename, "rb") as f:
                 self.assertEqual(f.read(), value)
 
+    @parameterized.parameters(".pb.gz", ".pbtxt.gz", ".json.gz")
+    def test_blocked_gzip(self, suffix):
+        dataset = dataset_pb2.Dataset(name="test", dataset_id="ord_dataset-1")
+        for i in range(50):
+            dataset.reactions.add(reaction_id=f"ord-{i}").identifiers.add(value="C" * i, type="REACTION_SMILES")
+        filename = os.path.join(self.test_directory, f"test{suffix}")
+        message_helpers.write_message(dataset, filename, block_size=256, num_threads=2)
+        self.assertGreater(len(blocked_gzip.read_index(filename)), 1)
+        self.assertEqual(message_helpers.load_message(filename, dataset_pb2.Dataset), dataset)
+        with gzip.open(filename, "rb") as f:
+            value = f.read()
+        # Blocks do not change the uncompressed contents.
+        message_helpers.write_message(dataset, filename)
+        with gzip.open(filename, "rb") as f:
+            self.assertEqual(f.read(), value)
+
+    def test_load_reaction(self):
+        dataset = dataset_pb2.Dataset(name="test")
+        for i in range(50):
+            dataset.reactions.add(reaction_id=f"ord-{i}")
+        for suffix in [".pb", ".pb.gz"]:
+            filename = os.path.join(self.test_directory, f"test{suffix}")
+            message_helpers.write_message(dataset, filename, block_size=64)
+            self.assertEqual(message_helpers.load_reaction(filename, 23), dataset.reactions[23])
+            self.assertEqual(message_helpers.load_reaction(filename, -1), dataset.reactions[49])
+            with self.assertRaises(IndexError):
+                message_helpers.load_reaction(filename, 50)
+        filename = os.path.join(self.test_directory, "test.pbtxt")
+        message_helpers.write_message(dataset, filename)
+        with self.assertRaisesRegex(ValueError, "random access"):
+            message_helpers.load_reaction(filename, 0)
+
     def test_bad_binary(self):
         with tempfile.NamedTemporaryFile(suffix=".pb") as f:
             message = test_pb2.RepeatedScalar(values=[1.2, 3.4])
@@ -449,6 +516,12 @@ class LoadAndWriteMessageTest(parameterized.TestCase, absltest.TestCase):
             with self.assertRaisesRegex(ValueError, "Error parsing message"):
                 message_helpers.load_message(f.name, test_pb2.Nested)
 
+    def test_empty_binary(self):
+        filename = os.path.join(self.test_directory, "empty.pb")
+        with open(filename, "wb"):
+            pass
+        self.assertEqual(message_helpers.load_message(filename, test_pb2.Scalar), test_pb2.Scalar())
+
     def test_bad_json(self):
         with tempfile.NamedTemporaryFile(mode="w+", suffix=".json") as f:
             message = test_pb2.RepeatedScalar(values=[1.2, 3.4])
@@ -471,6 +544,629 @@ class LoadAndWriteMessageTest(parameterized.TestCase, absltest.TestCase):
             message_helpers.write_message(message, "test.proto")
 
 
+class ScanDatasetTest(parameterized.TestCase, absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_directory = self.create_tempdir()
+        self.dataset = dataset_pb2.Dataset(name="test", dataset_id="ord_dataset-1", reaction_ids=["ord-a"])
+        reaction = self.dataset.reactions.add(reaction_id="ord-1")
+        reaction.provenance.doi = "10.1000/xyz123"
+        reaction.inputs["test"].addition_order = -1
+        measurement = reaction.outcomes.add().products.add().measurements.add()
+        measurement.mass_spec_details.eic_masses.extend([1.5, 2.25])
+        measurement.uses_internal_standard = True
+        self.dataset.reactions.add()  # No reaction_id.
+        reaction = self.dataset.reactions.add(reaction_id="ord-3")
+        reaction.outcomes.add().products.add().measurements.add().mass_spec_details.eic_masses.append(3.0)
+        reaction.outcomes.add().products.add().measurements.add().mass_spec_details.eic_masses.append(4.0)
+
+    @parameterized.parameters(".pb", ".pb.gz", ".pbtxt", ".json")
+    def test_scan_dataset(self, suffix):
+        filename = os.path.join(self.test_directory, f"dataset{suffix}")
+        message_helpers.write_message(self.dataset, filename)
+        summary = message_helpers.scan_dataset(
+            filename,
+            paths=[
+                "provenance.doi",
+                "inputs.value.addition_order",
+                "outcomes.products.measurements.mass_spec_details.eic_masses",
+                "outcomes.products.measurements.uses_internal_standard",
+            ],
+        )
+        self.assertEqual(summary.name, "test")
+        self.assertEqual(summary.dataset_id, "ord_dataset-1")
+        self.assertEqual(summary.num_reactions, 3)
+        self.assertEqual(summary.reaction_ids, ["ord-1", "", "ord-3"])
+        self.assertEqual(summary.values["provenance.doi"], [["10.1000/xyz123"], [], []])
+        self.assertEqual(summary.values["inputs.value.addition_order"], [[-1], [], []])
+        self.assertEqual(
+            summary.values["outcomes.products.measurements.mass_spec_details.eic_masses"],
+            [[1.5, 2.25], [], [3.0, 4.0]],
+        )
+        self.assertEqual(summary.values["outcomes.products.measurements.uses_internal_standard"], [[True], [], []])
+
+    def test_scan_serialized_reaction(self):
+        value = self.dataset.reactions[2].SerializeToString()
+        values = message_helpers.scan_serialized_reaction(
+            value, ["reaction_id", "provenance.doi", "outcomes.products.measurements.mass_spec_details.eic_masses"]
+        )
+        self.assertEqual(
+            values,
+            {
+                "reaction_id": ["ord-3"],
+                "provenance.doi": [],
+                "outcomes.products.measurements.mass_spec_details.eic_masses": [3.0, 4.0],
+            },
+        )
+        with self.assertRaisesRegex(ValueError, "unknown field path"):
+            message_helpers.scan_serialized_reaction(value, ["not_a_field"])
+
+    @parameterized.parameters(".pb", ".pb.gz", ".pbtxt", ".json")
+    def test_read_serialized_reactions(self, suffix):
+        filename = os.path.join(self.test_directory, f"dataset{suffix}")
+        message_helpers.write_message(self.dataset, filename)
+        records = message_helpers.read_serialized_reactions(filename)
+        self.assertEqual([reaction_pb2.Reaction.FromString(record) for record in records], list(self.dataset.reactions))
+        records = message_helpers.read_serialized_reactions(filename, skip_fields=["ord.Reaction.provenance"])
+        self.assertFalse(reaction_pb2.Reaction.FromString(records[0]).HasField("provenance"))
+        self.assertEqual(reaction_pb2.Reaction.FromString(records[0]).reaction_id, "ord-1")
+
+    @parameterized.parameters(".pb", ".pb.gz")
+    def test_iter_serialized_reactions_early_close(self, suffix):
+        filename = os.path.join(self.test_directory, f"dataset{suffix}")
+        message_helpers.write_message(self.dataset, filename)
+        records = message_helpers.iter_serialized_reactions(filename)
+        self.assertEqual(reaction_pb2.Reaction.FromString(next(records)), self.dataset.reactions[0])
+        records.close()  # Releases the memory map or gzip stream.
+
+    def test_iter_serialized_reactions_mixed_gzip(self):
+        filename = os.path.join(self.test_directory, "dataset.pb.gz")
+        message_helpers.write_message(self.dataset, filename, block_size=10)
+        extra = reaction_pb2.Reaction(reaction_id="ord-4")
+        with gzip.open(filename, "ab") as f:
+            f.write(dataset_pb2.Dataset(reactions=[extra]).SerializeToString())
+        records = message_helpers.iter_serialized_reactions(filename)
+        self.assertEqual(
+            [reaction_pb2.Reaction.FromString(record) for record in records], list(self.dataset.reactions) + [extra]
+        )
+        with self.assertRaisesRegex(ValueError, "random access requires"):
+            message_helpers.load_reaction(filename, 0)
+
+    def test_iter_serialized_reactions_truncated(self):
+        filename = os.path.join(self.test_directory, "dataset.pb.gz")
+        with gzip.open(filename, "wb") as f:
+            f.write(self.dataset.SerializeToString()[:-3])
+        records = message_helpers.iter_serialized_reactions(filename)
+        with self.assertRaisesRegex(ValueError, "error parsing"):
+            list(records)
+
+    def test_wire_helpers(self):
+        value = self.dataset.SerializeToString(deterministic=True)
+        records = [
+            value[tag_start:value_end] for _, _, tag_start, _, value_end in message_helpers.iter_wire_fields(value)
+        ]
+        self.assertEqual(b"".join(records), value)
+        reaction = self.dataset.reactions[0].SerializeToString(deterministic=True)
+        self.assertIn(
+            message_helpers.DATASET_REACTIONS_TAG + message_helpers.encode_varint(len(reaction)) + reaction, records
+        )
+        self.assertEqual(message_helpers.encode_varint(300), b"\xac\x02")
+
+    @parameterized.parameters((".pb", None), (".pb.gz", None), (".pb.gz", 10))
+    def test_read_dataset_header(self, suffix, block_size):
+        filename = os.path.join(self.test_directory, f"dataset{suffix}")
+        message_helpers.write_message(self.dataset, filename, block_size=block_size)
+        expected = dataset_pb2.Dataset()
+        expected.CopyFrom(self.dataset)
+        del expected.reactions[:]
+        self.assertEqual(message_helpers.read_dataset_header(filename), expected)
+
+    def test_read_dataset_header_empty(self):
+        filename = os.path.join(self.test_directory, "dataset.pb")
+        with open(filename, "wb"):
+            pass
+        self.assertEqual(message_helpers.read_dataset_header(filename), dataset_pb2.Dataset())
+
+    def test_read_dataset_header_errors(self):
+        filename = os.path.join(self.test_directory, "dataset.pbtxt")
+        message_helpers.write_message(self.dataset, filename)
+        with self.assertRaisesRegex(ValueError, "expected a binary Dataset"):
+            message_helpers.read_dataset_header(filename)
+        filename = os.path.join(self.test_directory, "dataset.pb.gz")
+        with gzip.open(filename, "wb") as f:
+            f.write(self.dataset.SerializeToString()[:-3])
+        with self.assertRaisesRegex(ValueError, "error parsing"):
+            message_helpers.read_dataset_header(filename)
+
+    def test_blocked(self):
+        filename = os.path.join(self.test_directory, "dataset.pb.gz")
+        message_helpers.write_message(self.dataset, filename, block_size=10)
+        summary = message_helpers.scan_dataset(filename)
+        self.assertEqual(summary.reaction_ids, ["ord-1", "", "ord-3"])
+
+    @parameterized.parameters("provenance.not_a_field", "provenance", "provenance.doi.value")
+    def test_bad_path(self, path):
+        with self.assertRaisesRegex(ValueError, "field path"):
+            message_helpers.scan_serialized_dataset(self.dataset.SerializeToString(), paths=[path])
+
+    def test_truncated(self):
+        filename = os.path.join(self.test_directory, "dataset.pb")
+        with open(filename, "wb") as f:
+            f.write(self.dataset.SerializeToString()[:-5])
+        with self.assertRaisesRegex(ValueError, "error parsing"):
+            message_helpers.scan_dataset(filename)
+
+
+class IterMessagesTest(parameterized.TestCase, absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_directory = self.create_tempdir()
+        self.filenames = []
+        for i in range(5):
+            dataset = dataset_pb2.Dataset(dataset_id=f"ord_dataset-{i}")
+            dataset.reactions.add(reaction_id=f"ord-{i}")
+            filename = os.path.join(self.test_directory, f"dataset-{i}.pb.gz")
+            message_helpers.write_message(dataset, filename)
+            self.filenames.append(filename)
+
+    @parameterized.parameters(0, 1, 3, 10)
+    def test_iter_messages(self, prefetch):
+        results = list(
+            message_helpers.iter_messages(
+                os.path.join(self.test_directory, "*.pb.gz"), dataset_pb2.Dataset, prefetch=prefetch
+            )
+        )
+        self.assertEqual([filename for filename, _ in results], self.filenames)
+        self.assertEqual([dataset.dataset_id for _, dataset in results], [f"ord_dataset-{i}" for i in range(5)])
+
+    def test_max_prefetch_bytes(self):
+        results = list(
+            message_helpers.iter_messages(self.filenames[::-1], dataset_pb2.Dataset, prefetch=3, max_prefetch_bytes=1)
+        )
+        self.assertEqual([filename for filename, _ in results], self.filenames[::-1])
+
+    def test_prefetch_limit(self):
+        loaded = []
+        load_message = message_helpers.load_message
+
+        def recording_load_message(filename, *args, **kwargs):
+            loaded.append(filename)
+            return load_message(filename, *args, **kwargs)
+
+        with absltest.mock.patch.object(message_helpers, "load_message", recording_load_message):
+            iterator = message_helpers.iter_messages(self.filenames, dataset_pb2.Dataset, prefetch=2)
+            self.assertEqual(next(iterator)[0], self.filenames[0])
+            time.sleep(0.1)  # Give any extra submitted work a chance to start.
+            self.assertLessEqual(len(loaded), 2)
+            iterator.close()
+
+    def test_early_exit(self):
+        for filename, _ in message_helpers.iter_messages(self.filenames, dataset_pb2.Dataset):
+            self.assertEqual(filename, self.filenames[0])
+            break
+
+    def test_bad_file(self):
+        with open(self.filenames[2], "wb") as f:
+            f.write(b"not a gzip file")
+        iterator = message_helpers.iter_messages(self.filenames, dataset_pb2.Dataset)
+        self.assertLen([next(iterator), next(iterator)], 2)
+        with self.assertRaises(OSError):
+            next(iterator)
+
+    def test_iter_dataset_summaries(self):
+        results = list(message_helpers.iter_dataset_summaries(self.filenames, paths=["reaction_id"]))
+        self.assertEqual([summary.reaction_ids for _, summary in results], [[f"ord-{i}"] for i in range(5)])
+
+
+class DatasetTextTest(parameterized.TestCase, absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = dataset_pb2.Dataset(name="test", description="{reactions}", dataset_id="ord_dataset-1")
+        for i in range(10):
+            reaction = self.dataset.reactions.add(reaction_id=f"ord-{i}")
+            reaction.identifiers.add(type="REACTION_SMILES", value="C" * (i + 1))
+            reaction.notes.procedure_details = 'Add "reactions {" and stir } at 25 °C.'
+            reaction.outcomes.add().conversion.value = i
+        self.dataset.reaction_ids.append("ord-a")
+
+    @parameterized.parameters(1, 2)
+    def test_format_dataset_text(self, num_workers):
+        self.assertEqual(
+            message_helpers.format_dataset_text(self.dataset, num_workers=num_workers),
+            text_format.MessageToString(self.dataset),
+        )
+
+    @parameterized.parameters(1, 2)
+    def test_parse_dataset_text(self, num_workers):
+        value = text_format.MessageToString(self.dataset)
+        self.assertEqual(message_helpers.parse_dataset_text(value, num_workers=num_workers), self.dataset)
+
+    def test_parse_dataset_text_syntax(self):
+        value = """
+            # reactions {
+            name: 'reactions <'
+            reactions: < reaction_id: "ord-1" >
+            reactions { notes { procedure_details: "\\" } {" } }
+            dataset_id: "ord_dataset-1"
+        """
+        self.assertEqual(
+            message_helpers.parse_dataset_text(value, num_workers=2), text_format.Parse(value, dataset_pb2.Dataset())
+        )
+
+    @parameterized.parameters(
+        'reactions { reaction_id: "ord-1" }\nreactions: [{ reaction_id: "ord-2" }, { reaction_id: "ord-3" }]\n',
+        'reactions { reaction_id: "ord-1" }\nreactions  # Comment.\n{ reaction_id: "ord-2" }\n',
+    )
+    def test_parse_dataset_text_unsplit(self, value):
+        # Reactions that cannot be split out must keep their positions.
+        dataset = message_helpers.parse_dataset_text(value + 'reactions { reaction_id: "ord-4" }\n', num_workers=2)
+        expected = text_format.Parse(value + 'reactions { reaction_id: "ord-4" }\n', dataset_pb2.Dataset())
+        self.assertEqual(dataset, expected)
+        self.assertEqual(dataset.reactions[0].reaction_id, "ord-1")
+        self.assertEqual(dataset.reactions[-1].reaction_id, "ord-4")
+        formatted = message_helpers.format_dataset_text(dataset, num_workers=2)
+        self.assertEqual(message_helpers.parse_dataset_text(formatted, num_workers=2), expected)
+
+    @parameterized.parameters(
+        'reactions { reaction_id: "ord-1" }\nreactions {\n  not_a_field: 1\n}\n',
+        'reactions { reaction_id: "ord-1" }\nreactions {\n',
+        'reactions { reaction_id: "ord-1" } }\n',
+    )
+    def test_parse_dataset_text_error(self, value):
+        # Errors should match the serial parser, including line numbers.
+        with self.assertRaises(text_format.ParseError) as expected:
+            text_format.Parse(value, dataset_pb2.Dataset())
+        with self.assertRaisesRegex(text_format.ParseError, re.escape(str(expected.exception))):
+            message_helpers.parse_dataset_text(value, num_workers=2)
+
+    @parameterized.parameters(".pbtxt", ".pbtxt.gz")
+    def test_load_and_write_message(self, suffix):
+        filename = os.path.join(self.create_tempdir(), f"dataset{suffix}")
+        message_helpers.write_message(self.dataset, filename)
+        with open(filename, "rb") as f:
+            expected = f.read()
+        message_helpers.write_message(self.dataset, filename, num_workers=2)
+        with open(filename, "rb") as f:
+            self.assertEqual(f.read(), expected)
+        self.assertEqual(message_helpers.load_message(filename, dataset_pb2.Dataset, num_workers=2), self.dataset)
+
+
+class CanonicalizeMessageTest(parameterized.TestCase, absltest.TestCase):
+    def _make_reaction(self, reverse):
+        reaction = reaction_pb2.Reaction()
+        names = ["b", "a", "c"]
+        for name in reversed(names) if reverse else names:
+            reaction_input = reaction.inputs[name]
+            smiles = ["CCO", "O"]
+            for value in reversed(smiles) if reverse else smiles:
+                component = reaction_input.components.add()
+                identifiers = [("SMILES", value), ("NAME", f"name of {value}")]
+                for identifier_type, identifier_value in reversed(identifiers) if reverse else identifiers:
+                    component.identifiers.add(type=identifier_type, value=identifier_value)
+        outcome = reaction.outcomes.add()
+        for value in ["CC", "C"]:
+            outcome.products.add().identifiers.add(type="SMILES", value=value)
+        return reaction
+
+    def test_canonicalize_message(self):
+        reaction1 = self._make_reaction(reverse=False)
+        reaction2 = self._make_reaction(reverse=True)
+        self.assertNotEqual(
+            reaction1.SerializeToString(deterministic=True), reaction2.SerializeToString(deterministic=True)
+        )
+        self.assertTrue(message_helpers.canonicalize_message(reaction1))
+        self.assertTrue(message_helpers.canonicalize_message(reaction2))
+        self.assertEqual(
+            reaction1.SerializeToString(deterministic=True), reaction2.SerializeToString(deterministic=True)
+        )
+        self.assertEqual(text_format.MessageToString(reaction1), text_format.MessageToString(reaction2))
+        self.assertFalse(message_helpers.canonicalize_message(reaction1))
+        # Ordered fields are not changed.
+        self.assertEqual([product.identifiers[0].value for product in reaction2.outcomes[0].products], ["CC", "C"])
+
+    def test_identifier_order(self):
+        compound = reaction_pb2.Compound()
+        compound.identifiers.add(type="NAME", value="ethanol")
+        compound.identifiers.add(type="CUSTOM", value="EtOH", details="abbreviation")
+        compound.identifiers.add(type="INCHI", value="InChI=1S/C2H6O/c1-2-3/h3H,2H2,1H3")
+        compound.identifiers.add(type="NAME", value="alcohol")
+        compound.identifiers.add(type="SMILES", value="OCC")
+        compound.identifiers.add(type="SMILES", value="CCO")
+        mol = message_helpers.mol_from_compound(compound)
+        self.assertTrue(message_helpers.canonicalize_message(compound))
+        # Structural identifiers come first; all are sorted by (type, value, details).
+        self.assertEqual(
+            [(identifier.type, identifier.value) for identifier in compound.identifiers],
+            [
+                (reaction_pb2.CompoundIdentifier.SMILES, "CCO"),
+                (reaction_pb2.CompoundIdentifier.SMILES, "OCC"),
+                (reaction_pb2.CompoundIdentifier.INCHI, "InChI=1S/C2H6O/c1-2-3/h3H,2H2,1H3"),
+                (reaction_pb2.CompoundIdentifier.CUSTOM, "EtOH"),
+                (reaction_pb2.CompoundIdentifier.NAME, "alcohol"),
+                (reaction_pb2.CompoundIdentifier.NAME, "ethanol"),
+            ],
+        )
+        self.assertEqual(Chem.MolToSmiles(message_helpers.mol_from_compound(compound)), Chem.MolToSmiles(mol))
+
+    def test_same_type_identifiers(self):
+        compounds = []
+        for names in (["ethanol", "alcohol"], ["alcohol", "ethanol"]):
+            compound = reaction_pb2.Compound()
+            for name in names:
+                compound.identifiers.add(type="NAME", value=name)
+                compound.identifiers.add(type="NAME", value=name, details="synonym")
+            message_helpers.canonicalize_message(compound)
+            compounds.append(compound)
+        self.assertEqual(
+            compounds[0].SerializeToString(deterministic=True), compounds[1].SerializeToString(deterministic=True)
+        )
+        self.assertEqual(message_helpers.get_compound_name(compounds[0]), "alcohol")
+
+    def test_reaction_identifier_order(self):
+        reaction = reaction_pb2.Reaction()
+        reaction.identifiers.add(type="NAME", value="ethanol synthesis")
+        reaction.identifiers.add(type="REACTION_CXSMILES", value="CC>>CCO |f:0|")
+        reaction.identifiers.add(type="REACTION_SMILES", value="C>>CO")
+        self.assertTrue(message_helpers.canonicalize_message(reaction))
+        self.assertEqual(
+            [identifier.type for identifier in reaction.identifiers],
+            [
+                reaction_pb2.ReactionIdentifier.REACTION_SMILES,
+                reaction_pb2.ReactionIdentifier.REACTION_CXSMILES,
+                reaction_pb2.ReactionIdentifier.NAME,
+            ],
+        )
+        self.assertEqual(message_helpers.get_reaction_smiles(reaction), "C>>CO")
+
+    def test_maps_are_not_rebuilt(self):
+        reaction = self._make_reaction(reverse=True)
+        message_helpers.canonicalize_message(reaction)
+        self.assertEqual(list(reaction.inputs), ["c", "a", "b"])
+
+    def test_other_backend(self):
+        # NOTE: Map iteration order is an implementation detail of the
+        # protobuf backend, so compare against the upb backend if available.
+        script = textwrap.dedent("""
+            import sys
+            from google.protobuf.internal import api_implementation
+            if api_implementation.Type() != "upb":
+                sys.exit(3)
+            from google.protobuf import text_format
+            from ord_schema import message_helpers
+            from ord_schema.proto import reaction_pb2
+            reaction = reaction_pb2.Reaction.FromString(sys.stdin.buffer.read())
+            message_helpers.canonicalize_message(reaction)
+            sys.stdout.buffer.write(reaction.SerializeToString(deterministic=True))
+            sys.stdout.buffer.write(text_format.MessageToBytes(reaction))
+            """)
+        reaction = self._make_reaction(reverse=True)
+        env = dict(
+            os.environ,
+            PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION="upb",
+            PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(message_helpers.__file__))),
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            input=reaction.SerializeToString(),
+            capture_output=True,
+            env=env,
+            check=False,
+        )
+        if result.returncode == 3:
+            self.skipTest("the upb protobuf backend is not available")
+        self.assertEqual(result.returncode, 0, result.stderr.decode())
+        expected = self._make_reaction(reverse=False)
+        message_helpers.canonicalize_message(expected)
+        self.assertEqual(
+            result.stdout,
+            expected.SerializeToString(deterministic=True) + text_format.MessageToBytes(expected),
+        )
+
+    @parameterized.parameters(".pb", ".json")
+    def test_write_message(self, suffix):
+        reaction1 = self._make_reaction(reverse=False)
+        reaction2 = self._make_reaction(reverse=True)
+        original = reaction_pb2.Reaction()
+        original.CopyFrom(reaction2)
+        values = []
+        for reaction in [reaction1, reaction2]:
+            filename = os.path.join(self.create_tempdir(), f"reaction{suffix}")
+            message_helpers.write_message(reaction, filename, canonicalize=True)
+            with open(filename, "rb") as f:
+                values.append(f.read())
+        self.assertEqual(values[0], values[1])
+        self.assertEqual(list(reaction2.inputs), list(original.inputs))
+
+
+class JsonLinesTest(parameterized.TestCase, absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_directory = self.create_tempdir()
+        self.reactions = []
+        for i in range(25):
+            reaction = reaction_pb2.Reaction(reaction_id=f"ord-{i}")
+            reaction.identifiers.add(type="REACTION_SMILES", value="C" * (i + 1))
+            reaction.outcomes.add().conversion.value = i
+            self.reactions.append(reaction)
+
+    @parameterized.product(suffix=[".jsonl", ".jsonl.gz"], num_workers=[1, 2])
+    def test_round_trip(self, suffix, num_workers):
+        filename = os.path.join(self.test_directory, f"reactions{suffix}")
+        num_written = message_helpers.write_jsonl(iter(self.reactions), filename, num_workers=num_workers, chunk_size=4)
+        self.assertEqual(num_written, 25)
+        loaded = list(message_helpers.iter_jsonl(filename, num_workers=num_workers, chunk_size=4))
+        self.assertEqual(loaded, self.reactions)
+
+    def test_one_message_per_line(self):
+        filename = os.path.join(self.test_directory, "reactions.jsonl")
+        message_helpers.write_jsonl(self.reactions, filename)
+        with open(filename) as f:
+            lines = f.readlines()
+        self.assertLen(lines, 25)
+        self.assertEqual(json.loads(lines[3]), json_format.MessageToDict(self.reactions[3]))
+
+    def test_parallel_output_matches(self):
+        filename = os.path.join(self.test_directory, "reactions.jsonl.gz")
+        message_helpers.write_jsonl(self.reactions, filename)
+        with open(filename, "rb") as f:
+            value = f.read()
+        message_helpers.write_jsonl(self.reactions, filename, num_workers=2, chunk_size=3)
+        with open(filename, "rb") as f:
+            self.assertEqual(f.read(), value)
+
+    @parameterized.parameters(1, 2)
+    def test_bad_line(self, num_workers):
+        filename = os.path.join(self.test_directory, "reactions.jsonl")
+        with open(filename, "w") as f:
+            f.write('{"reactionId": "ord-1"}\n\n{"notAField": 1}\n')
+        with self.assertRaisesRegex(ValueError, "line 3"):
+            list(message_helpers.iter_jsonl(filename, num_workers=num_workers))
+
+    def test_bad_suffix(self):
+        with self.assertRaisesRegex(ValueError, "jsonl"):
+            message_helpers.write_jsonl(self.reactions, os.path.join(self.test_directory, "reactions.json"))
+
+
+class ParseCacheTest(parameterized.TestCase, absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_directory = self.create_tempdir()
+        self.cache_dir = os.path.join(self.test_directory, "cache")
+
+    @parameterized.parameters(".pbtxt", ".json", ".pbtxt.gz")
+    def test_cache(self, suffix):
+        filename = os.path.join(self.test_directory, f"test{suffix}")
+        message = test_pb2.Scalar(int32_value=3, float_value=4.5)
+        message_helpers.write_message(message, filename)
+        self.assertEqual(message_helpers.load_message(filename, test_pb2.Scalar, cache_dir=self.cache_dir), message)
+        cache_filenames = os.listdir(self.cache_dir)
+        self.assertLen(cache_filenames, 1)
+        # Overwrite the cache entry to check that it is used.
+        cached = test_pb2.Scalar(int32_value=5)
+        message_helpers.write_message(cached, os.path.join(self.cache_dir, cache_filenames[0]))
+        self.assertEqual(message_helpers.load_message(filename, test_pb2.Scalar, cache_dir=self.cache_dir), cached)
+        # Entries are keyed by content; changing the file invalidates the cache.
+        message.int32_value = 6
+        message_helpers.write_message(message, filename)
+        self.assertEqual(message_helpers.load_message(filename, test_pb2.Scalar, cache_dir=self.cache_dir), message)
+        self.assertLen(os.listdir(self.cache_dir), 2)
+
+    def test_corrupt_entry(self):
+        filename = os.path.join(self.test_directory, "test.pbtxt")
+        message = test_pb2.Scalar(int32_value=3, float_value=4.5)
+        message_helpers.write_message(message, filename)
+        message_helpers.load_message(filename, test_pb2.Scalar, cache_dir=self.cache_dir)
+        (cache_filename,) = os.listdir(self.cache_dir)
+        with open(os.path.join(self.cache_dir, cache_filename), "wb") as f:
+            f.write(b"\xff")
+        self.assertEqual(message_helpers.load_message(filename, test_pb2.Scalar, cache_dir=self.cache_dir), message)
+
+    def test_failed_write(self):
+        filename = os.path.join(self.test_directory, "test.pbtxt")
+        message_helpers.write_message(test_pb2.Scalar(int32_value=3), filename)
+        with mock.patch.object(os, "replace", side_effect=OSError("disk full")):
+            with self.assertRaisesRegex(OSError, "disk full"):
+                message_helpers.load_message(filename, test_pb2.Scalar, cache_dir=self.cache_dir)
+        self.assertEmpty(os.listdir(self.cache_dir))  # No stray temporary files.
+
+    def test_environment_variable(self):
+        filename = os.path.join(self.test_directory, "test.pbtxt")
+        message_helpers.write_message(test_pb2.Scalar(int32_value=3), filename)
+        os.environ[message_helpers.PARSE_CACHE_ENV] = self.cache_dir
+        try:
+            message_helpers.load_message(filename, test_pb2.Scalar)
+        finally:
+            del os.environ[message_helpers.PARSE_CACHE_ENV]
+        self.assertLen(os.listdir(self.cache_dir), 1)
+
+
+class SkipFieldsTest(parameterized.TestCase, absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_directory = self.create_tempdir()
+        self.dataset = dataset_pb2.Dataset(name="test")
+        reaction = self.dataset.reactions.add(reaction_id="ord-1")
+        component = reaction.inputs["test"].components.add()
+        component.identifiers.add(type="SMILES", value="CCO")
+        component.features["descriptor"].float_value = 1.5
+        outcome = reaction.outcomes.add()
+        outcome.products.add().features["spectrum"].bytes_value = b"spectrum"
+        outcome.analyses["hplc"].details = "test analysis"
+        outcome.analyses["hplc"].data["trace"].bytes_value = b"trace" * 100
+        reaction.setup.automation_code["code"].string_value = "print()"
+        self.expected = dataset_pb2.Dataset()
+        self.expected.CopyFrom(self.dataset)
+        expected_reaction = self.expected.reactions[0]
+        expected_reaction.inputs["test"].components[0].ClearField("features")
+        expected_reaction.outcomes[0].products[0].ClearField("features")
+        expected_reaction.outcomes[0].analyses["hplc"].ClearField("data")
+        expected_reaction.setup.ClearField("automation_code")
+
+    @parameterized.parameters(".pb", ".pb.gz", ".pbtxt", ".json")
+    def test_skip_data_fields(self, suffix):
+        filename = os.path.join(self.test_directory, f"dataset{suffix}")
+        message_helpers.write_message(self.dataset, filename)
+        loaded = message_helpers.load_message(filename, dataset_pb2.Dataset, skip_fields=message_helpers.DATA_FIELDS)
+        self.assertEqual(loaded, self.expected)
+        self.assertEqual(message_helpers.load_message(filename, dataset_pb2.Dataset), self.dataset)
+
+    def test_mapped_dataset(self):
+        filename = os.path.join(self.test_directory, "dataset.pb")
+        message_helpers.write_message(self.dataset, filename)
+        with message_helpers.MappedDataset(filename, skip_fields=["ord.Analysis.data"]) as dataset:
+            self.assertEqual(dataset[0].outcomes[0].analyses["hplc"].details, "test analysis")
+            self.assertEmpty(dataset[0].outcomes[0].analyses["hplc"].data)
+            self.assertLen(dataset[0].outcomes[0].products[0].features, 1)
+
+    def test_unknown_field(self):
+        filename = os.path.join(self.test_directory, "dataset.pb")
+        message_helpers.write_message(self.dataset, filename)
+        with self.assertRaisesRegex(ValueError, "unknown fields"):
+            message_helpers.load_message(filename, dataset_pb2.Dataset, skip_fields=["ord.Reaction.not_a_field"])
+
+
+class MappedDatasetTest(absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_directory = self.create_tempdir()
+        self.dataset = dataset_pb2.Dataset(name="test", description="mapped", dataset_id="ord_dataset-1")
+        for i in range(3):
+            reaction = self.dataset.reactions.add(reaction_id=f"ord-{i}")
+            reaction.inputs["test"].components.add().identifiers.add(type="SMILES", value="C" * (i + 1))
+        self.filename = os.path.join(self.test_directory, "dataset.pb")
+        message_helpers.write_message(self.dataset, self.filename)
+
+    def test_mapped_dataset(self):
+        with message_helpers.MappedDataset(self.filename) as dataset:
+            self.assertEqual(dataset.header.name, "test")
+            self.assertEqual(dataset.header.description, "mapped")
+            self.assertEqual(dataset.header.dataset_id, "ord_dataset-1")
+            self.assertEmpty(dataset.header.reactions)
+            self.assertLen(dataset, 3)
+            self.assertEqual(dataset[1], self.dataset.reactions[1])
+            self.assertEqual(dataset[-1], self.dataset.reactions[2])
+            self.assertEqual(list(dataset), list(self.dataset.reactions))
+
+    def test_empty(self):
+        filename = os.path.join(self.test_directory, "empty.pb")
+        with open(filename, "wb"):
+            pass
+        with message_helpers.MappedDataset(filename) as dataset:
+            self.assertEmpty(dataset)
+
+    def test_truncated(self):
+        with open(self.filename, "rb") as f:
+            value = f.read()
+        with open(self.filename, "wb") as f:
+            f.write(value[:-3])
+        with self.assertRaisesRegex(ValueError, "truncated"):
+            message_helpers.MappedDataset(self.filename)
+
+    def test_bad_suffix(self):
+        with self.assertRaisesRegex(ValueError, "uncompressed binary"):
+            message_helpers.MappedDataset("dataset.pb.gz")
+
+
 class CreateMessageTest(parameterized.TestCase, absltest.TestCase):
     @parameterized.named_parameters(
         ("reaction", "Reaction", reaction_pb2.Reaction),
@@ -595,6 +1291,176 @@ class MessagesToDataFrameTest(parameterized.TestCase, absltest.TestCase):
             check_like=True,
         )
 
+    @parameterized.named_parameters(
+        ("empty", []),
+        ("empty_messages", [test_pb2.Scalar(), test_pb2.Scalar()]),
+        (
+            "scalar",
+            [
+                test_pb2.Scalar(int32_value=3, float_value=4.5),
+                test_pb2.Scalar(bool_value=True, string_value="a"),
+                test_pb2.Scalar(int64_value=5, bytes_value=b"b"),
+            ],
+        ),
+        ("repeated", [test_pb2.RepeatedScalar(values=[1.2, 3.4]), test_pb2.RepeatedScalar(values=[5.6])]),
+        ("enum", [test_pb2.RepeatedEnum(values=["FIRST"]), test_pb2.RepeatedEnum(values=["SECOND", "FIRST"])]),
+        (
+            "map_nested",
+            [
+                test_pb2.MapNested(children={"a": test_pb2.MapNested.Child(value=1.2)}),
+                test_pb2.MapNested(children={"b": test_pb2.MapNested.Child(value=3.4)}),
+            ],
+        ),
+    )
+    def test_messages_to_dataframe_matches_rows(self, messages):
+        expected = pd.DataFrame([message_helpers.message_to_row(message) for message in messages])
+        pd.testing.assert_frame_equal(message_helpers.messages_to_dataframe(messages), expected)
+        pd.testing.assert_frame_equal(message_helpers.messages_to_dataframe(messages, num_workers=2), expected)
+        typed = message_helpers.messages_to_dataframe(messages, typed=True)
+        pd.testing.assert_frame_equal(message_helpers.messages_to_dataframe(messages, num_workers=2, typed=True), typed)
+        self.assertEqual(list(typed.columns), list(expected.columns))
+        # NOTE: Typed columns replace NaN with pd.NA; compare as objects.
+        pd.testing.assert_frame_equal(
+            typed.astype(object).where(typed.notna(), np.nan), expected.astype(object), check_dtype=False
+        )
+
+    def test_messages_to_dataframe_typed(self):
+        messages = [
+            test_pb2.Scalar(int32_value=3, float_value=4.5, bool_value=True, string_value="a"),
+            test_pb2.Scalar(int64_value=5, bytes_value=b"b"),
+            test_pb2.RepeatedEnum(values=["SECOND", "FIRST"]),
+        ]
+        df = message_helpers.messages_to_dataframe(messages, typed=True)
+        self.assertEqual(
+            df.dtypes.astype(str).to_dict(),
+            {
+                "int32_value": "Int32",
+                "float_value": "float32",
+                "string_value": "string",
+                "bool_value": "boolean",
+                "int64_value": "Int64",
+                "bytes_value": "object",
+                "values[0]": "category",
+                "values[1]": "category",
+            },
+        )
+        self.assertEqual(list(df["values[0]"].cat.categories), ["UNSPECIFIED", "FIRST", "SECOND"])
+        self.assertEqual(df["values[0]"].tolist()[2], "SECOND")
+        self.assertTrue(pd.isna(df["values[0]"].iloc[0]))
+        self.assertEqual(df["int32_value"].tolist(), [3, pd.NA, pd.NA])
+        self.assertEqual(df["bool_value"].tolist(), [True, pd.NA, pd.NA])
+        self.assertEqual(df["bytes_value"].tolist()[1], b"b")
+
+    @parameterized.parameters(False, True)
+    def test_drop_constant_columns(self, typed):
+        messages = [
+            test_pb2.Scalar(int32_value=3, string_value="a"),
+            test_pb2.Scalar(int32_value=3, string_value="b"),
+            test_pb2.Scalar(int32_value=3, float_value=1.5),
+        ]
+        df = message_helpers.messages_to_dataframe(messages, drop_constant_columns=True, typed=typed)
+        self.assertEqual(list(df.columns), ["string_value", "float_value"])
+
+
+class IterDataFramesTest(absltest.TestCase):
+    def test_iter_dataframes(self):
+        messages = [test_pb2.Scalar(int32_value=i) for i in range(5)] + [test_pb2.Scalar(string_value="a")]
+        dfs = list(message_helpers.iter_dataframes(messages, chunk_size=4))
+        self.assertLen(dfs, 2)
+        self.assertEqual(list(dfs[1].index), [4, 5])
+        pd.testing.assert_frame_equal(pd.concat(dfs), message_helpers.messages_to_dataframe(messages))
+
+
+class DataFrameWriterTest(absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.messages = [
+            test_pb2.Scalar(int32_value=3, float_value=4.5),
+            test_pb2.Scalar(bool_value=True, string_value="NA"),
+            test_pb2.Scalar(int32_value=5),
+            test_pb2.RepeatedEnum(values=["SECOND", "FIRST"]),
+            test_pb2.Scalar(),
+        ]
+
+    def test_round_trip(self):
+        dirname = self.create_tempdir().full_path
+        with message_helpers.DataFrameWriter(dirname, chunk_size=2) as writer:
+            for message in self.messages:
+                writer.write(message)
+        self.assertEqual(writer.num_rows, 5)
+        self.assertLen(writer.filenames, 3)
+        dfs = list(message_helpers.read_dataframes(dirname))
+        self.assertLen(dfs, 3)
+        for df in dfs:
+            self.assertEqual(list(df.columns), list(dfs[0].columns))
+        df = pd.concat(dfs)
+        self.assertEqual(
+            df.dtypes.to_dict(),
+            {
+                "int32_value": "Int32",
+                "float_value": "float32",
+                "bool_value": "boolean",
+                "string_value": "string",
+                "values[0]": "string",
+                "values[1]": "string",
+            },
+        )
+        self.assertEqual(df["int32_value"].tolist(), [3, pd.NA, 5, pd.NA, pd.NA])
+        self.assertEqual(df["string_value"].tolist(), [pd.NA, "NA", pd.NA, pd.NA, pd.NA])
+        self.assertEqual(df["values[1]"].tolist(), [pd.NA, pd.NA, pd.NA, "FIRST", pd.NA])
+        self.assertEqual(list(df.index), list(range(5)))
+
+    def test_columns(self):
+        dirname = self.create_tempdir().full_path
+        with message_helpers.DataFrameWriter(dirname, chunk_size=2) as writer:
+            for message in self.messages:
+                writer.write(message)
+        df = pd.concat(message_helpers.read_dataframes(dirname, columns=["values[0]", "float_value"]))
+        self.assertEqual(list(df.columns), ["values[0]", "float_value"])
+        self.assertEqual(df["float_value"].count(), 1)
+        with self.assertRaisesRegex(ValueError, "unknown columns"):
+            list(message_helpers.read_dataframes(dirname, columns=["foo"]))
+
+    @absltest.skipUnless(importlib.util.find_spec("pyarrow"), "requires pyarrow")
+    def test_parquet(self):
+        dirname = self.create_tempdir().full_path
+        with message_helpers.DataFrameWriter(
+            dirname, chunk_size=2, file_format=message_helpers.DataFrameFormat.PARQUET
+        ) as writer:
+            for message in self.messages:
+                writer.write(message)
+        self.assertTrue(all(filename.endswith(".parquet") for filename in writer.filenames))
+        # The second part has no values for "values[0]" or "float_value".
+        df = pd.concat(message_helpers.read_dataframes(dirname, columns=["values[0]", "float_value"]))
+        self.assertEqual(list(df.columns), ["values[0]", "float_value"])
+        self.assertEqual(df["values[0]"].tolist(), [pd.NA, pd.NA, pd.NA, "SECOND", pd.NA])
+        self.assertEqual(df["float_value"].count(), 1)
+
+    @absltest.skipIf(importlib.util.find_spec("pyarrow"), "requires pyarrow to be missing")
+    def test_parquet_requires_pyarrow(self):
+        dirname = os.path.join(self.create_tempdir(), "output")
+        with self.assertRaisesRegex(ValueError, "requires pyarrow"):
+            message_helpers.DataFrameWriter(dirname, file_format=message_helpers.DataFrameFormat.PARQUET)
+        self.assertFalse(os.path.exists(dirname))
+
+    def test_error_skips_schema(self):
+        dirname = self.create_tempdir().full_path
+        with self.assertRaisesRegex(RuntimeError, "interrupted"):
+            with message_helpers.DataFrameWriter(dirname, chunk_size=2) as writer:
+                for message in self.messages:
+                    writer.write(message)
+                raise RuntimeError("interrupted")
+        self.assertNotIn("schema.json", os.listdir(dirname))
+        with self.assertRaisesRegex(ValueError, "error parsing"):
+            list(message_helpers.read_dataframes(dirname))
+
+    def test_existing_schema(self):
+        dirname = self.create_tempdir().full_path
+        with message_helpers.DataFrameWriter(dirname):
+            pass
+        with self.assertRaisesRegex(ValueError, "already contains a schema"):
+            message_helpers.DataFrameWriter(dirname)
+
 
 if __name__ == "__main__":
     absltest.main()
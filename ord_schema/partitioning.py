@@ -0,0 +1,232 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""External-memory sorting and partitioning of Reactions by key.
+
+Reactions are read from Datasets one file at a time and buffered as serialized
+bytes. Whenever the buffer exceeds the memory budget it is sorted and spilled
+to a temporary run file; the runs are then merged (k-way) into one output
+Dataset per distinct key. Only the buffer, the current input Dataset, and the
+runs' read buffers need to fit in memory, so corpora much larger than RAM can
+be regrouped.
+
+Example:
+    partitions = partitioning.partition_reactions(
+        glob.glob("data/*/*.pb.gz"), "provenance.doi", "by_doi/doi.pb.gz", memory_budget=4 << 30
+    )
+"""
+
+import dataclasses
+import heapq
+import itertools
+import operator
+import os
+import pickle
+import tempfile
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from google import protobuf
+
+from ord_schema import dataset_writer
+from ord_schema import message_helpers
+from ord_schema.proto import reaction_pb2
+
+# A dotted path to a scalar field relative to Reaction (for example,
+# "provenance.doi"), or a function that takes a Reaction and returns its key.
+KeyType = Union[str, Callable[[reaction_pb2.Reaction], Any]]
+
+# Approximate memory overhead (in bytes) of each buffered Reaction.
+_ITEM_OVERHEAD = 128
+# Maximum number of runs merged at once; more runs are merged in several passes
+# to bound the number of open files.
+_MAX_MERGE_WIDTH = 128
+
+
+@dataclasses.dataclass(frozen=True)
+class Partition:
+    """A Dataset written by partition_reactions."""
+
+    key: Any
+    filename: str
+    num_reactions: int
+
+
+def _get_key_function(key: KeyType) -> Callable[[bytes], Any]:
+    """Returns a function that extracts the key of a serialized Reaction.
+
+    Field paths are read at the wire level without parsing the Reaction. If the
+    field is repeated, the first value is used; Reactions without a value have
+    a key of None.
+
+    Raises:
+        ValueError: if `key` is not a valid scalar field path.
+    """
+    if callable(key):
+        return lambda value: key(reaction_pb2.Reaction.FromString(value))
+    paths = (key,)
+    message_helpers.scan_serialized_reaction(b"", paths)  # Check the path.
+
+    def key_function(value: bytes) -> Any:
+        values = message_helpers.scan_serialized_reaction(value, paths)[key]
+        return values[0] if values else None
+
+    return key_function
+
+
+def _write_run(items: Iterable[Tuple[Any, bytes]], filename: str) -> str:
+    """Writes sorted (sort key, serialized Reaction) tuples to a run file."""
+    with open(filename, "wb") as f:
+        for item in items:
+            pickle.dump(item, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return filename
+
+
+def _read_run(filename: str) -> Iterator[Tuple[Any, bytes]]:
+    """Reads (sort key, serialized Reaction) tuples from a run file."""
+    with open(filename, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def iter_sorted_reactions(
+    filenames: Iterable[str],
+    key: KeyType,
+    memory_budget: int = 1 << 30,
+    temp_dir: Optional[str] = None,
+) -> Iterator[Tuple[Any, bytes]]:
+    """Sorts the Reactions in a set of Datasets by key.
+
+    The sort is stable: Reactions with equal keys are returned in input order.
+    Reactions with a key of None are returned first.
+
+    Args:
+        filenames: Dataset filenames; see message_helpers.iter_serialized_reactions.
+        key: Field path or key function; see KeyType.
+        memory_budget: Approximate maximum size (in bytes) of the in-memory sort
+            buffer. Sorted runs are spilled to disk when it is exceeded.
+        temp_dir: Directory for run files; defaults to the system default.
+
+    Yields:
+        key: Reaction key.
+        value: Serialized Reaction.
+
+    Raises:
+        ValueError: if a Dataset cannot be parsed or `key` is invalid.
+    """
+    key_function = _get_key_function(key)
+    sort_key = operator.itemgetter(0)
+    with tempfile.TemporaryDirectory(dir=temp_dir) as run_dir:
+        run_names = (os.path.join(run_dir, f"run-{index}") for index in itertools.count())
+        runs = []
+        items = []
+        buffer_size = 0
+        for filename in filenames:
+            for value in message_helpers.iter_serialized_reactions(filename):
+                try:
+                    item_key = key_function(value)
+                except protobuf.message.DecodeError as error:
+                    raise ValueError(f"error parsing {filename}: {error}") from error
+                # NOTE: Wrap the key so that None sorts before any other value.
+                items.append(((item_key is not None, item_key), value))
+                buffer_size += len(value) + _ITEM_OVERHEAD
+                if buffer_size > memory_budget:
+                    items.sort(key=sort_key)
+                    runs.append(_write_run(items, next(run_names)))
+                    items = []
+                    buffer_size = 0
+        items.sort(key=sort_key)
+        if runs:
+            if items:
+                runs.append(_write_run(items, next(run_names)))
+            items = []
+            while len(runs) > _MAX_MERGE_WIDTH:
+                merged_runs = []
+                for i in range(0, len(runs), _MAX_MERGE_WIDTH):
+                    group = runs[i : i + _MAX_MERGE_WIDTH]
+                    merged_runs.append(_write_run(heapq.merge(*map(_read_run, group), key=sort_key), next(run_names)))
+                    for run in group:
+                        os.remove(run)
+                runs = merged_runs
+            items = heapq.merge(*map(_read_run, runs), key=sort_key)
+        for (_, item_key), value in items:
+            yield item_key, value
+
+
+def partition_reactions(
+    filenames: Iterable[str],
+    key: KeyType,
+    output_filename: str,
+    memory_budget: int = 1 << 30,
+    temp_dir: Optional[str] = None,
+    block_size: Optional[int] = None,
+    num_threads: Optional[int] = None,
+) -> List[Partition]:
+    """Regroups the Reactions in a set of Datasets into one Dataset per key.
+
+    Partitions are written in key order, with filenames derived from
+    `output_filename` with dataset_writer.get_shard_filename. The name of each
+    partition Dataset is its key (or "" for Reactions without a key).
+
+    Args:
+        filenames: Dataset filenames; see message_helpers.iter_serialized_reactions.
+        key: Field path or key function; see KeyType.
+        output_filename: Output filename template; for example,
+            "by_doi/doi.pb.gz" gives by_doi/doi-00000.pb.gz, etc.
+        memory_budget: Approximate maximum size (in bytes) of the in-memory sort
+            buffer; see iter_sorted_reactions.
+        temp_dir: Directory for run files; defaults to the system default.
+        block_size: If provided, gzipped output is written as a blocked gzip
+            file; see message_helpers.write_message.
+        num_threads: Number of threads used to compress blocks.
+
+    Returns:
+        List of Partition objects, in key order.
+
+    Raises:
+        ValueError: if a Dataset cannot be parsed or `key` is invalid. No
+            partitions are left behind on error.
+    """
+    partitions = []
+    writer = None
+    partition_key = None
+    try:
+        for item_key, value in iter_sorted_reactions(filenames, key, memory_budget=memory_budget, temp_dir=temp_dir):
+            if writer is None or item_key != partition_key:
+                if writer is not None:
+                    writer.close()
+                    partitions.append(Partition(partition_key, writer_filename, writer.num_reactions))
+                    writer = None
+                partition_key = item_key
+                writer_filename = dataset_writer.get_shard_filename(output_filename, len(partitions))
+                writer = dataset_writer.DatasetWriter(
+                    writer_filename,
+                    name="" if item_key is None else str(item_key),
+                    block_size=block_size,
+                    num_threads=num_threads,
+                )
+            writer.write_serialized(value)
+    except BaseException:
+        # NOTE: Discard the partial output, as ShardedDatasetWriter does; the
+        # current partition would otherwise be finalized with missing Reactions.
+        if writer is not None:
+            writer.abort()
+        for partition in partitions:
+            os.remove(partition.filename)
+        raise
+    if writer is not None:
+        writer.close()
+        partitions.append(Partition(partition_key, writer_filename, writer.num_reactions))
+    return partitions
@@ -0,0 +1,94 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for ord_schema.partitioning."""
+
+import os
+from unittest import mock
+
+from absl.testing import absltest
+from absl.testing import parameterized
+
+from ord_schema import dataset_writer
+from ord_schema import message_helpers
+from ord_schema import partitioning
+from ord_schema.proto import dataset_pb2
+from ord_schema.proto import reaction_pb2
+
+
+class PartitioningTest(parameterized.TestCase, absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_directory = self.create_tempdir()
+        self.filenames = []
+        self.reactions = []
+        for i in range(3):
+            dataset = dataset_pb2.Dataset(name=f"dataset {i}")
+            for j in range(10):
+                reaction = dataset.reactions.add(reaction_id=f"ord-{i}-{j}")
+                if j % 4:
+                    reaction.provenance.doi = f"10.1000/{(i + j) % 3}"
+                self.reactions.append(reaction)
+            filename = os.path.join(self.test_directory, f"dataset-{i}.pb.gz")
+            message_helpers.write_message(dataset, filename)
+            self.filenames.append(filename)
+
+    @parameterized.parameters(1 << 20, 1, 500)
+    def test_iter_sorted_reactions(self, memory_budget):
+        # NOTE: Use a small merge width to exercise multi-pass merging.
+        with mock.patch.object(partitioning, "_MAX_MERGE_WIDTH", 3):
+            items = list(partitioning.iter_sorted_reactions(self.filenames, "provenance.doi", memory_budget))
+        expected = sorted(self.reactions, key=lambda reaction: (bool(reaction.provenance.doi), reaction.provenance.doi))
+        self.assertEqual([reaction_pb2.Reaction.FromString(value) for _, value in items], expected)
+        self.assertEqual([key for key, _ in items], [reaction.provenance.doi or None for reaction in expected])
+
+    def test_key_function(self):
+        items = list(partitioning.iter_sorted_reactions(self.filenames, lambda reaction: reaction.reaction_id[-1]))
+        self.assertEqual([key for key, _ in items], sorted(reaction.reaction_id[-1] for reaction in self.reactions))
+
+    def test_bad_key(self):
+        with self.assertRaisesRegex(ValueError, "unknown field path"):
+            list(partitioning.iter_sorted_reactions(self.filenames, "provenance.not_a_field"))
+
+    def test_partition_reactions(self):
+        output_filename = os.path.join(self.create_tempdir(), "doi.pb")
+        partitions = partitioning.partition_reactions(self.filenames, "provenance.doi", output_filename, 1)
+        self.assertEqual([partition.key for partition in partitions], [None, "10.1000/0", "10.1000/1", "10.1000/2"])
+        self.assertEqual(sum(partition.num_reactions for partition in partitions), 30)
+        for index, partition in enumerate(partitions):
+            self.assertEqual(partition.filename, dataset_writer.get_shard_filename(output_filename, index))
+            dataset = message_helpers.load_message(partition.filename, dataset_pb2.Dataset)
+            self.assertLen(dataset.reactions, partition.num_reactions)
+            self.assertEqual(dataset.name, partition.key or "")
+            for reaction in dataset.reactions:
+                self.assertEqual(reaction.provenance.doi, partition.key or "")
+
+    def test_partition_reactions_error(self):
+        items = list(partitioning.iter_sorted_reactions(self.filenames, "provenance.doi"))
+
+        def iter_sorted_reactions(*args, **kwargs):
+            del args, kwargs  # Unused.
+            yield from items[:15]  # Ends in the middle of a partition.
+            raise RuntimeError("interrupted")
+
+        output_directory = self.create_tempdir()
+        with mock.patch.object(partitioning, "iter_sorted_reactions", side_effect=iter_sorted_reactions):
+            with self.assertRaisesRegex(RuntimeError, "interrupted"):
+                partitioning.partition_reactions(
+                    self.filenames, "provenance.doi", os.path.join(output_directory, "doi.pb")
+                )
+        self.assertEqual(os.listdir(output_directory), [])
+
+
+if __name__ == "__main__":
+    absltest.main()
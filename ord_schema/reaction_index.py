@@ -0,0 +1,298 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Index of the locations of Reactions in a corpus, keyed by reaction_id.
+
+Datasets can be defined by a list of reaction_ids instead of Reactions (for
+example, curated subsets of other Datasets). The index maps each reaction_id to
+the location of its serialized Reaction, so these Datasets can be materialized
+by reading only the byte ranges (or blocked gzip members) that are needed.
+
+The index is a JSON Lines file with one entry per Dataset file (see
+catalog.update_manifest). Dataset paths are stored relative to the directory
+containing the index, and entries are updated incrementally: files whose size
+and modification time are unchanged are not read again.
+
+Example:
+    index = reaction_index.update_index("index.jsonl", glob.glob("data/*/*.pb.gz"))
+    dataset = reaction_index.materialize_dataset(subset, index)
+"""
+
+import collections
+import concurrent.futures
+import dataclasses
+import functools
+import gzip
+import os
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+from absl import logging
+from google import protobuf
+
+from ord_schema import blocked_gzip
+from ord_schema import catalog
+from ord_schema import message_helpers
+from ord_schema.proto import dataset_pb2
+from ord_schema.proto import reaction_pb2
+
+
+@dataclasses.dataclass(frozen=True)
+class ReactionLocation:
+    """Location of a serialized Reaction; see message_helpers.iter_reaction_offsets."""
+
+    path: str  # Relative to the directory containing the index.
+    block_offset: int  # Offset of the blocked gzip member, if any.
+    block_size: int  # Size of the blocked gzip member; zero if not blocked.
+    start: int  # Offset of the serialized Reaction in the file or block.
+    end: int
+
+
+@dataclasses.dataclass(frozen=True)
+class IndexEntry:
+    """Index entry for a single Dataset file."""
+
+    path: str  # Relative to the directory containing the index.
+    size: int  # File size in bytes.
+    mtime_ns: int  # File modification time.
+    # (reaction_id, block_offset, block_size, start, end) tuples.
+    reactions: List[Tuple[str, int, int, int, int]]
+
+    def __post_init__(self):
+        # NOTE: JSON has no tuples, so entries read from an index have lists.
+        object.__setattr__(self, "reactions", [tuple(item) for item in self.reactions])
+
+
+def read_index(filename: str) -> List[IndexEntry]:
+    """Reads an index.
+
+    Args:
+        filename: Index filename.
+
+    Returns:
+        List of IndexEntry objects.
+
+    Raises:
+        ValueError: if the index cannot be parsed.
+    """
+    return catalog.read_manifest(filename, IndexEntry)
+
+
+def write_index(entries: Iterable[IndexEntry], filename: str):
+    """Writes an index atomically.
+
+    Args:
+        entries: IndexEntry objects.
+        filename: Index filename.
+    """
+    catalog.write_manifest(entries, filename)
+
+
+def _index_file(filename: str, path: str) -> IndexEntry:
+    """Builds the index entry for a Dataset file."""
+    stat = os.stat(filename)
+    reactions = []
+    for block_offset, block_size, start, end, value in message_helpers.iter_reaction_offsets(filename):
+        try:
+            reaction_ids = message_helpers.scan_serialized_reaction(value, ["reaction_id"])["reaction_id"]
+        except protobuf.message.DecodeError as error:
+            raise ValueError(f"error parsing {filename}: {error}") from error
+        if reaction_ids:
+            reactions.append((reaction_ids[-1], block_offset, block_size, start, end))
+    return IndexEntry(path=path, size=stat.st_size, mtime_ns=stat.st_mtime_ns, reactions=reactions)
+
+
+def _index_files(stale_files: List[catalog.StaleFile], num_threads: Optional[int]) -> List[IndexEntry]:
+    """Builds the index entries for a set of Dataset files in parallel."""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
+        return list(
+            executor.map(
+                _index_file,
+                [stale_file.filename for stale_file in stale_files],
+                [stale_file.path for stale_file in stale_files],
+            )
+        )
+
+
+class ReactionIndex:
+    """Maps reaction_ids to the locations of serialized Reactions."""
+
+    def __init__(self, filename: str, entries: Optional[List[IndexEntry]] = None):
+        """Initializes the index.
+
+        If a reaction_id appears in more than one file, the location in the
+        first file (by path) is used.
+
+        Args:
+            filename: Index filename.
+            entries: IndexEntry objects; if None, they are read from
+                `filename`.
+
+        Raises:
+            ValueError: if the index cannot be parsed.
+        """
+        self.root = os.path.dirname(os.path.abspath(filename))
+        if entries is None:
+            entries = read_index(filename)
+        self.entries = {entry.path: entry for entry in entries}
+        self._locations = {}
+        for path in sorted(self.entries):
+            for reaction_id, block_offset, block_size, start, end in self.entries[path].reactions:
+                location = ReactionLocation(path, block_offset, block_size, start, end)
+                existing = self._locations.setdefault(reaction_id, location)
+                if existing is not location:
+                    logging.warning("duplicate reaction_id %s in %s and %s", reaction_id, existing.path, path)
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def __contains__(self, reaction_id: str) -> bool:
+        return reaction_id in self._locations
+
+    def get(self, reaction_id: str) -> Optional[ReactionLocation]:
+        """Returns the location of a Reaction, or None if it is not indexed."""
+        return self._locations.get(reaction_id)
+
+    def read_reactions(
+        self, reaction_ids: Iterable[str], num_threads: Optional[int] = None
+    ) -> List[reaction_pb2.Reaction]:
+        """Reads Reactions by reaction_id.
+
+        Reads are grouped by file (and by block for blocked gzip files), and
+        files are read in parallel.
+
+        Args:
+            reaction_ids: Reaction IDs.
+            num_threads: Number of threads used to read files; defaults to the
+                concurrent.futures default.
+
+        Returns:
+            List of Reactions, in the order of `reaction_ids`.
+
+        Raises:
+            KeyError: if a reaction_id is not in the index.
+            ValueError: if a Dataset file changed since it was indexed.
+        """
+        reaction_ids = list(reaction_ids)
+        missing = [reaction_id for reaction_id in reaction_ids if reaction_id not in self._locations]
+        if missing:
+            raise KeyError(f"reaction_ids are not in the index: {missing}")
+        by_path = collections.defaultdict(dict)
+        for reaction_id in reaction_ids:
+            location = self._locations[reaction_id]
+            by_path[location.path][reaction_id] = location
+        reactions = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
+            for result in executor.map(self._read_file, by_path.keys(), by_path.values()):
+                reactions.update(result)
+        return [reactions[reaction_id] for reaction_id in reaction_ids]
+
+    def _read_file(self, path: str, locations: Dict[str, ReactionLocation]) -> Dict[str, reaction_pb2.Reaction]:
+        """Reads a set of Reactions from a single Dataset file."""
+        filename = os.path.join(self.root, path)
+        entry = self.entries[path]
+        stat = os.stat(filename)
+        if stat.st_size != entry.size or stat.st_mtime_ns != entry.mtime_ns:
+            raise ValueError(f"{filename} changed since it was indexed; update the index")
+        values = {}
+        if filename.endswith(message_helpers.MessageFormat.BINARY.value):
+            with open(filename, "rb") as f:
+                values = _read_ranges(f, locations)
+        elif all(location.block_size for location in locations.values()):
+            blocks = {}
+            with open(filename, "rb") as f:
+                for location in sorted(locations.values(), key=lambda location: location.block_offset):
+                    if location.block_offset not in blocks:
+                        f.seek(location.block_offset)
+                        blocks[location.block_offset] = blocked_gzip.decompress_block(f.read(location.block_size))
+            for reaction_id, location in locations.items():
+                values[reaction_id] = blocks[location.block_offset][location.start : location.end]
+        else:
+            # NOTE: Random access is not possible in a standard gzip file, so the
+            # file is decompressed as a stream (discarding the bytes between
+            # Reactions) up to the end of the last requested Reaction.
+            logging.warning(
+                "%s is not a blocked gzip file; reading Reactions from it requires decompressing the file up to "
+                "the last requested Reaction. Rewrite it with compact_dataset --block_size for random access.",
+                filename,
+            )
+            with gzip.open(filename, "rb") as f:
+                values = _read_ranges(f, locations)
+        reactions = {}
+        for reaction_id, value in values.items():
+            try:
+                reaction = reaction_pb2.Reaction.FromString(value)
+            except protobuf.message.DecodeError as error:
+                raise ValueError(f"error parsing {filename}: {error}") from error
+            if reaction.reaction_id != reaction_id:
+                raise ValueError(f"{filename} does not match the index; update the index")
+            reactions[reaction_id] = reaction
+        return reactions
+
+
+def _read_ranges(f: BinaryIO, locations: Dict[str, ReactionLocation]) -> Dict[str, bytes]:
+    """Reads serialized Reactions from a (possibly compressed) file in file order."""
+    values = {}
+    for reaction_id, location in sorted(locations.items(), key=lambda item: item[1].start):
+        f.seek(location.start)
+        values[reaction_id] = f.read(location.end - location.start)
+    return values
+
+
+def update_index(filename: str, dataset_filenames: Iterable[str], num_threads: Optional[int] = None) -> ReactionIndex:
+    """Updates an index to match a set of binary Dataset files.
+
+    Entries for files not in `dataset_filenames` are removed. The index is
+    only rewritten if it changed.
+
+    Args:
+        filename: Index filename; created if it does not exist.
+        dataset_filenames: Dataset filenames (*.pb or *.pb.gz).
+        num_threads: Number of threads used to index files; defaults to the
+            concurrent.futures default.
+
+    Returns:
+        ReactionIndex.
+
+    Raises:
+        ValueError: if a Dataset cannot be parsed.
+    """
+    result = catalog.update_manifest(
+        filename, IndexEntry, dataset_filenames, functools.partial(_index_files, num_threads=num_threads)
+    )
+    return ReactionIndex(filename, result)
+
+
+def materialize_dataset(
+    dataset: dataset_pb2.Dataset, index: ReactionIndex, num_threads: Optional[int] = None
+) -> dataset_pb2.Dataset:
+    """Replaces the reaction_ids in a Dataset with the referenced Reactions.
+
+    Args:
+        dataset: Dataset defined by reaction_ids.
+        index: ReactionIndex covering the referenced Reactions.
+        num_threads: Number of threads used to read files.
+
+    Returns:
+        A new Dataset with the same name, description, and dataset_id, whose
+        Reactions are in the order of `dataset.reaction_ids`.
+
+    Raises:
+        KeyError: if a reaction_id is not in the index.
+        ValueError: if a Dataset file changed since it was indexed.
+    """
+    materialized = dataset_pb2.Dataset(
+        name=dataset.name, description=dataset.description, dataset_id=dataset.dataset_id
+    )
+    materialized.reactions.extend(dataset.reactions)
+    materialized.reactions.extend(index.read_reactions(dataset.reaction_ids, num_threads=num_threads))
+    return materialized
@@ -0,0 +1,122 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for ord_schema.reaction_index."""
+
+import gzip
+import os
+from unittest import mock
+
+from absl.testing import absltest
+
+from ord_schema import catalog
+from ord_schema import message_helpers
+from ord_schema import reaction_index
+from ord_schema.proto import dataset_pb2
+
+
+class ReactionIndexTest(absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_directory = self.create_tempdir()
+        self.index_filename = os.path.join(self.test_directory, "index.jsonl")
+        self.filenames = []
+        self.reactions = {}
+        for i, (suffix, block_size) in enumerate([(".pb", None), (".pb.gz", None), (".pb.gz", 50)]):
+            dataset = dataset_pb2.Dataset(dataset_id=f"ord_dataset-{i}")
+            for j in range(5):
+                reaction = dataset.reactions.add(reaction_id=f"ord-{i}{j}")
+                reaction.identifiers.add(value="C" * (j + 1))
+                self.reactions[reaction.reaction_id] = reaction
+            dataset.reactions.add()  # No reaction_id.
+            filename = os.path.join(self.test_directory, f"dataset-{i}{suffix}")
+            message_helpers.write_message(dataset, filename, block_size=block_size)
+            self.filenames.append(filename)
+
+    def test_iter_reaction_offsets(self):
+        for filename in self.filenames:
+            offsets = list(message_helpers.iter_reaction_offsets(filename))
+            self.assertLen(offsets, 6)
+            dataset = message_helpers.load_message(filename, dataset_pb2.Dataset)
+            for reaction, (_, _, start, end, value) in zip(dataset.reactions, offsets):
+                self.assertEqual(value, reaction.SerializeToString(deterministic=True))
+                self.assertEqual(end - start, len(value))
+
+    def test_update_index(self):
+        index = reaction_index.update_index(self.index_filename, self.filenames)
+        self.assertLen(index, 15)
+        self.assertIn("ord-23", index)
+        self.assertNotIn("ord-99", index)
+        location = index.get("ord-23")
+        self.assertEqual(location.path, "dataset-2.pb.gz")
+        self.assertGreater(location.block_size, 0)
+        self.assertEqual(index.get("ord-03").block_size, 0)
+        self.assertEqual(
+            [entry.path for entry in reaction_index.read_index(self.index_filename)],
+            ["dataset-0.pb", "dataset-1.pb.gz", "dataset-2.pb.gz"],
+        )
+        # Unchanged files are not indexed again.
+        with mock.patch.object(reaction_index, "_index_file") as mock_index_file:
+            index = reaction_index.update_index(self.index_filename, self.filenames[1:])
+            mock_index_file.assert_not_called()
+        self.assertLen(index, 10)
+        self.assertEqual(reaction_index.ReactionIndex(self.index_filename).entries, index.entries)
+        # Unchanged indexes are not rewritten.
+        with mock.patch.object(catalog, "write_manifest") as mock_write_manifest:
+            reaction_index.update_index(self.index_filename, self.filenames[1:])
+            mock_write_manifest.assert_not_called()
+
+    def test_read_reactions(self):
+        reaction_index.update_index(self.index_filename, self.filenames)
+        index = reaction_index.ReactionIndex(self.index_filename)
+        reaction_ids = ["ord-24", "ord-00", "ord-13", "ord-20", "ord-04", "ord-11"]
+        reactions = index.read_reactions(reaction_ids, num_threads=2)
+        self.assertEqual(reactions, [self.reactions[reaction_id] for reaction_id in reaction_ids])
+        with self.assertRaisesRegex(KeyError, "ord-99"):
+            index.read_reactions(["ord-00", "ord-99"])
+
+    def test_read_reactions_gzip(self):
+        index = reaction_index.update_index(self.index_filename, self.filenames)
+        read = gzip.GzipFile.read
+        with mock.patch.object(gzip.GzipFile, "read", autospec=True, side_effect=read) as mock_read:
+            with self.assertLogs(level="WARNING") as logs:
+                reactions = index.read_reactions(["ord-12", "ord-10"])
+        self.assertEqual(reactions, [self.reactions["ord-12"], self.reactions["ord-10"]])
+        self.assertIn("not a blocked gzip file", logs.output[0])
+        # Only the requested Reactions are read; the rest of the file is skipped
+        # or not decompressed at all.
+        sizes = [index.get(reaction_id).end - index.get(reaction_id).start for reaction_id in ["ord-10", "ord-12"]]
+        self.assertEqual([call.args[1] for call in mock_read.call_args_list], sizes)
+
+    def test_materialize_dataset(self):
+        index = reaction_index.update_index(self.index_filename, self.filenames)
+        dataset = dataset_pb2.Dataset(name="subset", dataset_id="ord_dataset-subset", reaction_ids=["ord-12", "ord-01"])
+        materialized = reaction_index.materialize_dataset(dataset, index)
+        self.assertEqual(materialized.name, "subset")
+        self.assertEqual(materialized.dataset_id, "ord_dataset-subset")
+        self.assertEmpty(materialized.reaction_ids)
+        self.assertEqual(list(materialized.reactions), [self.reactions["ord-12"], self.reactions["ord-01"]])
+
+    def test_stale_index(self):
+        index = reaction_index.update_index(self.index_filename, self.filenames)
+        dataset = message_helpers.load_message(self.filenames[0], dataset_pb2.Dataset)
+        dataset.reactions.add(reaction_id="ord-new")
+        message_helpers.write_message(dataset, self.filenames[0])
+        with self.assertRaisesRegex(ValueError, "changed since it was indexed"):
+            index.read_reactions(["ord-01"])
+        index = reaction_index.update_index(self.index_filename, self.filenames)
+        self.assertEqual(index.read_reactions(["ord-new"])[0].reaction_id, "ord-new")
+
+
+if __name__ == "__main__":
+    absltest.main()
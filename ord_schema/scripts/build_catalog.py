@@ -0,0 +1,48 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Builds or updates the catalog for a corpus of Datasets.
+
+Only new or modified Datasets are scanned; see ord_schema.catalog.
+
+Example usage:
+$ ORD_DATA_ROOT="${HOME}/Documents/GitHub/ord-data"
+$ python build_catalog.py \
+  --input="${ORD_DATA_ROOT}/data/*/*.pb.gz" \
+  --output="${ORD_DATA_ROOT}/catalog.jsonl"
+"""
+
+import glob
+
+from absl import app
+from absl import flags
+from absl import logging
+
+from ord_schema import catalog
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("input", None, "Input pattern for Dataset protos.")
+flags.DEFINE_string("output", None, "Catalog filename.")
+
+
+def main(argv):
+    del argv  # Only used by app.run().
+    filenames = glob.glob(FLAGS.input, recursive=True)
+    logging.info("Found %d datasets", len(filenames))
+    entries = catalog.update_catalog(FLAGS.output, filenames)
+    logging.info("Catalog contains %d reactions", sum(entry.num_reactions for entry in entries))
+
+
+if __name__ == "__main__":
+    flags.mark_flags_as_required(["input", "output"])
+    app.run(main)
@@ -0,0 +1,44 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for ord_schema.scripts.build_catalog."""
+
+import os
+
+from absl.testing import absltest
+from absl.testing import flagsaver
+
+from ord_schema import catalog
+from ord_schema import message_helpers
+from ord_schema.proto import dataset_pb2
+from ord_schema.scripts import build_catalog
+
+
+class BuildCatalogTest(absltest.TestCase):
+    def test_main(self):
+        test_directory = self.create_tempdir()
+        os.makedirs(os.path.join(test_directory, "data", "12"))
+        dataset = dataset_pb2.Dataset(dataset_id="ord_dataset-12345")
+        dataset.reactions.add(reaction_id="ord-1")
+        message_helpers.write_message(dataset, os.path.join(test_directory, "data", "12", "ord_dataset-12345.pb.gz"))
+        output_filename = os.path.join(test_directory, "catalog.jsonl")
+        with flagsaver.flagsaver(input=os.path.join(test_directory, "data", "*", "*.pb.gz"), output=output_filename):
+            build_catalog.main(())
+        entries = catalog.read_catalog(output_filename)
+        self.assertLen(entries, 1)
+        self.assertEqual(entries[0].dataset_id, "ord_dataset-12345")
+        self.assertEqual(entries[0].path, os.path.join("data", "12", "ord_dataset-12345.pb.gz"))
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -13,7 +13,8 @@
 # limitations under the License.
 """Builds a Dataset from a set of Reaction protos.
 
-TODO(kearnes): Add support for automatic sharding?
+Use --max_shard_size to split the output into shards of bounded size; see
+dataset_writer.ShardedDatasetWriter.
 
 Example usage:
 $ python build_dataset.py \
@@ -29,6 +30,7 @@ from absl import app
 from absl import flags
 from absl import logging
 
+from ord_schema import dataset_writer
 from ord_schema import message_helpers
 from ord_schema import validations
 from ord_schema.proto import dataset_pb2
@@ -40,23 +42,42 @@ flags.DEFINE_string("output", None, "Output Dataset filename (*.pbtxt).")
 flags.DEFINE_string("name", None, "Name for this dataset.")
 flags.DEFINE_string("description", None, "Description for this dataset.")
 flags.DEFINE_boolean("validate", True, "If True, run validations on Reactions.")
+flags.DEFINE_float("max_shard_size", None, "If provided, write shards of at most this size (in MB).")
+
+
+def _get_writer():
+    """Returns a DatasetWriter or ShardedDatasetWriter for FLAGS.output."""
+    if FLAGS.max_shard_size is not None:
+        return dataset_writer.ShardedDatasetWriter(
+            FLAGS.output,
+            max_shard_size=int(FLAGS.max_shard_size * 1e6),
+            name=FLAGS.name,
+            description=FLAGS.description,
+        )
+    return dataset_writer.DatasetWriter(FLAGS.output, name=FLAGS.name, description=FLAGS.description)
 
 
 def main(argv):
     del argv  # Only used by app.run().
     filenames = glob.glob(FLAGS.input, recursive=True)
     logging.info("Found %d Reaction protos", len(filenames))
-    reactions = []
-    for filename in filenames:
-        reactions.append(message_helpers.load_message(filename, reaction_pb2.Reaction))
     if not FLAGS.name:
         logging.warning("Consider setting the dataset name with --name")
     if not FLAGS.description:
         logging.warning("Consider setting the dataset description with --description")
-    dataset = dataset_pb2.Dataset(name=FLAGS.name, description=FLAGS.description, reactions=reactions)
+    reactions = (message_helpers.load_message(filename, reaction_pb2.Reaction) for filename in filenames)
     if FLAGS.validate:
+        # Dataset-level validations (e.g. cross-references between reactions)
+        # require all of the reactions at once.
+        dataset = dataset_pb2.Dataset(name=FLAGS.name, description=FLAGS.description, reactions=reactions)
         validations.validate_datasets({"_COMBINED": dataset})
-    message_helpers.write_message(dataset, FLAGS.output)
+        if FLAGS.max_shard_size is None:
+            message_helpers.write_message(dataset, FLAGS.output)
+            return
+        reactions = dataset.reactions
+    with _get_writer() as writer:
+        for reaction in reactions:
+            writer.write(reaction)
 
 
 if __name__ == "__main__":
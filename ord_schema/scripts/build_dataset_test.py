@@ -20,6 +20,7 @@ from absl import flags
 from absl.testing import absltest
 from absl.testing import flagsaver
 
+from ord_schema import dataset_writer
 from ord_schema import message_helpers
 from ord_schema import validations
 from ord_schema.proto import dataset_pb2
@@ -85,6 +86,27 @@ class BuildDatasetTest(absltest.TestCase):
             validate=False,
         ):
             build_dataset.main(())
+        dataset = message_helpers.load_message(output_filename, dataset_pb2.Dataset)
+        self.assertLen(dataset.reactions, 2)
+
+    def test_sharding(self):
+        input_pattern = os.path.join(self.test_subdirectory, "reaction-?.pbtxt")
+        output_filename = os.path.join(self.test_subdirectory, "dataset.pb")
+        with flagsaver.flagsaver(
+            input=input_pattern,
+            name="test dataset",
+            description="this is a test dataset",
+            output=output_filename,
+            validate=False,
+            max_shard_size=1e-6,
+        ):
+            build_dataset.main(())
+        shards = dataset_writer.find_shards(output_filename)
+        self.assertLen(shards, 2)
+        for shard in shards:
+            dataset = message_helpers.load_message(shard, dataset_pb2.Dataset)
+            self.assertEqual(dataset.name, "test dataset")
+            self.assertLen(dataset.reactions, 1)
 
 
 if __name__ == "__main__":
@@ -23,7 +23,6 @@ import pprint
 
 from absl import app
 from absl import flags
-from google.protobuf import text_format  # pytype: disable=import-error
 
 from ord_schema import message_helpers
 from ord_schema.proto import dataset_pb2
@@ -31,12 +30,13 @@ from ord_schema.proto import dataset_pb2
 FLAGS = flags.FLAGS
 flags.DEFINE_string("pb", None, "Path to *.pb Dataset.")
 flags.DEFINE_string("pbtxt", None, "Path to *.pbtxt Dataset.")
+flags.DEFINE_integer("num_workers", 1, "Number of processes used to format the Dataset.")
 
 
 def main(argv):
     del argv  # Only used by app.run().
     dataset = message_helpers.load_message(FLAGS.pb, dataset_pb2.Dataset)
-    pb_data = text_format.MessageToString(dataset)
+    pb_data = message_helpers.format_dataset_text(dataset, num_workers=FLAGS.num_workers)
     with open(FLAGS.pbtxt) as f:
         pbtxt_data = f.read()
     if pb_data != pbtxt_data:
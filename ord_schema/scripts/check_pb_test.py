@@ -32,8 +32,8 @@ class CheckPbTest(absltest.TestCase):
         self.pb_filename = os.path.join(self.test_subdirectory, "test.pb")
         self.pbtxt_filename = os.path.join(self.test_subdirectory, "test.pbtxt")
 
-    def _run(self):
-        with flagsaver.flagsaver(pb=self.pb_filename, pbtxt=self.pbtxt_filename):
+    def _run(self, num_workers=1):
+        with flagsaver.flagsaver(pb=self.pb_filename, pbtxt=self.pbtxt_filename, num_workers=num_workers):
             check_pb.main(())
 
     def test_main_pass(self):
@@ -44,6 +44,7 @@ class CheckPbTest(absltest.TestCase):
         message_helpers.write_message(dataset, self.pb_filename)
         message_helpers.write_message(dataset, self.pbtxt_filename)
         self._run()
+        self._run(num_workers=2)
 
     def test_main_fail(self):
         dataset = dataset_pb2.Dataset()
@@ -0,0 +1,48 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Rewrites binary Datasets in canonical form.
+
+Datasets extended with dataset_writer.append_reactions are valid but no longer
+byte-identical to the output of message_helpers.write_message. This script
+restores the canonical (deterministic) encoding in place.
+
+Example usage:
+$ python compact_dataset.py --input="data/*/*.pb.gz"
+"""
+
+import glob
+
+from absl import app
+from absl import flags
+from absl import logging
+
+from ord_schema import dataset_writer
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("input", None, "Input pattern for Dataset protos (*.pb or *.pb.gz).")
+flags.DEFINE_integer("block_size", None, "If provided, write gzipped output as a blocked gzip file.")
+
+
+def main(argv):
+    del argv  # Only used by app.run().
+    filenames = sorted(glob.glob(FLAGS.input, recursive=True))
+    logging.info("Found %d datasets", len(filenames))
+    for filename in filenames:
+        logging.info("Compacting %s", filename)
+        dataset_writer.compact_dataset(filename, block_size=FLAGS.block_size)
+
+
+if __name__ == "__main__":
+    flags.mark_flag_as_required("input")
+    app.run(main)
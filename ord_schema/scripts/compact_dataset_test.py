@@ -0,0 +1,53 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for ord_schema.scripts.compact_dataset."""
+
+import os
+
+from absl.testing import absltest
+from absl.testing import flagsaver
+from absl.testing import parameterized
+
+from ord_schema import dataset_writer
+from ord_schema import message_helpers
+from ord_schema.proto import dataset_pb2
+from ord_schema.proto import reaction_pb2
+from ord_schema.scripts import compact_dataset
+
+
+class CompactDatasetTest(parameterized.TestCase, absltest.TestCase):
+    @parameterized.parameters((".pb", None), (".pb.gz", None), (".pb.gz", 10))
+    def test_main(self, suffix, block_size):
+        test_directory = self.create_tempdir()
+        dataset = dataset_pb2.Dataset(name="test", dataset_id="ord_dataset-1")
+        dataset.reactions.add(reaction_id="ord-1")
+        filename = os.path.join(test_directory, f"dataset{suffix}")
+        message_helpers.write_message(dataset, filename, block_size=block_size)
+        new_reaction = reaction_pb2.Reaction(reaction_id="ord-2")
+        dataset_writer.append_reactions(filename, [new_reaction])
+        dataset.reactions.append(new_reaction)
+        expected_filename = os.path.join(self.create_tempdir(), f"dataset{suffix}")
+        message_helpers.write_message(dataset, expected_filename, block_size=block_size)
+        with open(expected_filename, "rb") as f:
+            expected = f.read()
+        with open(filename, "rb") as f:
+            self.assertNotEqual(f.read(), expected)
+        with flagsaver.flagsaver(input=os.path.join(test_directory, f"dataset{suffix}"), block_size=block_size):
+            compact_dataset.main(())
+        with open(filename, "rb") as f:
+            self.assertEqual(f.read(), expected)
+
+
+if __name__ == "__main__":
+    absltest.main()
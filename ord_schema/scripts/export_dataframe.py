@@ -0,0 +1,69 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Exports the Reactions in a set of Datasets as partitioned DataFrame files.
+
+Reactions are streamed from the inputs one Dataset at a time and written with
+message_helpers.DataFrameWriter, so memory use is bounded by --chunk_size rather
+than the size of the corpus. Use message_helpers.read_dataframes to read the
+output with a consistent set of columns.
+
+Example usage:
+$ python export_dataframe.py \
+  --input="data/*/*.pb.gz" \
+  --output=reactions \
+  --chunk_size=100000
+"""
+
+import glob
+import importlib.util
+
+from absl import app
+from absl import flags
+from absl import logging
+from google import protobuf
+
+from ord_schema import message_helpers
+from ord_schema.proto import reaction_pb2
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("input", None, "Input pattern for Dataset protos.")
+flags.DEFINE_string("output", None, "Output directory.")
+flags.DEFINE_integer("chunk_size", 10000, "Number of rows per output file.")
+flags.DEFINE_enum(
+    "format", "CSV", [file_format.name for file_format in message_helpers.DataFrameFormat], "Output file format."
+)
+
+
+def main(argv):
+    del argv  # Only used by app.run().
+    file_format = message_helpers.DataFrameFormat[FLAGS.format]
+    # Fail before reading any input rather than when the first part is written.
+    if file_format == message_helpers.DataFrameFormat.PARQUET and importlib.util.find_spec("pyarrow") is None:
+        raise app.UsageError("--format=PARQUET requires pyarrow")
+    filenames = sorted(glob.glob(FLAGS.input, recursive=True))
+    logging.info("Found %d datasets", len(filenames))
+    with message_helpers.DataFrameWriter(FLAGS.output, chunk_size=FLAGS.chunk_size, file_format=file_format) as writer:
+        for filename in filenames:
+            logging.info("Exporting %s", filename)
+            for value in message_helpers.iter_serialized_reactions(filename):
+                try:
+                    writer.write(reaction_pb2.Reaction.FromString(value))
+                except protobuf.message.DecodeError as error:
+                    raise ValueError(f"error parsing {filename}: {error}") from error
+    logging.info("Wrote %d rows to %d files in %s", writer.num_rows, len(writer.filenames), FLAGS.output)
+
+
+if __name__ == "__main__":
+    flags.mark_flags_as_required(["input", "output"])
+    app.run(main)
@@ -0,0 +1,56 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for ord_schema.scripts.export_dataframe."""
+
+import importlib.util
+import os
+
+from absl import app
+from absl.testing import absltest
+from absl.testing import flagsaver
+import pandas as pd
+
+from ord_schema import message_helpers
+from ord_schema.proto import dataset_pb2
+from ord_schema.scripts import export_dataframe
+
+
+class ExportDataFrameTest(absltest.TestCase):
+    def test_main(self):
+        test_directory = self.create_tempdir()
+        for i in range(2):
+            dataset = dataset_pb2.Dataset()
+            for j in range(3):
+                reaction = dataset.reactions.add(reaction_id=f"ord-{i}{j}")
+                reaction.identifiers.add(type="REACTION_SMILES", value="C>>CC")
+            message_helpers.write_message(dataset, os.path.join(test_directory, f"dataset-{i}.pb.gz"))
+        output = os.path.join(test_directory, "output")
+        with flagsaver.flagsaver(input=os.path.join(test_directory, "*.pb.gz"), output=output, chunk_size=4):
+            export_dataframe.main(())
+        df = pd.concat(message_helpers.read_dataframes(output))
+        self.assertEqual(df["reaction_id"].tolist(), ["ord-00", "ord-01", "ord-02", "ord-10", "ord-11", "ord-12"])
+        self.assertEqual(set(df["identifiers[0].type"]), {"REACTION_SMILES"})
+        self.assertLen(os.listdir(output), 3)  # Two parts and the schema.
+
+    @absltest.skipIf(importlib.util.find_spec("pyarrow"), "requires pyarrow to be missing")
+    def test_parquet_requires_pyarrow(self):
+        output = os.path.join(self.create_tempdir(), "output")
+        with flagsaver.flagsaver(input="*.pb.gz", output=output, format="PARQUET"):
+            with self.assertRaisesRegex(app.UsageError, "requires pyarrow"):
+                export_dataframe.main(())
+        self.assertFalse(os.path.exists(output))
+
+
+if __name__ == "__main__":
+    absltest.main()
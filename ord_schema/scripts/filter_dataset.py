@@ -0,0 +1,283 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Extracts a subset of the Reactions in a set of Datasets.
+
+Reactions are streamed from the inputs one Dataset at a time and matching
+Reactions are written with a streaming writer, so memory use does not grow with
+the size of the corpus. Field paths are relative to Reaction and use the same
+syntax as message_helpers.scan_dataset; map fields are traversed with "key" or
+"value" (for example, "inputs.value.components.identifiers.value"). A predicate
+matches if any value at its path matches, and a Reaction is kept only if it
+matches every predicate.
+
+Predicates:
+  --equals=PATH=VALUE   String form of the value equals VALUE (enum values are
+                        compared by name).
+  --regex=PATH=PATTERN  String form of the value matches PATTERN (re.search).
+  --range=PATH=MIN:MAX  Numeric value is in [MIN, MAX]; either bound can be
+                        omitted. If PATH refers to a message with units (e.g.,
+                        "conditions.temperature.setpoint"), bounds must include
+                        units (e.g., "20 C:80 C"); values and bounds are
+                        compared after conversion to base units (see
+                        units.to_base_units), so "300 K" is in "20 C:80 C".
+  --has=PATH            The field is set.
+
+Example usage:
+$ python filter_dataset.py \
+  --input="data/*/*.pb.gz" \
+  --equals="outcomes.products.identifiers.value=c1ccccc1" \
+  --range="conditions.temperature.setpoint=50 C:" \
+  --sample=1000 \
+  --seed=0 \
+  --output=subset.pb.gz
+"""
+
+import dataclasses
+import functools
+import glob
+import random
+import re
+from typing import Any, Callable, List, Optional, Tuple
+
+from absl import app
+from absl import flags
+from absl import logging
+from google import protobuf
+
+import ord_schema
+from ord_schema import dataset_writer
+from ord_schema import message_helpers
+from ord_schema import units
+from ord_schema.proto import reaction_pb2
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("input", None, "Input pattern for Dataset protos.")
+flags.DEFINE_string("output", None, "Output Dataset filename.")
+flags.DEFINE_multi_string("equals", [], "PATH=VALUE equality predicate.")
+flags.DEFINE_multi_string("regex", [], "PATH=PATTERN regular expression predicate.")
+flags.DEFINE_multi_string("range", [], "PATH=MIN:MAX numeric range predicate.")
+flags.DEFINE_multi_string("has", [], "PATH presence predicate.")
+flags.DEFINE_integer("sample", None, "If provided, write a uniform random sample of this many matching Reactions.")
+flags.DEFINE_integer("seed", None, "Random seed for --sample.")
+flags.DEFINE_string("name", "", "Name for the output Dataset.")
+flags.DEFINE_string("description", "", "Description for the output Dataset.")
+flags.DEFINE_integer("block_size", None, "If provided, write gzipped output as a blocked gzip file.")
+
+
+@dataclasses.dataclass(frozen=True)
+class Predicate:
+    """A predicate on the values at a field path."""
+
+    path: str
+    names: Tuple[str, ...]
+    field: ord_schema.FieldDescriptor
+    function: Callable[[ord_schema.FieldDescriptor, Any], bool]
+
+    def __call__(self, reaction: reaction_pb2.Reaction) -> bool:
+        return any(self.function(self.field, value) for value in _get_values(reaction, self.names))
+
+
+def _get_field(path: str) -> ord_schema.FieldDescriptor:
+    """Returns the descriptor of the last field in a path.
+
+    Raises:
+        ValueError: if the path is not valid.
+    """
+    descriptor = reaction_pb2.Reaction.DESCRIPTOR
+    field = None
+    for name in path.split("."):
+        if descriptor is None or name not in descriptor.fields_by_name:
+            raise ValueError(f"unknown field path: {path}")
+        field = descriptor.fields_by_name[name]
+        descriptor = field.message_type
+    return field
+
+
+def _get_values(message: ord_schema.Message, names: Tuple[str, ...]) -> List[Any]:
+    """Returns the values at a field path; unset fields have no values."""
+    if not names:
+        return [message]
+    field = message.DESCRIPTOR.fields_by_name[names[0]]
+    value = getattr(message, names[0])
+    if field.message_type is not None and field.message_type.GetOptions().map_entry:
+        if len(names) == 1:
+            return []
+        items = list(value.keys()) if names[1] == "key" else list(value.values())
+        if len(names) == 2:
+            return items
+        names = names[1:]
+    elif field.label == field.LABEL_REPEATED:
+        items = list(value)
+    else:
+        # NOTE: FieldDescriptor.has_presence is not available in older protobuf
+        # versions; HasField raises ValueError for fields without presence.
+        try:
+            has_value = message.HasField(names[0])
+        except ValueError:
+            has_value = value != field.default_value
+        items = [value] if has_value else []
+    if len(names) == 1:
+        return items
+    values = []
+    for item in items:
+        values.extend(_get_values(item, names[1:]))
+    return values
+
+
+def _format_value(field: ord_schema.FieldDescriptor, value: Any) -> str:
+    """Returns the string form of a scalar value.
+
+    Enum values are formatted by name; unknown enum values (e.g. from a newer
+    schema) are formatted as numbers.
+    """
+    if field.enum_type is not None:
+        enum_value = field.enum_type.values_by_number.get(value)
+        return str(value) if enum_value is None else enum_value.name
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
+
+
+def _parse_bound(field: ord_schema.FieldDescriptor, value: str) -> Optional[float]:
+    """Parses a --range bound; bounds with units are converted to base units.
+
+    Raises:
+        ValueError: if the bound has units of a different dimension than the field.
+    """
+    if not value:
+        return None
+    if field.message_type is None:
+        return float(value)
+    bound = units.UnitResolver().resolve(value)
+    if bound.DESCRIPTOR is not field.message_type:
+        raise ValueError(
+            f"units of --range bound {value} ({bound.DESCRIPTOR.name}) do not match {field.message_type.name}"
+        )
+    return units.to_base_units(bound)
+
+
+def _to_number(value: Any) -> Optional[float]:
+    """Returns a number, converting messages with units to base units."""
+    if isinstance(value, ord_schema.Message):
+        return units.to_base_units(value)
+    return value
+
+
+def _in_range(lower: Optional[float], upper: Optional[float], field: ord_schema.FieldDescriptor, value: Any) -> bool:
+    """Returns whether a number or message with units is in a range."""
+    del field  # Unused.
+    value = _to_number(value)
+    if value is None:
+        return False
+    return (lower is None or value >= lower) and (upper is None or value <= upper)
+
+
+def _is_set(field: ord_schema.FieldDescriptor, value: Any) -> bool:
+    """Matches every value; values are only present if the field is set."""
+    del field, value  # Unused.
+    return True
+
+
+def _equals(argument: str, field: ord_schema.FieldDescriptor, value: Any) -> bool:
+    """Returns whether the string form of a value equals the argument."""
+    return _format_value(field, value) == argument
+
+
+def _matches(pattern: re.Pattern, field: ord_schema.FieldDescriptor, value: Any) -> bool:
+    """Returns whether the string form of a value matches a pattern."""
+    return pattern.search(_format_value(field, value)) is not None
+
+
+def _build_predicate(kind: str, spec: str) -> Predicate:
+    """Builds a predicate from a flag value.
+
+    Raises:
+        ValueError: if the flag value is not valid.
+    """
+    if kind == "has":
+        path, argument = spec, None
+    else:
+        path, sep, argument = spec.partition("=")
+        if not sep:
+            raise ValueError(f"expected PATH=VALUE for --{kind}: {spec}")
+    field = _get_field(path)
+    if kind == "has":
+        function = _is_set
+    elif field.message_type is not None and kind != "range":
+        raise ValueError(f"--{kind} requires a scalar field: {path}")
+    elif kind == "equals":
+        function = functools.partial(_equals, argument)
+    elif kind == "regex":
+        function = functools.partial(_matches, re.compile(argument))
+    elif kind == "range":
+        if field.message_type is not None and not {"value", "units"} <= set(field.message_type.fields_by_name):
+            raise ValueError(f"--range requires a numeric field or a message with units: {path}")
+        lower, sep, upper = argument.partition(":")
+        if not sep:
+            raise ValueError(f"expected PATH=MIN:MAX for --range: {spec}")
+        function = functools.partial(_in_range, _parse_bound(field, lower), _parse_bound(field, upper))
+    else:
+        raise ValueError(f"unsupported predicate: {kind}")
+    return Predicate(path=path, names=tuple(path.split(".")), field=field, function=function)
+
+
+def get_predicates() -> List[Predicate]:
+    """Builds predicates from the command-line flags."""
+    predicates = []
+    for kind in ["equals", "regex", "range", "has"]:
+        for spec in FLAGS[kind].value:
+            predicates.append(_build_predicate(kind, spec))
+    return predicates
+
+
+def main(argv):
+    del argv  # Only used by app.run().
+    filenames = sorted(glob.glob(FLAGS.input, recursive=True))
+    logging.info("Found %d datasets", len(filenames))
+    predicates = get_predicates()
+    rng = random.Random(FLAGS.seed)
+    reservoir = []  # (index, serialized Reaction) tuples.
+    num_matches = 0
+    with dataset_writer.DatasetWriter(
+        FLAGS.output, name=FLAGS.name, description=FLAGS.description, block_size=FLAGS.block_size
+    ) as writer:
+        for filename in filenames:
+            logging.info("Filtering %s", filename)
+            for value in message_helpers.iter_serialized_reactions(filename):
+                if predicates:
+                    try:
+                        reaction = reaction_pb2.Reaction.FromString(value)
+                    except protobuf.message.DecodeError as error:
+                        raise ValueError(f"error parsing {filename}: {error}") from error
+                    if not all(predicate(reaction) for predicate in predicates):
+                        continue
+                num_matches += 1
+                if FLAGS.sample is None:
+                    writer.write_serialized(value)
+                elif len(reservoir) < FLAGS.sample:
+                    reservoir.append((num_matches, value))
+                else:
+                    # Reservoir sampling (Algorithm R).
+                    index = rng.randrange(num_matches)
+                    if index < FLAGS.sample:
+                        reservoir[index] = (num_matches, value)
+        # NOTE: Keep the sampled Reactions in input order.
+        for _, value in sorted(reservoir, key=lambda item: item[0]):
+            writer.write_serialized(value)
+    logging.info("Wrote %d of %d matching Reactions to %s", writer.num_reactions, num_matches, FLAGS.output)
+
+
+if __name__ == "__main__":
+    flags.mark_flags_as_required(["input", "output"])
+    app.run(main)
@@ -0,0 +1,144 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for ord_schema.scripts.filter_dataset."""
+
+import os
+
+from absl.testing import absltest
+from absl.testing import flagsaver
+from absl.testing import parameterized
+
+from ord_schema import message_helpers
+from ord_schema.proto import dataset_pb2
+from ord_schema.proto import reaction_pb2
+from ord_schema.scripts import filter_dataset
+
+
+class FilterDatasetTest(parameterized.TestCase, absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_directory = self.create_tempdir()
+        for i in range(2):
+            dataset = dataset_pb2.Dataset()
+            for j in range(5):
+                reaction = dataset.reactions.add(reaction_id=f"ord-{i}{j}")
+                reaction.provenance.doi = f"10.1000/{j % 2}"
+                reaction.conditions.temperature.setpoint.value = 10 * (i + j)
+                reaction.conditions.temperature.setpoint.units = reaction_pb2.Temperature.CELSIUS
+                component = reaction.inputs["test"].components.add()
+                component.identifiers.add(type="SMILES", value="CCO" if j == 0 else "c1ccccc1")
+                if j == 4:
+                    reaction.outcomes.add().products.add().measurements.add(type="YIELD").percentage.value = 50
+            message_helpers.write_message(dataset, os.path.join(self.test_directory, f"dataset-{i}.pb.gz"))
+        self.output_filename = os.path.join(self.test_directory, "output.pb")
+
+    def _run(self, **kwargs):
+        with flagsaver.flagsaver(
+            input=os.path.join(self.test_directory, "dataset-*.pb.gz"), output=self.output_filename, **kwargs
+        ):
+            filter_dataset.main(())
+        dataset = message_helpers.load_message(self.output_filename, dataset_pb2.Dataset)
+        return [reaction.reaction_id for reaction in dataset.reactions]
+
+    @parameterized.named_parameters(
+        (
+            "no_predicates",
+            {},
+            ["ord-00", "ord-01", "ord-02", "ord-03", "ord-04", "ord-10", "ord-11", "ord-12", "ord-13", "ord-14"],
+        ),
+        ("equals", {"equals": ["provenance.doi=10.1000/1"]}, ["ord-01", "ord-03", "ord-11", "ord-13"]),
+        ("equals_map", {"equals": ["inputs.value.components.identifiers.value=CCO"]}, ["ord-00", "ord-10"]),
+        ("equals_enum", {"equals": ["outcomes.products.measurements.type=YIELD"]}, ["ord-04", "ord-14"]),
+        ("regex", {"regex": ["reaction_id=^ord-1[12]"]}, ["ord-11", "ord-12"]),
+        (
+            "range_units",
+            {"range": ["conditions.temperature.setpoint=20 C:30 C"]},
+            ["ord-02", "ord-03", "ord-11", "ord-12"],
+        ),
+        ("range_open", {"range": ["conditions.temperature.setpoint.value=45:"]}, ["ord-14"]),
+        (
+            "range_other_units",
+            {"range": ["conditions.temperature.setpoint=68 F:86 F"]},
+            ["ord-02", "ord-03", "ord-11", "ord-12"],
+        ),
+        ("range_kelvin", {"range": ["conditions.temperature.setpoint=290 K:300 K"]}, ["ord-02", "ord-11"]),
+        ("range_no_match", {"range": ["conditions.temperature.setpoint=:0 K"]}, []),
+        ("has", {"has": ["outcomes.products.measurements.percentage"]}, ["ord-04", "ord-14"]),
+        (
+            "combined",
+            {"equals": ["provenance.doi=10.1000/0"], "range": ["conditions.temperature.setpoint.value=:20"]},
+            ["ord-00", "ord-02", "ord-10"],
+        ),
+    )
+    def test_predicates(self, kwargs, expected):
+        self.assertEqual(self._run(**kwargs), expected)
+
+    def test_sample(self):
+        reaction_ids = self._run(sample=3, seed=0)
+        self.assertLen(reaction_ids, 3)
+        self.assertEqual(reaction_ids, sorted(reaction_ids))
+        self.assertEqual(self._run(sample=3, seed=0), reaction_ids)
+        self.assertLen(self._run(sample=20, seed=0), 10)
+        self.assertLen(self._run(sample=3, seed=0, equals=["provenance.doi=10.1000/1"]), 3)
+
+    @parameterized.parameters(
+        ({"equals": ["not_a_field=1"]}, "unknown field path"),
+        ({"equals": ["provenance.doi"]}, "expected PATH=VALUE"),
+        ({"equals": ["provenance=1"]}, "requires a scalar field"),
+        ({"range": ["provenance.doi=1"]}, "expected PATH=MIN:MAX"),
+        ({"range": ["provenance=1:2"]}, "requires a numeric field"),
+        ({"range": ["conditions.temperature.setpoint=1 mL:"]}, "do not match Temperature"),
+    )
+    def test_bad_predicates(self, kwargs, expected_regex):
+        with self.assertRaisesRegex(ValueError, expected_regex):
+            self._run(**kwargs)
+
+    def test_range_mixed_units(self):
+        dataset = dataset_pb2.Dataset()
+        for i, (value, units) in enumerate(
+            [(0.002, "LITER"), (500, "MICROLITER"), (3, "MILLILITER"), (10, "MILLILITER")]
+        ):
+            reaction = dataset.reactions.add(reaction_id=f"ord-{i}")
+            reaction.inputs["test"].components.add().amount.volume.CopyFrom(
+                reaction_pb2.Volume(value=value, units=units)
+            )
+        filename = os.path.join(self.test_directory, "volumes.pb")
+        message_helpers.write_message(dataset, filename)
+        with flagsaver.flagsaver(
+            input=filename, output=self.output_filename, range=["inputs.value.components.amount.volume=1 mL:5 mL"]
+        ):
+            filter_dataset.main(())
+        dataset = message_helpers.load_message(self.output_filename, dataset_pb2.Dataset)
+        self.assertEqual([reaction.reaction_id for reaction in dataset.reactions], ["ord-0", "ord-2"])
+
+    def test_format_unknown_enum(self):
+        field = reaction_pb2.ProductMeasurement.DESCRIPTOR.fields_by_name["type"]
+        self.assertEqual(filter_dataset._format_value(field, 999), "999")  # pylint: disable=protected-access
+        self.assertEqual(filter_dataset._format_value(field, 3), "YIELD")  # pylint: disable=protected-access
+
+    def test_get_values_presence(self):
+        reaction = reaction_pb2.Reaction()
+        reaction.identifiers.add(is_mapped=False)  # Explicit presence.
+        reaction.identifiers.add()
+        # pylint: disable=protected-access
+        self.assertEqual(filter_dataset._get_values(reaction, ("identifiers", "is_mapped")), [False])
+        self.assertEqual(filter_dataset._get_values(reaction, ("reaction_id",)), [])
+        self.assertEqual(filter_dataset._get_values(reaction, ("provenance",)), [])
+        reaction.reaction_id = "ord-1"
+        self.assertEqual(filter_dataset._get_values(reaction, ("reaction_id",)), ["ord-1"])
+        # pylint: enable=protected-access
+
+
+if __name__ == "__main__":
+    absltest.main()
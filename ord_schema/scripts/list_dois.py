@@ -22,6 +22,7 @@ import collections
 import glob
 import os
 import re
+from typing import Iterator, List, Optional, Set, Tuple
 import urllib.parse
 
 from absl import app
@@ -29,38 +30,61 @@ from absl import flags
 from absl import logging
 import requests
 
+from ord_schema import catalog
 from ord_schema import message_helpers
-from ord_schema.proto import dataset_pb2
 
 FLAGS = flags.FLAGS
 flags.DEFINE_string("input", None, "Input pattern for Dataset protos.")
+flags.DEFINE_string("catalog", None, "Optional catalog filename; see ord_schema.catalog.")
 
 _PREFIX = "https://github.com/Open-Reaction-Database/ord-data/blob/main/"
 
 
+def _clean_doi(value: str) -> Optional[str]:
+    """Cleans up a provenance.doi value; returns None if it is empty."""
+    # Some poorly-validated DOI entries start with 'doi:'...
+    match = re.fullmatch(r"(?:(?:doi)|(?:DOI))?:?\s*(.+)", value)
+    if not match:
+        return None  # No DOI.
+    doi = urllib.parse.urlsplit(match.group(1)).path
+    if doi.startswith("/"):
+        doi = doi[1:]
+    return doi
+
+
+def _get_dataset_dois(filenames: List[str]) -> Iterator[Tuple[str, str, Set[str]]]:
+    """Yields (filename, dataset_id, DOIs) tuples, using the catalog if provided.
+
+    The catalog is not updated; Datasets without an entry are scanned.
+    """
+    missing = filenames
+    if FLAGS.catalog:
+        entries, missing = catalog.find_entries(FLAGS.catalog, filenames)
+        logging.info("Found %d datasets in the catalog", len(entries))
+        for filename, entry in entries.items():
+            yield filename, entry.dataset_id, set(entry.dois)
+    for filename, summary in message_helpers.iter_dataset_summaries(missing, paths=["provenance.doi"]):
+        values = {reaction_dois[-1] for reaction_dois in summary.values["provenance.doi"] if reaction_dois}
+        yield filename, summary.dataset_id, values
+
+
 def main(argv):
     del argv  # Only used by app.run().
     filenames = glob.glob(FLAGS.input, recursive=True)
     logging.info("Found %d datasets", len(filenames))
     dois = collections.defaultdict(list)
     output_filenames = {}
-    for filename in filenames:
+    for filename, dataset_id, values in _get_dataset_dois(filenames):
         logging.info("Checking %s", filename)
-        dataset = message_helpers.load_message(filename, dataset_pb2.Dataset)
-        dataset_id = os.path.basename(filename).split(".")[0]
-        if dataset.dataset_id != dataset_id:
-            raise AssertionError("Dataset IDs do not match: " f"{dataset.dataset_id} != {dataset_id}")
+        expected_dataset_id = os.path.basename(filename).split(".")[0]
+        if dataset_id != expected_dataset_id:
+            raise AssertionError("Dataset IDs do not match: " f"{dataset_id} != {expected_dataset_id}")
         output_filenames[dataset_id] = message_helpers.id_filename(filename)
         doi_set = set()
-        for reaction in dataset.reactions:
-            # Some poorly-validated DOI entries start with 'doi:'...
-            match = re.fullmatch(r"(?:(?:doi)|(?:DOI))?:?\s*(.+)", reaction.provenance.doi)
-            if not match:
-                continue  # No DOI.
-            doi = urllib.parse.urlsplit(match.group(1)).path
-            if doi.startswith("/"):
-                doi = doi[1:]
-            doi_set.add(doi)
+        for value in values:
+            doi = _clean_doi(value)
+            if doi:
+                doi_set.add(doi)
         for doi in doi_set:
             dois[doi].append(dataset_id)
     for doi in sorted(dois):
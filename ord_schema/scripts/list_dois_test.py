@@ -14,10 +14,12 @@
 """Tests for ord_schema.scripts.list_dois."""
 
 import os
+from unittest import mock
 
 from absl.testing import absltest
 from absl.testing import flagsaver
 
+from ord_schema import catalog
 from ord_schema import message_helpers
 from ord_schema.proto import dataset_pb2
 from ord_schema.scripts import list_dois
@@ -47,6 +49,27 @@ class ValidateDatasetTest(absltest.TestCase):
         with flagsaver.flagsaver(input=os.path.join(tempdir, "*.pb.gz")):
             list_dois.main(())
 
+    def test_catalog(self):
+        dataset = dataset_pb2.Dataset()
+        dataset.dataset_id = "ord_dataset-1"
+        dataset.reactions.add().provenance.doi = "foo/bar"
+        dataset.reactions.add().provenance.doi = "doi:foo/bar"
+        tempdir = self.create_tempdir()
+        message_helpers.write_message(dataset, os.path.join(tempdir, f"{dataset.dataset_id}.pb.gz"))
+        catalog_filename = os.path.join(tempdir, "catalog.jsonl")
+        with flagsaver.flagsaver(input=os.path.join(tempdir, "*.pb.gz"), catalog=catalog_filename):
+            list_dois.main(())
+        # Read-only scripts do not create or update the catalog.
+        self.assertFalse(os.path.exists(catalog_filename))
+        catalog.update_catalog(catalog_filename, [os.path.join(tempdir, f"{dataset.dataset_id}.pb.gz")])
+        with open(catalog_filename) as f:
+            expected = f.read()
+        with flagsaver.flagsaver(input=os.path.join(tempdir, "*.pb.gz"), catalog=catalog_filename):
+            with mock.patch.object(message_helpers, "scan_dataset", side_effect=AssertionError):
+                list_dois.main(())
+        with open(catalog_filename) as f:
+            self.assertEqual(f.read(), expected)
+
 
 if __name__ == "__main__":
     absltest.main()
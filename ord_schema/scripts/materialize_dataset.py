@@ -0,0 +1,63 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Materializes a Dataset defined by reaction_ids.
+
+Reactions are read from the corpus using a reaction_id index; see
+ord_schema.reaction_index. If --corpus is provided, the index is created or
+updated first.
+
+Example usage:
+$ python materialize_dataset.py \
+  --input=my_subset.pbtxt \
+  --index=index.jsonl \
+  --corpus="data/*/*.pb.gz" \
+  --output=my_subset_full.pb.gz
+"""
+
+import glob
+
+from absl import app
+from absl import flags
+from absl import logging
+
+from ord_schema import message_helpers
+from ord_schema import reaction_index
+from ord_schema.proto import dataset_pb2
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("input", None, "Input Dataset defined by reaction_ids.")
+flags.DEFINE_string("index", None, "Index filename.")
+flags.DEFINE_string("corpus", None, "If provided, update the index to match Datasets matching this pattern.")
+flags.DEFINE_string("output", None, "Output Dataset filename.")
+flags.DEFINE_integer("num_threads", None, "Number of threads used to read Datasets.")
+
+
+def main(argv):
+    del argv  # Only used by app.run().
+    if FLAGS.corpus:
+        filenames = sorted(glob.glob(FLAGS.corpus, recursive=True))
+        logging.info("Indexing %d datasets", len(filenames))
+        index = reaction_index.update_index(FLAGS.index, filenames, num_threads=FLAGS.num_threads)
+    else:
+        index = reaction_index.ReactionIndex(FLAGS.index)
+    logging.info("Index contains %d reactions", len(index))
+    dataset = message_helpers.load_message(FLAGS.input, dataset_pb2.Dataset)
+    materialized = reaction_index.materialize_dataset(dataset, index, num_threads=FLAGS.num_threads)
+    logging.info("Writing %d reactions to %s", len(materialized.reactions), FLAGS.output)
+    message_helpers.write_message(materialized, FLAGS.output)
+
+
+if __name__ == "__main__":
+    flags.mark_flags_as_required(["input", "index", "output"])
+    app.run(main)
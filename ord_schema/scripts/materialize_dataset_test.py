@@ -0,0 +1,56 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for ord_schema.scripts.materialize_dataset."""
+
+import os
+
+from absl.testing import absltest
+from absl.testing import flagsaver
+
+from ord_schema import message_helpers
+from ord_schema.proto import dataset_pb2
+from ord_schema.scripts import materialize_dataset
+
+
+class MaterializeDatasetTest(absltest.TestCase):
+    def test_main(self):
+        test_directory = self.create_tempdir()
+        dataset = dataset_pb2.Dataset()
+        for i in range(3):
+            dataset.reactions.add(reaction_id=f"ord-{i}")
+        message_helpers.write_message(dataset, os.path.join(test_directory, "dataset.pb.gz"))
+        subset = dataset_pb2.Dataset(name="subset", reaction_ids=["ord-2", "ord-0"])
+        input_filename = os.path.join(test_directory, "subset.pbtxt")
+        message_helpers.write_message(subset, input_filename)
+        output_filename = os.path.join(test_directory, "output.pbtxt")
+        index_filename = os.path.join(test_directory, "index.jsonl")
+        with flagsaver.flagsaver(
+            input=input_filename,
+            index=index_filename,
+            corpus=os.path.join(test_directory, "*.pb.gz"),
+            output=output_filename,
+        ):
+            materialize_dataset.main(())
+        self.assertTrue(os.path.exists(index_filename))
+        expected = dataset_pb2.Dataset(name="subset", reactions=[dataset.reactions[2], dataset.reactions[0]])
+        self.assertEqual(message_helpers.load_message(output_filename, dataset_pb2.Dataset), expected)
+        # Reuse the existing index.
+        os.remove(output_filename)
+        with flagsaver.flagsaver(input=input_filename, index=index_filename, output=output_filename):
+            materialize_dataset.main(())
+        self.assertEqual(message_helpers.load_message(output_filename, dataset_pb2.Dataset), expected)
+
+
+if __name__ == "__main__":
+    absltest.main()
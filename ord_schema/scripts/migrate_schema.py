@@ -199,9 +199,8 @@ def main(argv):
     del argv  # Only used by app.run().
     filenames = glob.glob(FLAGS.input_pattern)
     logging.info("Found %d datasets", len(filenames))
-    for filename in filenames:
+    for filename, old_dataset in message_helpers.iter_messages(filenames, dataset_old_pb2.Dataset):
         logging.info(filename)
-        old_dataset = message_helpers.load_message(filename, dataset_old_pb2.Dataset)
         new_dataset, num_changed = migrate_dataset(old_dataset)
         logging.info("Changes: %d/%d", num_changed, len(old_dataset.reactions))
         if num_changed:
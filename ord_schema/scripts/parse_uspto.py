@@ -47,10 +47,10 @@ import joblib
 from rdkit import RDLogger
 
 import ord_schema
+from ord_schema import dataset_writer
 from ord_schema import message_helpers
 from ord_schema import units
 from ord_schema import validations
-from ord_schema.proto import dataset_pb2
 from ord_schema.proto import reaction_pb2
 
 RDLogger.DisableLog("rdApp.*")  # Disable RDKit logging.
@@ -550,19 +550,22 @@ def main(argv):
     all_reactions = joblib.Parallel(n_jobs=FLAGS.n_jobs, verbose=True)(
         joblib.delayed(run)(filename, FLAGS.verbosity) for filename in filenames
     )
-    reactions = []
-    failures = []
-    for file_reactions, file_failures in all_reactions:
-        reactions.extend(file_reactions)
-        failures.extend(file_failures)
-    dataset = dataset_pb2.Dataset(reactions=reactions, name=FLAGS.name)
+    num_reactions = sum(len(file_reactions) for file_reactions, _ in all_reactions)
+    if not FLAGS.output or not num_reactions:
+        return
     basenames = [os.path.basename(filename) for filename in filenames]
-    dataset.description = f'CML filenames: {",".join(basenames)}'
-    if FLAGS.output and reactions:
-        message_helpers.write_message(dataset, FLAGS.output)
-        if failures:
-            failure_dataset = dataset_pb2.Dataset(reactions=failures, name=FLAGS.name)
-            message_helpers.write_message(failure_dataset, FLAGS.output + ".failures.pb")
+    # Stream reactions to disk instead of copying them into a single Dataset.
+    with dataset_writer.DatasetWriter(
+        FLAGS.output, name=FLAGS.name, description=f'CML filenames: {",".join(basenames)}'
+    ) as writer:
+        for file_reactions, _ in all_reactions:
+            for reaction in file_reactions:
+                writer.write(reaction)
+    if any(file_failures for _, file_failures in all_reactions):
+        with dataset_writer.DatasetWriter(FLAGS.output + ".failures.pb", name=FLAGS.name) as writer:
+            for _, file_failures in all_reactions:
+                for reaction in file_failures:
+                    writer.write(reaction)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,63 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Regroups the Reactions in a set of Datasets by key.
+
+Writes one Dataset per distinct value of a Reaction field, using an external
+sort so that the input does not need to fit in memory. See
+ord_schema.partitioning.
+
+Example usage:
+$ python partition_dataset.py \
+  --input="data/*/*.pb.gz" \
+  --key="provenance.doi" \
+  --output="by_doi/doi.pb.gz" \
+  --memory_budget=4000
+"""
+
+import glob
+
+from absl import app
+from absl import flags
+from absl import logging
+
+from ord_schema import partitioning
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("input", None, "Input pattern for Dataset protos.")
+flags.DEFINE_string("key", None, 'Field path relative to Reaction; for example, "provenance.doi".')
+flags.DEFINE_string("output", None, "Output filename template; partitions are written to <stem>-00000.<suffix>, etc.")
+flags.DEFINE_float("memory_budget", 1000.0, "Approximate memory budget (in MB) for the sort buffer.")
+flags.DEFINE_string("temp_dir", None, "Directory for temporary sorted runs.")
+flags.DEFINE_integer("block_size", None, "If provided, write gzipped output as a blocked gzip file.")
+
+
+def main(argv):
+    del argv  # Only used by app.run().
+    filenames = sorted(glob.glob(FLAGS.input, recursive=True))
+    logging.info("Found %d datasets", len(filenames))
+    partitions = partitioning.partition_reactions(
+        filenames,
+        FLAGS.key,
+        FLAGS.output,
+        memory_budget=int(FLAGS.memory_budget * 1e6),
+        temp_dir=FLAGS.temp_dir,
+        block_size=FLAGS.block_size,
+    )
+    for partition in partitions:
+        logging.info("%s:\t%r\t%d", partition.filename, partition.key, partition.num_reactions)
+
+
+if __name__ == "__main__":
+    flags.mark_flags_as_required(["input", "key", "output"])
+    app.run(main)
@@ -0,0 +1,49 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for ord_schema.scripts.partition_dataset."""
+
+import os
+
+from absl.testing import absltest
+from absl.testing import flagsaver
+
+from ord_schema import dataset_writer
+from ord_schema import message_helpers
+from ord_schema.proto import dataset_pb2
+from ord_schema.scripts import partition_dataset
+
+
+class PartitionDatasetTest(absltest.TestCase):
+    def test_main(self):
+        test_directory = self.create_tempdir()
+        for i in range(2):
+            dataset = dataset_pb2.Dataset()
+            dataset.reactions.add(reaction_id=f"ord-{i}a").provenance.doi = "10.1000/xyz"
+            dataset.reactions.add(reaction_id=f"ord-{i}b").provenance.doi = f"10.1000/{i}"
+            message_helpers.write_message(dataset, os.path.join(test_directory, f"dataset-{i}.pb"))
+        output_filename = os.path.join(self.create_tempdir(), "doi.pb")
+        with flagsaver.flagsaver(
+            input=os.path.join(test_directory, "*.pb"), key="provenance.doi", output=output_filename
+        ):
+            partition_dataset.main(())
+        datasets = [
+            message_helpers.load_message(filename, dataset_pb2.Dataset)
+            for filename in dataset_writer.find_shards(output_filename)
+        ]
+        self.assertEqual([dataset.name for dataset in datasets], ["10.1000/0", "10.1000/1", "10.1000/xyz"])
+        self.assertEqual([reaction.reaction_id for reaction in datasets[2].reactions], ["ord-0a", "ord-1a"])
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -38,13 +38,17 @@ Example usage:
   $ python process_dataset.py --input_pattern="my_dataset-*.pb"
 """
 
+import concurrent.futures
 import dataclasses
 import glob
 import gzip
+import json
 import os
 import subprocess
 import sys
-from typing import Iterable, List, Mapping, Set, Tuple
+import tempfile
+import threading
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
 
 from absl import app
 from absl import flags
@@ -70,9 +74,22 @@ flags.DEFINE_enum(
 flags.DEFINE_boolean("write_errors", False, "If True, errors will be written to <filename>.error.")
 flags.DEFINE_boolean("validate", True, "If True, validate input Reaction protos.")
 flags.DEFINE_boolean("update", False, "If True, update Reaction protos.")
+flags.DEFINE_boolean(
+    "canonicalize", False, "If True (with --update), reorder order-insensitive collections into a canonical order."
+)
 flags.DEFINE_boolean("cleanup", False, "If True, use git to clean up.")
 flags.DEFINE_float("max_size", 10.0, "Maximum size (in MB) for any Reaction message.")
+flags.DEFINE_integer(
+    "block_size",
+    None,
+    "If set, gzipped outputs are written as blocked gzip files with blocks of "
+    "approximately this many bytes, compressed in parallel.",
+)
 flags.DEFINE_string("base", None, "Git branch to diff against.")
+flags.DEFINE_string("base_cache_dir", None, "Optional cache directory for reaction IDs loaded from --base.")
+flags.DEFINE_integer(
+    "lfs_workers", 4, "Maximum number of base datasets smudged (Git LFS), decompressed, and scanned at once."
+)
 flags.DEFINE_integer("issue", None, "GitHub pull request number. If provided, a comment will be added.")
 flags.DEFINE_string("token", None, "GitHub authentication token.")
 
@@ -150,36 +167,176 @@ def _get_reaction_ids(dataset: dataset_pb2.Dataset) -> Set[str]:
     return reaction_ids
 
 
-def _load_base_dataset(file_status: FileStatus, base: str) -> dataset_pb2.Dataset:
-    """Loads a Dataset message from another branch."""
-    if file_status.status.startswith("A"):
-        return None  # Dataset only exists in the submission.
-    # NOTE(kearnes): Use --no-pager to avoid a non-zero exit code.
-    args = ["git", "--no-pager", "show"]
-    if file_status.status.startswith("R"):
-        args.append(f"{base}:{file_status.original_filename}")
-    else:
-        args.append(f"{base}:{file_status.filename}")
-    logging.info("Running command: %s", " ".join(args))
-    serialized = subprocess.run(args, capture_output=True, check=True, text=False)
-    if serialized.stdout.startswith(b"version"):
+@dataclasses.dataclass(frozen=True)
+class GitBlob:
+    """A blob read from the Git object database."""
+
+    sha: str
+    content: bytes
+
+
+class GitBlobReader:
+    """Reads blobs through a single long-lived `git cat-file --batch` process.
+
+    All requests in a call to read() are written to the process in one
+    pipelined stream, so there is no per-file process startup or round trip.
+    Responses are read lazily, so only one blob is held in memory at a time.
+    """
+
+    def __init__(self):
+        # pylint: disable-next=consider-using-with
+        self._process = subprocess.Popen(["git", "cat-file", "--batch"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read(self, names: List[str]) -> Iterator[Optional[GitBlob]]:
+        """Reads a set of blobs.
+
+        Args:
+            names: Object names, e.g. "main:data/ab/ord_dataset-ab.pb.gz".
+
+        Yields:
+            GitBlob objects, in the order of `names`; None for objects that do
+            not exist.
+        """
+        # NOTE: Requests are written from a separate thread so that large
+        # responses cannot fill the output pipe and deadlock the process.
+        writer = threading.Thread(target=self._write_requests, args=(names,))
+        writer.start()
+        num_read = 0
+        try:
+            for _ in names:
+                blob = self._read_response()
+                num_read += 1
+                yield blob
+        finally:
+            if self._process.poll() is None:
+                # Discard unread responses so that the writer can finish.
+                for _ in range(len(names) - num_read):
+                    self._read_response()
+            writer.join()
+
+    def _write_requests(self, names: List[str]):
+        try:
+            for name in names:
+                self._process.stdin.write(f"{name}\n".encode())
+            self._process.stdin.flush()
+        except BrokenPipeError:
+            pass  # The process exited; _read_response reports the error.
+
+    def _read_response(self) -> Optional[GitBlob]:
+        header = self._process.stdout.readline().decode().split()
+        if not header:
+            raise RuntimeError("git cat-file exited unexpectedly")
+        if header[-1] in ("missing", "ambiguous"):
+            return None
+        sha, _, size = header
+        content = self._process.stdout.read(int(size))
+        self._process.stdout.read(1)  # Trailing newline.
+        return GitBlob(sha=sha, content=content)
+
+    def close(self):
+        self._process.stdin.close()
+        self._process.wait()
+
+    def __enter__(self) -> "GitBlobReader":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _load_base_reaction_ids(path: str, blob: GitBlob, cache_dir: Optional[str]) -> List[str]:
+    """Returns the (non-empty) reaction IDs in a Dataset blob.
+
+    Only the reaction IDs are needed, so the Dataset is scanned rather than
+    parsed; the decompressed Dataset is released as soon as it is scanned.
+
+    Args:
+        path: Path of the blob in the repository.
+        blob: GitBlob.
+        cache_dir: Optional cache directory; entries are the reaction IDs for
+            each blob, keyed by blob SHA.
+
+    Returns:
+        List of reaction IDs.
+    """
+    cache_filename = None
+    if cache_dir:
+        cache_filename = os.path.join(cache_dir, f"{blob.sha}.json")
+        if os.path.exists(cache_filename):
+            with open(cache_filename) as f:
+                return json.load(f)
+    value = blob.content
+    if value.startswith(b"version"):
         # Convert Git LFS pointers to real data.
-        serialized = subprocess.run(
-            ["git", "lfs", "smudge"],
-            input=serialized.stdout,
-            capture_output=True,
-            check=True,
-            text=False,
-        )
-    if args[-1].endswith(".gz"):
-        value = gzip.decompress(serialized.stdout)
-    else:
-        value = serialized.stdout
-    return dataset_pb2.Dataset.FromString(value)
+        args = ["git", "lfs", "smudge"]
+        logging.info("Running command: %s", " ".join(args))
+        value = subprocess.run(args, input=value, capture_output=True, check=True, text=False).stdout
+    if path.endswith(".gz"):
+        value = gzip.decompress(value)
+    summary = message_helpers.scan_serialized_dataset(value)
+    del value
+    reaction_ids = [reaction_id for reaction_id in summary.reaction_ids if reaction_id]
+    if cache_filename:
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=cache_dir, delete=False) as f:
+            json.dump(reaction_ids, f)
+        os.replace(f.name, cache_filename)
+    return reaction_ids
+
+
+def _get_base_reaction_ids(inputs: Iterable[FileStatus], base: str) -> Dict[str, Set[str]]:
+    """Loads the reaction IDs for each input from another branch.
+
+    Blobs are read one at a time and at most FLAGS.lfs_workers of them are
+    being smudged, decompressed, or scanned at once, so memory use is bounded
+    by a few datasets rather than the size of the submission.
+
+    Args:
+        inputs: List of FileStatus objects.
+        base: Git branch to diff against.
+
+    Returns:
+        Dict mapping filenames to sets of reaction IDs; empty for datasets
+        that only exist in the submission.
+
+    Raises:
+        ValueError: if a dataset does not exist in `base`.
+    """
+    paths = {}
+    reaction_ids = {}
+    for file_status in inputs:
+        reaction_ids[file_status.filename] = set()
+        if file_status.status.startswith("A"):
+            continue  # Dataset only exists in the submission.
+        if file_status.status.startswith("R"):
+            paths[file_status.filename] = file_status.original_filename
+        else:
+            paths[file_status.filename] = file_status.filename
+    names = [f"{base}:{path}" for path in paths.values()]
+    if not names:
+        return reaction_ids
+    logging.info("Reading %d datasets from %s", len(names), base)
+    with GitBlobReader() as reader, concurrent.futures.ThreadPoolExecutor(max_workers=FLAGS.lfs_workers) as executor:
+        pending = {}  # Maps futures to filenames.
+        for (filename, path), name, blob in zip(paths.items(), names, reader.read(names)):
+            if blob is None:
+                raise ValueError(f"object does not exist: {name}")
+            if len(pending) >= FLAGS.lfs_workers:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    reaction_ids[pending.pop(future)].update(future.result())
+            pending[executor.submit(_load_base_reaction_ids, path, blob, FLAGS.base_cache_dir)] = filename
+            del blob  # Only the pending tasks hold references to blobs.
+        for future in concurrent.futures.as_completed(pending):
+            reaction_ids[pending[future]].update(future.result())
+    return reaction_ids
 
 
 def get_change_stats(
-    datasets: Mapping[str, dataset_pb2.Dataset], inputs: Iterable[FileStatus], base: str
+    datasets: Mapping[str, dataset_pb2.Dataset],
+    inputs: Iterable[FileStatus],
+    base: str,
+    base_reaction_ids: Optional[Mapping[str, Set[str]]] = None,
 ) -> Tuple[Set[str], Set[str], Set[str]]:
     """Computes diff statistics for the submission.
 
@@ -187,19 +344,22 @@ def get_change_stats(
         datasets: Dict mapping filenames to Dataset messages.
         inputs: List of FileStatus objects.
         base: Git branch to diff against.
+        base_reaction_ids: Dict mapping filenames to reaction IDs in `base`;
+            see _get_base_reaction_ids. Loaded from `base` if not provided.
 
     Returns:
         added: Set of added reaction IDs.
         removed: Set of deleted reaction IDs.
         changed: Set of changed reaction IDs.
     """
+    inputs = list(inputs)
+    if base_reaction_ids is None:
+        base_reaction_ids = _get_base_reaction_ids(inputs, base)
     old, new = set(), set()
     for file_status in inputs:
         if not file_status.status.startswith("D"):
             new.update(_get_reaction_ids(datasets[file_status.filename]))
-        dataset = _load_base_dataset(file_status, base)
-        if dataset is not None:
-            old.update(_get_reaction_ids(dataset))
+        old.update(base_reaction_ids[file_status.filename])
     return new - old, old - new, new & old
 
 
@@ -214,7 +374,7 @@ def _run_updates(datasets: Mapping[str, dataset_pb2.Dataset]):
     """
     for dataset in datasets.values():
         # Set reaction_ids, resolve names, fix cross-references, etc.
-        updates.update_dataset(dataset)
+        updates.update_dataset(dataset, canonicalize=FLAGS.canonicalize)
     # Final validation to make sure we didn't break anything.
     options = validations.ValidationOptions(validate_ids=True, require_provenance=True)
     validations.validate_datasets(datasets, FLAGS.write_errors, options=options)
@@ -227,7 +387,7 @@ def _run_updates(datasets: Mapping[str, dataset_pb2.Dataset]):
         if FLAGS.cleanup:
             cleanup(filename, output_filename)
         logging.info("writing Dataset to %s", output_filename)
-        message_helpers.write_message(dataset, output_filename)
+        message_helpers.write_message(dataset, output_filename, block_size=FLAGS.block_size)
 
 
 def run() -> Tuple[Set[str], Set[str], Set[str]]:
@@ -246,6 +406,11 @@ def run() -> Tuple[Set[str], Set[str], Set[str]]:
     if not inputs:
         logging.info("nothing to do")
         return set(), set(), set()  # Nothing to do.
+    base_reaction_ids = None
+    if FLAGS.base:
+        # NOTE: Base datasets are streamed up front; only their reaction IDs
+        # are kept in memory.
+        base_reaction_ids = _get_base_reaction_ids(inputs, FLAGS.base)
     # NOTE(kearnes): Process one dataset at a time to avoid OOM errors.
     change_stats = {}
     for file_status in inputs:
@@ -264,7 +429,9 @@ def run() -> Tuple[Set[str], Set[str], Set[str]]:
                 if reaction_size > FLAGS.max_size:
                     raise ValueError("Reaction is larger than --max_size " f"({reaction_size} vs {FLAGS.max_size}")
         if FLAGS.base:
-            added, removed, changed = get_change_stats(datasets, [file_status], base=FLAGS.base)
+            added, removed, changed = get_change_stats(
+                datasets, [file_status], base=FLAGS.base, base_reaction_ids=base_reaction_ids
+            )
             change_stats[file_status.filename] = (added, removed, changed)
             logging.info(
                 "Summary: +%d -%d Δ%d reaction IDs",
@@ -14,6 +14,7 @@
 """Tests for ord_schema.scripts.process_dataset."""
 
 import glob
+import json
 import os
 import subprocess
 import tempfile
@@ -420,6 +421,47 @@ class SubmissionWorkflowTest(absltest.TestCase):
         self.assertEmpty(changed)
         self.assertLen(filenames, 1)
 
+    def test_base_cache(self):
+        dataset = message_helpers.load_message(self.dataset_filename, dataset_pb2.Dataset)
+        dataset.reactions[0].reaction_id = "test_rename"
+        message_helpers.write_message(dataset, self.dataset_filename)
+        cache_dir = self.create_tempdir().full_path
+        added, removed, _, _ = self._run(base_cache_dir=cache_dir)
+        self.assertEqual(added, {"test_rename"})
+        self.assertEqual(removed, {"ord-10aed8b5dffe41fab09f5b2cc9c58ad9"})
+        blob_sha = subprocess.run(
+            ["git", "rev-parse", f"{self._DEFAULT_BRANCH}:{os.path.relpath(self.dataset_filename)}"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        self.assertEqual(os.listdir(cache_dir), [f"{blob_sha}.json"])
+        with open(os.path.join(cache_dir, f"{blob_sha}.json")) as f:
+            cached = json.load(f)
+        self.assertIn("ord-10aed8b5dffe41fab09f5b2cc9c58ad9", cached)
+        # Cached reaction IDs are returned without reading the blob contents.
+        blob = process_dataset.GitBlob(sha=blob_sha, content=b"not a dataset")
+        # pylint: disable-next=protected-access
+        self.assertEqual(process_dataset._load_base_reaction_ids(self.dataset_filename, blob, cache_dir), cached)
+
+    def test_git_blob_reader(self):
+        path = os.path.relpath(self.dataset_filename)
+        names = [f"{self._DEFAULT_BRANCH}:{path}", f"{self._DEFAULT_BRANCH}:missing.pb"]
+        with process_dataset.GitBlobReader() as reader:
+            blobs = list(reader.read(names))
+            self.assertEmpty(list(reader.read([])))
+            # Abandoning a read discards the remaining responses.
+            for _ in reader.read(names * 3):
+                break
+            self.assertEqual(list(reader.read(names)), blobs)
+        self.assertIsNone(blobs[1])
+        with open(self.dataset_filename, "rb") as f:
+            self.assertEqual(blobs[0].content, f.read())
+        blob_sha = subprocess.run(
+            ["git", "rev-parse", f"{self._DEFAULT_BRANCH}:{path}"], check=True, capture_output=True, text=True
+        ).stdout.strip()
+        self.assertEqual(blobs[0].sha, blob_sha)
+
 
 if __name__ == "__main__":
     absltest.main()
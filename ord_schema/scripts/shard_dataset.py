@@ -0,0 +1,80 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Splits binary Datasets into shards of bounded size, or merges them back.
+
+Shard filenames are derived from the unsharded filename; for example, the
+shards of my_dataset.pb.gz are my_dataset-00000.pb.gz, my_dataset-00001.pb.gz,
+and so on. See dataset_writer.ShardedDatasetWriter.
+
+Example usage:
+$ python shard_dataset.py --input="data/*/*.pb.gz" --max_shard_size=64
+$ python shard_dataset.py --input="data/*/*-?????.pb.gz" --merge
+"""
+
+import glob
+import os
+import re
+
+from absl import app
+from absl import flags
+from absl import logging
+
+from ord_schema import dataset_writer
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("input", None, "Input pattern for Dataset protos (*.pb or *.pb.gz).")
+flags.DEFINE_float("max_shard_size", 64.0, "Maximum size (in MB) for each shard.")
+flags.DEFINE_boolean("merge", False, "If True, merge the shards matching --input instead of splitting.")
+flags.DEFINE_boolean("remove", False, "If True, remove the input files after writing the output.")
+flags.DEFINE_integer("block_size", None, "If provided, write gzipped output as a blocked gzip file.")
+
+_SHARD_PATTERN = re.compile(r"(?P<stem>.+)-\d{5}(?P<suffix>\..+)")
+
+
+def _get_unsharded_filenames(filenames):
+    """Returns the sorted set of unsharded filenames for a list of shards."""
+    unsharded_filenames = set()
+    for filename in filenames:
+        dirname, basename = os.path.split(filename)
+        match = _SHARD_PATTERN.fullmatch(basename)
+        if not match:
+            raise ValueError(f"not a shard filename: {filename}")
+        unsharded_filenames.add(os.path.join(dirname, match.group("stem") + match.group("suffix")))
+    return sorted(unsharded_filenames)
+
+
+def main(argv):
+    del argv  # Only used by app.run().
+    filenames = sorted(glob.glob(FLAGS.input, recursive=True))
+    logging.info("Found %d datasets", len(filenames))
+    if FLAGS.merge:
+        for filename in _get_unsharded_filenames(filenames):
+            shards = dataset_writer.find_shards(filename)
+            logging.info("Merging %d shards into %s", len(shards), filename)
+            dataset_writer.merge_shards(shards, filename, block_size=FLAGS.block_size)
+            if FLAGS.remove:
+                for shard in shards:
+                    os.remove(shard)
+        return
+    max_shard_size = int(FLAGS.max_shard_size * 1e6)
+    for filename in filenames:
+        shards = dataset_writer.shard_dataset(filename, max_shard_size, block_size=FLAGS.block_size)
+        logging.info("Split %s into %d shards", filename, len(shards))
+        if FLAGS.remove:
+            os.remove(filename)
+
+
+if __name__ == "__main__":
+    flags.mark_flag_as_required("input")
+    app.run(main)
@@ -0,0 +1,47 @@
+# Copyright 2022 Open Reaction Database Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for ord_schema.scripts.shard_dataset."""
+
+import os
+
+from absl.testing import absltest
+from absl.testing import flagsaver
+
+from ord_schema import dataset_writer
+from ord_schema import message_helpers
+from ord_schema.proto import dataset_pb2
+from ord_schema.scripts import shard_dataset
+
+
+class ShardDatasetTest(absltest.TestCase):
+    def test_main(self):
+        test_directory = self.create_tempdir()
+        dataset = dataset_pb2.Dataset(name="test", dataset_id="ord_dataset-1")
+        for i in range(5):
+            dataset.reactions.add(reaction_id=f"ord-{i}").identifiers.add(value="C" * 100)
+        filename = os.path.join(test_directory, "dataset.pb.gz")
+        message_helpers.write_message(dataset, filename)
+        max_shard_size = (2 * dataset.reactions[0].ByteSize() + 100) / 1e6
+        with flagsaver.flagsaver(input=filename, max_shard_size=max_shard_size, remove=True):
+            shard_dataset.main(())
+        self.assertFalse(os.path.exists(filename))
+        self.assertLen(dataset_writer.find_shards(filename), 3)
+        with flagsaver.flagsaver(input=os.path.join(test_directory, "*-?????.pb.gz"), merge=True, remove=True):
+            shard_dataset.main(())
+        self.assertEqual(os.listdir(test_directory), ["dataset.pb.gz"])
+        self.assertEqual(message_helpers.load_message(filename, dataset_pb2.Dataset), dataset)
+
+
+if __name__ == "__main__":
+    absltest.main()
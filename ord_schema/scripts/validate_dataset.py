@@ -51,9 +51,9 @@ def main(argv):
     if FLAGS.filter:
         filenames = filter_filenames(filenames, FLAGS.filter)
         logging.info("Filtered to %d datasets", len(filenames))
-    for filename in filenames:
+    # NOTE: Upcoming datasets are loaded in the background during validation.
+    for filename, dataset in message_helpers.iter_messages(filenames, dataset_pb2.Dataset):
         logging.info("Validating %s", filename)
-        dataset = message_helpers.load_message(filename, dataset_pb2.Dataset)
         validations.validate_datasets({filename: dataset})
 
 
@@ -161,6 +161,78 @@ CONCENTRATION_M_PER_UNIT = {
     reaction_pb2.Concentration.ConcentrationUnit.MICROMOLAR: 1e-6,
 }
 
+TIME_S_PER_UNIT = {
+    reaction_pb2.Time.TimeUnit.DAY: 86400,
+    reaction_pb2.Time.TimeUnit.HOUR: 3600,
+    reaction_pb2.Time.TimeUnit.MINUTE: 60,
+    reaction_pb2.Time.TimeUnit.SECOND: 1,
+}
+
+MASS_KG_PER_UNIT = {
+    reaction_pb2.Mass.MassUnit.KILOGRAM: 1,
+    reaction_pb2.Mass.MassUnit.GRAM: 1e-3,
+    reaction_pb2.Mass.MassUnit.MILLIGRAM: 1e-6,
+    reaction_pb2.Mass.MassUnit.MICROGRAM: 1e-9,
+}
+
+MOLES_MOL_PER_UNIT = {
+    reaction_pb2.Moles.MolesUnit.MOLE: 1,
+    reaction_pb2.Moles.MolesUnit.MILLIMOLE: 1e-3,
+    reaction_pb2.Moles.MolesUnit.MICROMOLE: 1e-6,
+    reaction_pb2.Moles.MolesUnit.NANOMOLE: 1e-9,
+}
+
+PRESSURE_PA_PER_UNIT = {
+    reaction_pb2.Pressure.PressureUnit.BAR: 1e5,
+    reaction_pb2.Pressure.PressureUnit.ATMOSPHERE: 101325,
+    reaction_pb2.Pressure.PressureUnit.PSI: 6894.757293168,
+    reaction_pb2.Pressure.PressureUnit.KPSI: 6894757.293168,
+    reaction_pb2.Pressure.PressureUnit.PASCAL: 1,
+    reaction_pb2.Pressure.PressureUnit.KILOPASCAL: 1e3,
+    reaction_pb2.Pressure.PressureUnit.TORR: 101325 / 760,
+    reaction_pb2.Pressure.PressureUnit.MM_HG: 133.322387415,
+}
+
+LENGTH_M_PER_UNIT = {
+    reaction_pb2.Length.LengthUnit.CENTIMETER: 1e-2,
+    reaction_pb2.Length.LengthUnit.MILLIMETER: 1e-3,
+    reaction_pb2.Length.LengthUnit.METER: 1,
+    reaction_pb2.Length.LengthUnit.INCH: 0.0254,
+    reaction_pb2.Length.LengthUnit.FOOT: 0.3048,
+}
+
+CURRENT_A_PER_UNIT = {
+    reaction_pb2.Current.CurrentUnit.AMPERE: 1,
+    reaction_pb2.Current.CurrentUnit.MILLIAMPERE: 1e-3,
+}
+
+VOLTAGE_V_PER_UNIT = {
+    reaction_pb2.Voltage.VoltageUnit.VOLT: 1,
+    reaction_pb2.Voltage.VoltageUnit.MILLIVOLT: 1e-3,
+}
+
+FLOW_RATE_L_PER_S_PER_UNIT = {
+    reaction_pb2.FlowRate.FlowRateUnit.MICROLITER_PER_MINUTE: 1e-6 / 60,
+    reaction_pb2.FlowRate.FlowRateUnit.MICROLITER_PER_SECOND: 1e-6,
+    reaction_pb2.FlowRate.FlowRateUnit.MILLILITER_PER_MINUTE: 1e-3 / 60,
+    reaction_pb2.FlowRate.FlowRateUnit.MILLILITER_PER_SECOND: 1e-3,
+    reaction_pb2.FlowRate.FlowRateUnit.MICROLITER_PER_HOUR: 1e-6 / 3600,
+}
+
+# Maps message types to conversion tables for to_base_units.
+_BASE_UNITS_PER_UNIT = {
+    reaction_pb2.Time: TIME_S_PER_UNIT,
+    reaction_pb2.Mass: MASS_KG_PER_UNIT,
+    reaction_pb2.Moles: MOLES_MOL_PER_UNIT,
+    reaction_pb2.Volume: VOLUME_L_PER_UNIT,
+    reaction_pb2.Concentration: CONCENTRATION_M_PER_UNIT,
+    reaction_pb2.Pressure: PRESSURE_PA_PER_UNIT,
+    reaction_pb2.Length: LENGTH_M_PER_UNIT,
+    reaction_pb2.Current: CURRENT_A_PER_UNIT,
+    reaction_pb2.Voltage: VOLTAGE_V_PER_UNIT,
+    reaction_pb2.FlowRate: FLOW_RATE_L_PER_S_PER_UNIT,
+}
+
 
 class UnitResolver:
     """Resolver class for translating value+unit strings into messages."""
@@ -271,6 +343,41 @@ def format_message(message: ord_schema.UnitMessage) -> Optional[str]:
     return txt
 
 
+def to_base_units(message: ord_schema.UnitMessage) -> Optional[float]:
+    """Converts the value of a message with units to base units.
+
+    Base units are seconds, kilograms, moles, liters, molar, pascals, kelvin,
+    meters, amperes, volts, and liters per second. Wavelengths are converted to
+    meters (wavenumbers are inverted).
+
+    Args:
+        message: Message with units (see ord_schema.UnitMessage) or
+            Concentration.
+
+    Returns:
+        The value in base units, or None if the value or units are not set (or
+        if a wavenumber is zero).
+
+    Raises:
+        ValueError: if the message type is not supported.
+    """
+    if not isinstance(message, (reaction_pb2.Temperature, reaction_pb2.Wavelength, *_BASE_UNITS_PER_UNIT)):
+        raise ValueError(f"unsupported message type: {type(message).__name__}")
+    if not message.HasField("value") or not message.units:
+        return None
+    if isinstance(message, reaction_pb2.Temperature):
+        if message.units == reaction_pb2.Temperature.CELSIUS:
+            return message.value + 273.15
+        if message.units == reaction_pb2.Temperature.FAHRENHEIT:
+            return (message.value - 32) * 5 / 9 + 273.15
+        return message.value
+    if isinstance(message, reaction_pb2.Wavelength):
+        if message.units == reaction_pb2.Wavelength.NANOMETER:
+            return message.value * 1e-9
+        return 1e-2 / message.value if message.value else None
+    return message.value * _BASE_UNITS_PER_UNIT[type(message)][message.units]
+
+
 def compute_solute_quantity(
     volume: reaction_pb2.Volume, concentration: reaction_pb2.Concentration
 ) -> reaction_pb2.Amount:
@@ -115,6 +115,37 @@ class UnitsTest(parameterized.TestCase, absltest.TestCase):
         with self.assertRaisesRegex((KeyError, ValueError), expected_error):
             self._resolver.resolve(string)
 
+    @parameterized.named_parameters(
+        ("time", "1.5 h", 5400.0),
+        ("mass", "250 mg", 2.5e-4),
+        ("moles", "3 mmol", 3e-3),
+        ("volume", "20 mL", 0.02),
+        ("pressure", "2 bar", 2e5),
+        ("celsius", "25 C", 298.15),
+        ("fahrenheit", "212 F", 373.15),
+        ("kelvin", "300 K", 300.0),
+        ("length", "2 in", 0.0508),
+        ("current", "5 mA", 5e-3),
+        ("nanometer", "500 nm", 5e-7),
+    )
+    def test_to_base_units(self, string, expected):
+        self.assertAlmostEqual(units.to_base_units(self._resolver.resolve(string)), expected, places=6)
+
+    def test_to_base_units_other(self):
+        flow_rate = reaction_pb2.FlowRate(value=6, units=reaction_pb2.FlowRate.MILLILITER_PER_MINUTE)
+        self.assertAlmostEqual(units.to_base_units(flow_rate), 1e-4)
+        wavelength = reaction_pb2.Wavelength(value=2000, units=reaction_pb2.Wavelength.WAVENUMBER)
+        self.assertAlmostEqual(units.to_base_units(wavelength), 5e-6)
+
+    def test_to_base_units_missing(self):
+        self.assertIsNone(units.to_base_units(reaction_pb2.Time(value=1.5)))
+        self.assertIsNone(units.to_base_units(reaction_pb2.Time(units=reaction_pb2.Time.HOUR)))
+        self.assertIsNone(
+            units.to_base_units(reaction_pb2.Wavelength(value=0, units=reaction_pb2.Wavelength.WAVENUMBER))
+        )
+        with self.assertRaisesRegex(ValueError, "unsupported message type"):
+            units.to_base_units(reaction_pb2.Percentage(value=1))
+
 
 if __name__ == "__main__":
     absltest.main()
@@ -18,6 +18,7 @@ import re
 from typing import Mapping
 import uuid
 
+from ord_schema import message_helpers
 from ord_schema.proto import dataset_pb2
 from ord_schema.proto import reaction_pb2
 
@@ -33,15 +34,19 @@ _USERNAME = "github-actions"
 _EMAIL = "github-actions@github.com"
 
 
-def update_reaction(reaction: reaction_pb2.Reaction) -> Mapping[str, str]:
+def update_reaction(reaction: reaction_pb2.Reaction, canonicalize: bool = False) -> Mapping[str, str]:
     """Updates a Reaction message.
 
     Current updates:
       * Sets reaction_id if not already set.
+      * (Optional) Reorders order-insensitive collections into a canonical
+        order; see message_helpers.canonicalize_message.
       * Adds a record modification event to the provenance.
 
     Args:
         reaction: reaction_pb2.Reaction message.
+        canonicalize: If True, canonicalize the order of order-insensitive
+            collections.
 
     Returns:
         A dictionary mapping placeholder reaction_ids to newly-assigned
@@ -64,6 +69,8 @@ def update_reaction(reaction: reaction_pb2.Reaction) -> Mapping[str, str]:
         # `modified or func(reaction)` and modified is True, the interpreter
         # will skip the evaluation of func(reaction).
         modified = func(reaction) or modified
+    if canonicalize:
+        modified = message_helpers.canonicalize_message(reaction) or modified
     if modified:
         event = reaction.provenance.record_modified.add()
         event.time.value = datetime.datetime.utcnow().ctime()
@@ -73,7 +80,7 @@ def update_reaction(reaction: reaction_pb2.Reaction) -> Mapping[str, str]:
     return id_substitutions
 
 
-def update_dataset(dataset: dataset_pb2.Dataset):
+def update_dataset(dataset: dataset_pb2.Dataset, canonicalize: bool = False):
     """Updates a Dataset message.
 
     Current updates:
@@ -82,6 +89,8 @@ def update_dataset(dataset: dataset_pb2.Dataset):
 
     Args:
         dataset: dataset_pb2.Dataset message.
+        canonicalize: If True, canonicalize the order of order-insensitive
+            collections in each Reaction; see update_reaction.
 
     Raises:
         KeyError: if the dataset has not been validated and there exists a
@@ -93,7 +102,7 @@ def update_dataset(dataset: dataset_pb2.Dataset):
     # Reaction-level updates
     id_substitutions = {}
     for reaction in dataset.reactions:
-        id_substitutions.update(update_reaction(reaction))
+        id_substitutions.update(update_reaction(reaction, canonicalize=canonicalize))
     # Dataset-level updates of cross-references
     for reaction in dataset.reactions:
         for reaction_input in reaction.inputs.values():
@@ -50,6 +50,19 @@ class UpdateReactionTest(absltest.TestCase):
         self.assertEqual(message.reaction_id, "ord-c0bbd41f095a44a78b6221135961d809")
         self.assertLen(message.provenance.record_modified, 0)
 
+    def test_canonicalize(self):
+        message = reaction_pb2.Reaction()
+        message.reaction_id = "ord-c0bbd41f095a44a78b6221135961d809"
+        message.identifiers.add(type="NAME", value="oxidation")
+        message.identifiers.add(type="REACTION_SMILES", value="CC>>CO")
+        copied = reaction_pb2.Reaction()
+        copied.CopyFrom(message)
+        updates.update_reaction(copied)
+        self.assertEqual(copied, message)
+        updates.update_reaction(copied, canonicalize=True)
+        self.assertEqual([identifier.value for identifier in copied.identifiers], ["CC>>CO", "oxidation"])
+        self.assertLen(copied.provenance.record_modified, 1)
+
 
 class UpdateDatasetTest(absltest.TestCase):
     def setUp(self):